@@ -1,12 +1,16 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 from database import dashboard_bp
+from connection import init_app
+from json_provider import FastJSONProvider
+import sessao
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 # Configurar CORS para aceitar requisições do frontend (incluindo Vercel)
 # Permitir todas as origens do Vercel temporariamente
@@ -14,11 +18,14 @@ CORS(app, resources={
     r"/*": {
         "origins": ["*"],  # Permitir todas as origens (temporário para debug)
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization", "If-None-Match"],
+        "expose_headers": ["ETag", "Server-Timing", "X-Cache", "X-DB-Commits"]
     }
 })
 
 app.register_blueprint(dashboard_bp)
+init_app(app)
+sessao.init_app(app)
 
 # Para Vercel - exportar o app
 handler = app
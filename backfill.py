@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Backfill em lotes, retomável, para migrações de dados em tabelas grandes.
+
+Em vez de um UPDATE gigante (que estoura o limite de tamanho de transação
+do TiDB e segura locks a execução inteira), percorre a tabela pela chave
+primária em faixas de até `lote` linhas. Cada faixa é uma transação curta,
+e o checkpoint (último id processado) é gravado nela mesma, então uma
+execução interrompida continua de onde parou.
+
+O ritmo se ajusta sozinho: o lote cresce enquanto as faixas são rápidas e
+encolhe quando passam de BACKFILL_ALVO segundos. Depois de cada faixa o
+processo dorme `pausa` vezes o tempo que ela levou, deixando o banco livre
+para a API (pausa=1 usa no máximo ~50% do tempo).
+
+Uso como comando:
+    python backfill.py <nome> <tabela> "<SET>" ["<WHERE>"] [--lote N] [--pausa F]
+                       [--max-linhas-s N] [--reiniciar]
+
+    python backfill.py oficina_clientes clientes "oficina_id = 1" "oficina_id IS NULL"
+"""
+
+import argparse
+import os
+import time
+from connection import TX_RETRIES, get_connection, is_write_conflict
+
+BACKFILL_LOTE = int(os.getenv("BACKFILL_LOTE", "1000"))
+BACKFILL_LOTE_MAX = int(os.getenv("BACKFILL_LOTE_MAX", "10000"))
+BACKFILL_ALVO = float(os.getenv("BACKFILL_ALVO", "0.5"))
+BACKFILL_PAUSA = float(os.getenv("BACKFILL_PAUSA", "1"))
+BACKFILL_RELATORIO = float(os.getenv("BACKFILL_RELATORIO", "5"))
+
+
+def preparar(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+            nome VARCHAR(100) PRIMARY KEY,
+            tabela VARCHAR(64) NOT NULL,
+            ultimo_id BIGINT NOT NULL DEFAULT 0,
+            linhas BIGINT NOT NULL DEFAULT 0,
+            concluido TINYINT NOT NULL DEFAULT 0,
+            atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def ler_checkpoint(cursor, nome):
+    cursor.execute("""
+        SELECT ultimo_id, linhas, concluido FROM backfill_checkpoints
+        WHERE nome = %s
+    """, (nome,))
+    return cursor.fetchone()
+
+
+def gravar_checkpoint(cursor, nome, tabela, ultimo_id, linhas, concluido=False):
+    cursor.execute("""
+        INSERT INTO backfill_checkpoints (nome, tabela, ultimo_id, linhas, concluido)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            ultimo_id = VALUES(ultimo_id),
+            linhas = VALUES(linhas),
+            concluido = VALUES(concluido)
+    """, (nome, tabela, ultimo_id, linhas, int(concluido)))
+
+
+def _fim_da_faixa(cursor, tabela, chave, inicio, lote):
+    """Id da lote-ésima linha depois de `inicio` (None se sobrar menos que isso)"""
+    cursor.execute(f"""
+        SELECT {chave} FROM {tabela}
+        WHERE {chave} > %s
+        ORDER BY {chave}
+        LIMIT 1 OFFSET %s
+    """, (inicio, lote - 1))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def executar(nome, tabela, set_sql, set_params=(), where="1 = 1", where_params=(),
+             lote=BACKFILL_LOTE, pausa=BACKFILL_PAUSA, max_linhas_s=None,
+             chave="id", reiniciar=False):
+    """
+    UPDATE {tabela} SET {set_sql} WHERE {where}, em faixas de `chave` (a
+    chave primária ou outra coluna inteira indexada; se não for única, a
+    faixa só fica um pouco maior). `nome` identifica o checkpoint.
+    Retorna o total de linhas alteradas.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        preparar(cursor)
+        checkpoint = None if reiniciar else ler_checkpoint(cursor, nome)
+        if checkpoint and checkpoint[2]:
+            print(f"✓ {nome}: já concluído ({checkpoint[1]} linhas)")
+            return checkpoint[1]
+
+        inicio_id, linhas = (checkpoint[0], checkpoint[1]) if checkpoint else (0, 0)
+        cursor.execute(f"SELECT MIN({chave}), MAX({chave}) FROM {tabela}")
+        menor, maior = cursor.fetchone()
+        if maior is None:
+            gravar_checkpoint(cursor, nome, tabela, 0, 0, concluido=True)
+            conn.commit()
+            print(f"✓ {nome}: {tabela} vazia")
+            return 0
+
+        inicio_id = max(inicio_id, menor - 1)
+        if checkpoint:
+            print(f"→ {nome}: retomando de {chave} > {inicio_id} ({linhas} linhas já feitas)")
+
+        comeco = time.perf_counter()
+        ultimo_relatorio = comeco
+        linhas_sessao = 0
+        faixas = 0
+
+        while inicio_id < maior:
+            fim_id = _fim_da_faixa(cursor, tabela, chave, inicio_id, lote) or maior
+
+            for tentativa in range(TX_RETRIES + 1):
+                inicio_faixa = time.perf_counter()
+                try:
+                    conn.start_transaction()
+                    cursor.execute(f"""
+                        UPDATE {tabela} SET {set_sql}
+                        WHERE {chave} > %s AND {chave} <= %s AND ({where})
+                    """, (*set_params, inicio_id, fim_id, *where_params))
+                    alteradas = cursor.rowcount
+                    gravar_checkpoint(cursor, nome, tabela, fim_id, linhas + alteradas)
+                    conn.commit()
+                    break
+                except Exception as e:
+                    conn.rollback()
+                    if not is_write_conflict(e) or tentativa == TX_RETRIES:
+                        raise
+                    time.sleep(0.05 * (2 ** tentativa))
+            duracao = time.perf_counter() - inicio_faixa
+
+            linhas += alteradas
+            linhas_sessao += alteradas
+            faixas += 1
+            inicio_id = fim_id
+
+            # Ajusta o lote para cada faixa levar perto de BACKFILL_ALVO segundos
+            if duracao > BACKFILL_ALVO and lote > 1:
+                lote = max(lote // 2, 1)
+            elif duracao < BACKFILL_ALVO / 4:
+                lote = min(lote * 2, BACKFILL_LOTE_MAX)
+
+            espera = duracao * pausa
+            if max_linhas_s:
+                decorrido = time.perf_counter() - comeco
+                espera = max(espera, linhas_sessao / max_linhas_s - decorrido)
+            if espera > 0:
+                time.sleep(espera)
+
+            agora = time.perf_counter()
+            if agora - ultimo_relatorio >= BACKFILL_RELATORIO:
+                ultimo_relatorio = agora
+                progresso = (inicio_id - menor + 1) / (maior - menor + 1) * 100
+                print(
+                    f"  {nome}: {progresso:5.1f}% ({chave} {inicio_id}/{maior}), "
+                    f"{linhas} linhas, {linhas_sessao / (agora - comeco):.0f} linhas/s, lote {lote}"
+                )
+
+        gravar_checkpoint(cursor, nome, tabela, maior, linhas, concluido=True)
+        conn.commit()
+        decorrido = time.perf_counter() - comeco
+        print(
+            f"✓ {nome}: {linhas} linhas em {faixas} faixa(s), {decorrido:.1f} s "
+            f"({linhas_sessao / decorrido if decorrido else 0:.0f} linhas/s)"
+        )
+        return linhas
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill em lotes pela chave primária")
+    parser.add_argument("nome", help="identificador do checkpoint (para retomar)")
+    parser.add_argument("tabela")
+    parser.add_argument("set_sql", help='ex.: "oficina_id = 1"')
+    parser.add_argument("where", nargs="?", default="1 = 1", help='ex.: "oficina_id IS NULL"')
+    parser.add_argument("--lote", type=int, default=BACKFILL_LOTE)
+    parser.add_argument("--pausa", type=float, default=BACKFILL_PAUSA)
+    parser.add_argument("--max-linhas-s", type=float, default=None)
+    parser.add_argument("--reiniciar", action="store_true", help="ignora o checkpoint e começa do início")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"BACKFILL {args.nome}: UPDATE {args.tabela} SET {args.set_sql} WHERE {args.where}")
+    print("=" * 60)
+    executar(
+        args.nome, args.tabela, args.set_sql, where=args.where,
+        lote=args.lote, pausa=args.pausa, max_linhas_s=args.max_linhas_s,
+        reiniciar=args.reiniciar,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark do provider JSON: DefaultJSONProvider (jsonify padrão do Flask)
+contra o FastJSONProvider do app, em payloads parecidos com os reais
+(/ordens-servico, /financeiro e /dashboard).
+
+Também confere que as duas saídas são o mesmo JSON.
+
+Uso:
+    python benchmark_json.py [linhas] [repeticoes]
+"""
+
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from json_provider import FastJSONProvider, orjson
+
+NOMES = ["João Silva", "Maria Conceição", "José Araújo", "Ana Lúcia", "Pedro Gonçalves", "Carlos Souza"]
+MARCAS = [("Fiat", "Uno"), ("Volkswagen", "Gol"), ("Chevrolet", "Onix"), ("Ford", "Ká"), ("Honda", "Civic")]
+SERVICOS = ["Troca de óleo", "Alinhamento", "Balanceamento", "Revisão", "Freios"]
+STATUS = ["Aberta", "Em Andamento", "Finalizada", "Cancelada"]
+
+
+def gerar_ordens(n):
+    base = datetime(2024, 1, 1, 8, 0, 0)
+    ordens = []
+    for i in range(n):
+        marca, modelo = random.choice(MARCAS)
+        ordens.append({
+            "ordem_id": i + 1,
+            "nome_cliente": random.choice(NOMES),
+            "marca_veiculo": marca,
+            "modelo_veiculo": modelo,
+            "servico_nome": ", ".join(random.sample(SERVICOS, 2)),
+            "status": random.choice(STATUS),
+            "total": Decimal(random.randint(5000, 500000)) / 100,
+            "observacao": "Cliente pediu orçamento antes" if i % 3 else None,
+            "tem_financeiro": i % 2,
+            "created_at": base + timedelta(minutes=37 * i),
+        })
+    return ordens
+
+
+def gerar_financeiro(n):
+    base = datetime(2024, 1, 1, 8, 0, 0)
+    return [{
+        "id": i + 1,
+        "ordem_servico_id": i + 1 if i % 4 else None,
+        "tipo": "Receita" if i % 3 else "Despesa",
+        "valor": Decimal(random.randint(1000, 90000)) / 100,
+        "descricao": random.choice(SERVICOS),
+        "created_at": base + timedelta(hours=5 * i),
+    } for i in range(n)]
+
+
+def gerar_dashboard(n):
+    return {
+        "ordens_servico": gerar_ordens(n),
+        "pecas": [{
+            "id": i + 1,
+            "nome": f"Peça {i}",
+            "quantidade": random.randint(0, 50),
+            "status": "Em Estoque",
+            "preco_unitario": Decimal(random.randint(100, 20000)) / 100,
+        } for i in range(n // 5)],
+        "movimentacao_mensal": [{
+            "ano": 2024, "mes": m, "entradas": Decimal("12345.67"), "saidas": Decimal("2345.10")
+        } for m in range(1, 13)],
+        "resumo_mensal": {"entrada": Decimal("12345.67"), "saida": Decimal("2345.10"), "saldo": Decimal("10000.57")},
+    }
+
+
+def medir(provider, payload, repeticoes):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        provider.dumps(payload, separators=(",", ":"))
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    random.seed(42)
+
+    app = Flask(__name__)
+    padrao = DefaultJSONProvider(app)
+    rapido = FastJSONProvider(app)
+
+    payloads = {
+        "/ordens-servico": gerar_ordens(linhas),
+        "/financeiro": gerar_financeiro(linhas),
+        "/dashboard": gerar_dashboard(linhas),
+    }
+
+    print("=" * 72)
+    print(f"BENCHMARK JSON - {linhas} linhas, melhor de {repeticoes} ({'orjson' if orjson else 'stdlib'})")
+    print("=" * 72)
+    print(f"{'payload':<18}{'padrão (ms)':>14}{'rápido (ms)':>14}{'ganho':>10}  mesmo JSON")
+
+    ok = True
+    for nome, payload in payloads.items():
+        saida_padrao = padrao.dumps(payload, separators=(",", ":"))
+        saida_rapida = rapido.dumps(payload, separators=(",", ":"))
+        igual = json.loads(saida_padrao) == json.loads(saida_rapida)
+        ok = ok and igual
+
+        t_padrao = medir(padrao, payload, repeticoes) * 1000
+        t_rapido = medir(rapido, payload, repeticoes) * 1000
+        print(f"{nome:<18}{t_padrao:>14.2f}{t_rapido:>14.2f}{t_padrao / t_rapido:>9.1f}x  {'✓' if igual else '✗'}")
+
+    # Payload só ASCII: bytes idênticos ao jsonify padrão
+    ascii_payload = [{"id": 1, "total": Decimal("10.50"), "created_at": datetime(2024, 5, 17, 14, 3, 9)}]
+    bytes_iguais = padrao.dumps(ascii_payload, separators=(",", ":")) == rapido.dumps(ascii_payload, separators=(",", ":"))
+    ok = ok and bytes_iguais
+    print(f"\nSaída byte a byte idêntica (ASCII): {'✓' if bytes_iguais else '✗'}")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark da gravação dos serviços das OS (ordem_servico_servicos) no banco
+configurado no .env:
+
+  - por linha:      um INSERT por serviço (como criar_ordem_servico fazia)
+  - multi-linha/OS: um INSERT multi-linha por OS (POST /ordens-servico)
+  - lote:           um INSERT multi-linha para todas as OS (POST /ordens-servico/lote)
+
+Roda numa tabela temporária da sessão, dentro de transações desfeitas no
+fim, então não deixa nada no banco. Como o ganho vem das idas e voltas ao
+servidor, rode contra o banco real (TiDB Cloud), não localhost.
+
+Uso:
+    python benchmark_ordens_servico.py [ordens] [servicos_por_ordem] [repeticoes]
+"""
+
+import sys
+import time
+from connection import get_connection
+from database import LINHAS_POR_INSERT
+
+
+def por_linha(cursor, linhas):
+    for linha in linhas:
+        cursor.execute("INSERT INTO bench_oss (ordem_servico_id, servico_id) VALUES (%s, %s)", linha)
+
+
+def multi_linha(cursor, linhas):
+    for inicio in range(0, len(linhas), LINHAS_POR_INSERT):
+        lote = linhas[inicio:inicio + LINHAS_POR_INSERT]
+        cursor.execute(
+            "INSERT INTO bench_oss (ordem_servico_id, servico_id) VALUES " + ", ".join(["(%s, %s)"] * len(lote)),
+            [valor for linha in lote for valor in linha]
+        )
+
+
+def multi_linha_por_os(cursor, linhas, servicos):
+    for inicio in range(0, len(linhas), servicos):
+        multi_linha(cursor, linhas[inicio:inicio + servicos])
+
+
+def medir(conn, cursor, func, repeticoes):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        conn.start_transaction()
+        inicio = time.perf_counter()
+        func(cursor)
+        melhor = min(melhor, time.perf_counter() - inicio)
+        conn.rollback()
+    return melhor
+
+
+def main():
+    ordens = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    servicos = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    repeticoes = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    linhas = [(ordem, servico) for ordem in range(1, ordens + 1) for servico in range(1, servicos + 1)]
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("CREATE TEMPORARY TABLE bench_oss (ordem_servico_id INT NOT NULL, servico_id INT NOT NULL)")
+
+        print("=" * 72)
+        print(f"BENCHMARK SERVIÇOS DAS OS - {ordens} OS x {servicos} serviços = {len(linhas)} linhas, melhor de {repeticoes}")
+        print("=" * 72)
+        print(f"{'modo':<18}{'tempo (ms)':>14}{'linhas/s':>14}{'ganho':>10}")
+
+        base = None
+        for nome, func in (
+            ("por linha", lambda cur: por_linha(cur, linhas)),
+            ("multi-linha/OS", lambda cur: multi_linha_por_os(cur, linhas, servicos)),
+            ("lote", lambda cur: multi_linha(cur, linhas)),
+        ):
+            tempo = medir(conn, cursor, func, repeticoes)
+            base = base or tempo
+            print(f"{nome:<18}{tempo * 1000:>14.1f}{len(linhas) / tempo:>14.0f}{base / tempo:>9.1f}x")
+    finally:
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS bench_oss")
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Cache de respostas por oficina, com despejo LRU/TTL.
+
+A chave é (endpoint, oficina_id, argumentos da query). Cada entrada guarda
+as versões das entidades de que a resposta depende (versoes.py); se alguma
+escrita incrementou uma delas, a entrada é descartada em vez de servida.
+"""
+
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, current_app, request
+from sessao import oficina_da_requisicao
+from versoes import versoes_atuais
+
+CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "1000"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+
+
+class _Entrada:
+    __slots__ = ("versoes", "expira_em", "corpo", "status", "mimetype")
+
+    def __init__(self, versoes, expira_em, corpo, status, mimetype):
+        self.versoes = versoes
+        self.expira_em = expira_em
+        self.corpo = corpo
+        self.status = status
+        self.mimetype = mimetype
+
+
+class CacheRespostas:
+    def __init__(self, max_entradas, ttl):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "stale": 0,
+            "expired": 0,
+            "evictions": 0,
+        }
+
+    def obter(self, chave, versoes):
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is None:
+                self._stats["misses"] += 1
+                return None
+            if entrada.versoes != versoes:
+                # Alguma escrita mudou os dados desde que a resposta foi guardada
+                del self._dados[chave]
+                self._stats["stale"] += 1
+                self._stats["misses"] += 1
+                return None
+            if entrada.expira_em <= time.monotonic():
+                del self._dados[chave]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._dados.move_to_end(chave)
+            self._stats["hits"] += 1
+            return entrada
+
+    def guardar(self, chave, versoes, corpo, status, mimetype):
+        entrada = _Entrada(versoes, time.monotonic() + self.ttl, corpo, status, mimetype)
+        with self._lock:
+            self._dados[chave] = entrada
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+    def stats(self):
+        with self._lock:
+            dados = dict(self._stats)
+            dados.update({
+                "entradas": len(self._dados),
+                "max_entradas": self.max_entradas,
+                "ttl": self.ttl,
+            })
+            return dados
+
+
+respostas = CacheRespostas(CACHE_MAX_ENTRADAS, CACHE_TTL)
+
+
+def em_cache(*entidades):
+    """
+    Guarda a resposta do GET por (endpoint, oficina_id, argumentos), válida
+    enquanto as versões das entidades listadas não mudarem.
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            oficina_id = oficina_da_requisicao()
+            if not oficina_id:
+                return f(*args, **kwargs)
+
+            todas = versoes_atuais(oficina_id)
+            versoes = tuple(todas[entidade] for entidade in entidades)
+            chave = (request.endpoint, oficina_id, tuple(sorted(request.args.items(multi=True))))
+
+            entrada = respostas.obter(chave, versoes)
+            if entrada is not None:
+                response = Response(entrada.corpo, status=entrada.status, mimetype=entrada.mimetype)
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            response = current_app.make_response(f(*args, **kwargs))
+            # Respostas em streaming não são guardadas (o objetivo delas é não bufferizar)
+            if response.status_code == 200 and not response.is_streamed:
+                respostas.guardar(chave, versoes, response.get_data(), response.status_code, response.mimetype)
+            response.headers["X-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    return respostas.stats()
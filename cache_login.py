@@ -0,0 +1,107 @@
+"""
+Cache do login por email: registros de usuário e emails inexistentes.
+
+Rajadas de login (início do expediente, tentativas com email errado ou
+força bruta) não precisam ir ao banco a cada tentativa. O worker guarda o
+registro de autenticação do usuário por LOGIN_CACHE_TTL segundos e a
+ausência de um email por LOGIN_CACHE_NEGATIVO_TTL segundos.
+
+editar_usuario/deletar_usuario/criar_usuario invalidam as entradas no
+worker que atendeu a escrita, depois do commit. Um login que leu o banco
+antes do commit não regrava o registro antigo: guardar recebe a geração
+lida antes da consulta e descarta o registro se houve invalidação no meio.
+
+Nos outros workers a entrada só vence pelo TTL, então o /login não emite
+token só com o cache: com a senha conferida, relê o usuário pela chave
+primária (ativo, mesma senha, cargo e oficina). Emails inexistentes
+continuam no cache, pois só servem para recusar.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+LOGIN_CACHE_TTL = float(os.getenv("LOGIN_CACHE_TTL", "30"))
+LOGIN_CACHE_NEGATIVO_TTL = float(os.getenv("LOGIN_CACHE_NEGATIVO_TTL", "10"))
+LOGIN_CACHE_MAX = int(os.getenv("LOGIN_CACHE_MAX", "5000"))
+
+
+def normalizar_email(email):
+    """Emails são gravados e buscados sem espaços e em minúsculas"""
+    return (email or "").strip().lower()
+
+
+class CacheLogin:
+    def __init__(self, max_entradas, ttl, ttl_negativo):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        # {email: (expira_em, registro ou None)}
+        self._dados = OrderedDict()
+        # {usuario_id: email}, para invalidar sem saber o email antigo
+        self._emails = {}
+        self._lock = threading.Lock()
+        # Incrementada a cada invalidação
+        self._geracao = 0
+        self._stats = {
+            "hits": 0, "hits_negativos": 0, "misses": 0, "invalidacoes": 0,
+            "descartados": 0, "evictions": 0,
+        }
+
+    def obter(self, email):
+        """(achou_no_cache, registro); registro None é email inexistente"""
+        with self._lock:
+            entrada = self._dados.get(email)
+            if entrada is None or entrada[0] <= time.monotonic():
+                self._stats["misses"] += 1
+                return False, None
+            self._dados.move_to_end(email)
+            if entrada[1] is None:
+                self._stats["hits_negativos"] += 1
+            else:
+                self._stats["hits"] += 1
+            return True, entrada[1]
+
+    def geracao(self):
+        """Ler antes de consultar o banco e passar para guardar()"""
+        with self._lock:
+            return self._geracao
+
+    def guardar(self, email, registro, geracao=None):
+        ttl = self.ttl if registro else self.ttl_negativo
+        with self._lock:
+            if geracao is not None and geracao != self._geracao:
+                # Houve escrita commitada durante a consulta: pode ser o registro antigo
+                self._stats["descartados"] += 1
+                return
+            self._dados[email] = (time.monotonic() + ttl, registro)
+            self._dados.move_to_end(email)
+            if registro:
+                self._emails[registro["id"]] = email
+            while len(self._dados) > self.max_entradas:
+                _, (_, antigo) = self._dados.popitem(last=False)
+                if antigo:
+                    self._emails.pop(antigo["id"], None)
+                self._stats["evictions"] += 1
+
+    def invalidar(self, email=None, usuario_id=None):
+        with self._lock:
+            self._geracao += 1
+            emails = {normalizar_email(email)} if email else set()
+            if usuario_id is not None and int(usuario_id) in self._emails:
+                emails.add(self._emails.pop(int(usuario_id)))
+            for chave in emails:
+                if self._dados.pop(chave, None) is not None:
+                    self._stats["invalidacoes"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "entradas": len(self._dados), "max_entradas": self.max_entradas}
+
+
+usuarios_login = CacheLogin(LOGIN_CACHE_MAX, LOGIN_CACHE_TTL, LOGIN_CACHE_NEGATIVO_TTL)
+
+
+def login_cache_stats():
+    return usuarios_login.stats()
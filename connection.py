@@ -1,6 +1,13 @@
 import mysql.connector
+import functools
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from flask import current_app, g, request
 
 load_dotenv()
 
@@ -21,19 +28,667 @@ config = {
 # Remover valores None do config
 config = {k: v for k, v in config.items() if v is not None}
 
+
+def _gevent_ativo():
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("socket")
+
+
+# No worker gevent (Procfile) a extensão C do conector bloquearia o processo
+# inteiro durante cada consulta; o driver em Python puro usa o socket do gevent
+if _gevent_ativo():
+    config["use_pure"] = True
+
+# Configuração do pool (vale para cada worker do gunicorn)
+pool_config = {
+    # Máximo de conexões abertas por processo
+    "size": int(os.getenv("DB_POOL_SIZE", "5")),
+    # Segundos esperando uma conexão livre antes de desistir
+    "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+    # Conexões mais velhas que isso são descartadas (evita cortes do proxy do TiDB Cloud)
+    "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+    # Conexões ociosas por mais que isso são fechadas
+    "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+    # Só faz ping no checkout se a conexão ficou parada mais que isso
+    "validate_after": float(os.getenv("DB_POOL_VALIDATE_AFTER", "30")),
+}
+
+
+class PoolTimeout(Exception):
+    """Nenhuma conexão livre no pool dentro do tempo limite"""
+
+
+class _PoolEntry:
+    __slots__ = ("raw", "created_at", "last_used")
+
+    def __init__(self, raw):
+        now = time.monotonic()
+        self.raw = raw
+        self.created_at = now
+        self.last_used = now
+
+
+class PooledConnection:
+    """Conexão emprestada do pool; close() devolve ao pool em vez de fechar o socket"""
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    def __getattr__(self, name):
+        entry = self.__dict__.get("_entry")
+        if entry is None:
+            raise AttributeError(f"Conexão já devolvida ao pool (acesso a '{name}')")
+        return getattr(entry.raw, name)
+
+    def close(self):
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._pool.release(entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """Pool de conexões com validação barata, tempo de vida máximo e despejo de ociosas"""
+
+    def __init__(self, db_config, size, timeout, max_lifetime, max_idle, validate_after):
+        self.db_config = db_config
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.validate_after = validate_after
+        self.pid = os.getpid()
+
+        self._cond = threading.Condition()
+        self._idle = []  # pilha LIFO: reaproveita a conexão mais recente
+        self._total = 0
+        self._in_use = 0
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_ms": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "closed": 0,
+            "validations": 0,
+            "validation_failures": 0,
+            "evicted_lifetime": 0,
+            "evicted_idle": 0,
+            "peak_in_use": 0,
+        }
+
+    # -------------------------------------------------
+    # Checkout / devolução
+    # -------------------------------------------------
+    def acquire(self):
+        inicio = time.monotonic()
+        deadline = inicio + self.timeout
+        entry = None
+        to_close = []
+
+        with self._cond:
+            self._stats["checkouts"] += 1
+            waited = False
+            while True:
+                to_close.extend(self._evict_locked(time.monotonic()))
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._total < self.size:
+                    # Reserva a vaga; a conexão é criada fora do lock
+                    self._total += 1
+                    break
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"Nenhuma conexão disponível em {self.timeout}s (pool de {self.size})"
+                    )
+                self._cond.wait(remaining)
+
+            self._in_use += 1
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._in_use)
+            if waited:
+                self._stats["wait_time_ms"] += (time.monotonic() - inicio) * 1000
+
+        for raw in to_close:
+            self._close_raw(raw)
+
+        try:
+            if entry is not None and not self._is_alive(entry):
+                self._close_raw(entry.raw)
+                entry = None
+            if entry is None:
+                entry = _PoolEntry(self._connect())
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        return PooledConnection(self, entry)
+
+    def release(self, entry):
+        now = time.monotonic()
+        reusable = now - entry.created_at < self.max_lifetime
+        if reusable:
+            reusable = self._reset(entry.raw)
+        else:
+            with self._cond:
+                self._stats["evicted_lifetime"] += 1
+
+        if not reusable:
+            self._close_raw(entry.raw)
+
+        with self._cond:
+            self._in_use -= 1
+            if reusable:
+                entry.last_used = now
+                self._idle.append(entry)
+            else:
+                self._total -= 1
+            self._cond.notify()
+
+    # -------------------------------------------------
+    # Internos
+    # -------------------------------------------------
+    def _connect(self):
+        try:
+            raw = mysql.connector.connect(**self.db_config)
+        except mysql.connector.Error as err:
+            print(f"Erro MySQL/TiDB: {err}")
+            print(f"Host: {self.db_config.get('host')}:{self.db_config.get('port')}")
+            raise Exception(f"Erro ao conectar ao banco de dados: {str(err)}")
+        with self._cond:
+            self._stats["created"] += 1
+        return raw
+
+    def _close_raw(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._stats["closed"] += 1
+
+    def _is_alive(self, entry):
+        """Validação barata: só faz ping (sem retry) se a conexão ficou ociosa por um tempo"""
+        now = time.monotonic()
+        if now - entry.created_at >= self.max_lifetime:
+            with self._cond:
+                self._stats["evicted_lifetime"] += 1
+            return False
+        if now - entry.last_used < self.validate_after:
+            return True
+        with self._cond:
+            self._stats["validations"] += 1
+        try:
+            entry.raw.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._cond:
+                self._stats["validation_failures"] += 1
+            return False
+
+    def _reset(self, raw):
+        """Deixa a conexão limpa para o próximo checkout; False se não der para reaproveitar"""
+        try:
+            if raw.unread_result:
+                raw.consume_results()
+            if raw.in_transaction:
+                raw.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _evict_locked(self, now):
+        """Remove do pool as conexões ociosas ou velhas demais (chamar com o lock)"""
+        keep, evicted = [], []
+        for entry in self._idle:
+            if now - entry.created_at >= self.max_lifetime:
+                self._stats["evicted_lifetime"] += 1
+                evicted.append(entry.raw)
+            elif now - entry.last_used >= self.max_idle:
+                self._stats["evicted_idle"] += 1
+                evicted.append(entry.raw)
+            else:
+                keep.append(entry)
+        if evicted:
+            self._idle = keep
+            self._total -= len(evicted)
+        return evicted
+
+    def stats(self):
+        with self._cond:
+            dados = dict(self._stats)
+            dados["wait_time_ms"] = round(dados["wait_time_ms"], 2)
+            dados.update({
+                "size": self.size,
+                "open": self._total,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "pid": self.pid,
+            })
+            return dados
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Pool do processo atual (recriado após fork dos workers do gunicorn)"""
+    global _pool
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                _pool = ConnectionPool(config, **pool_config)
+    return _pool
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
 def get_connection():
     try:
-        print(f"Tentando conectar ao banco: {config.get('host')}:{config.get('port')}")
-        print(f"Database: {config.get('database')}, User: {config.get('user')}")
-        
-        conn = mysql.connector.connect(**config)
-        conn.ping(reconnect=True, attempts=3, delay=2)
-        print("Conexão estabelecida com sucesso!")
-        return conn
-    except mysql.connector.Error as err:
-        print(f"Erro MySQL/TiDB: {err}")
-        print(f"Config usado: {config}")
-        raise Exception(f"Erro ao conectar ao banco de dados: {str(err)}")
+        return get_pool().acquire()
+    except PoolTimeout as e:
+        print(f"Pool esgotado: {e}")
+        raise Exception(f"Erro ao conectar ao banco de dados: {str(e)}")
     except Exception as e:
         print(f"Erro geral: {e}")
         raise
+
+
+# =====================================================
+# CONSULTAS EM PARALELO (UMA CONEXÃO DO POOL POR CONSULTA)
+# =====================================================
+# As consultas em paralelo de TODAS as requisições do worker dividem estas
+# threads, cada uma ocupando uma conexão do pool enquanto roda. Por isso o
+# pool precisa de pelo menos DB_PARALLEL_WORKERS + 1 conexões por worker do
+# gunicorn (uma sobra para as consultas feitas na própria requisição), e a
+# requisição devolve a sua conexão (liberar_db) antes de esperar por elas:
+# segurar uma conexão esperando outras trava o pool quando várias chegam juntas.
+PARALLEL_WORKERS = int(os.getenv("DB_PARALLEL_WORKERS", "4"))
+if PARALLEL_WORKERS > pool_config["size"] - 1:
+    print(
+        f"⚠️ DB_PARALLEL_WORKERS={PARALLEL_WORKERS} não cabe no DB_POOL_SIZE={pool_config['size']}: "
+        f"usando {max(1, pool_config['size'] - 1)}"
+    )
+    PARALLEL_WORKERS = max(1, pool_config["size"] - 1)
+
+_executor = None
+_executor_pid = None
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _pool_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=PARALLEL_WORKERS, thread_name_prefix="db")
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _rodar_consulta(func):
+    inicio = time.perf_counter()
+    conn = get_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            resultado = func(cursor)
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+    return resultado, (time.perf_counter() - inicio) * 1000
+
+
+def consultar_em_paralelo(consultas):
+    """
+    Dispara as consultas independentes em threads limitadas (DB_PARALLEL_WORKERS),
+    cada uma na sua conexão do pool. consultas: {nome: função(cursor) -> resultado}.
+    Retorna os futures; use aguardar_consultas() para juntar os resultados.
+    """
+    executor = _get_executor()
+    return {nome: executor.submit(_rodar_consulta, func) for nome, func in consultas.items()}
+
+
+def aguardar_consultas(futuros):
+    """Resultados e tempos (ms) de cada consulta disparada por consultar_em_paralelo()"""
+    resultados, tempos = {}, {}
+    for nome, futuro in futuros.items():
+        resultados[nome], tempos[nome] = futuro.result()
+    return resultados, tempos
+
+
+def server_timing(tempos):
+    """Valor do header Server-Timing a partir de {nome: ms}"""
+    return ", ".join(f"{nome};dur={ms:.1f}" for nome, ms in tempos.items())
+
+
+# =====================================================
+# CONEXÃO POR REQUISIÇÃO (flask.g) + DETECTOR DE VAZAMENTO
+# =====================================================
+class TrackedCursor:
+    """Cursor que avisa a conexão da requisição quando é fechado"""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def execute(self, *args, **kwargs):
+        try:
+            return self._raw.execute(*args, **kwargs)
+        except mysql.connector.Error as err:
+            _registrar_conflito(err)
+            raise
+
+    def executemany(self, *args, **kwargs):
+        try:
+            return self._raw.executemany(*args, **kwargs)
+        except mysql.connector.Error as err:
+            _registrar_conflito(err)
+            raise
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._raw.close()
+
+
+class RequestConnection:
+    """Conexão única da requisição; é devolvida ao pool no teardown, nunca pelo handler"""
+
+    def __init__(self, pooled):
+        self._pooled = pooled
+        self._cursors = []
+        self.closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._pooled, name)
+
+    def cursor(self, *args, **kwargs):
+        cur = TrackedCursor(self._pooled.cursor(*args, **kwargs))
+        self._cursors.append(cur)
+        return cur
+
+    def commit(self):
+        uow = g.get("_uow")
+        if uow is not None:
+            # Dentro de uma unidade de trabalho quem confirma é o @transacional
+            return
+        self._pooled.commit()
+        _contar_commit()
+
+    def rollback(self):
+        uow = g.get("_uow")
+        if uow is not None:
+            uow.rollback_only = True
+        self._pooled.rollback()
+
+    def close(self):
+        # O handler terminou de usar; a devolução real acontece no teardown
+        self.closed = True
+
+    def open_cursors(self):
+        return [c for c in self._cursors if not c.closed]
+
+    def release(self):
+        for cur in self.open_cursors():
+            try:
+                cur.close()
+            except Exception:
+                pass
+        self._cursors = []
+        self._pooled.close()
+
+
+_request_lock = threading.Lock()
+_request_stats = {
+    "requests_with_db": 0,
+    "leaked_connections": 0,
+    "leaked_cursors": 0,
+    "transactions": 0,
+    "commits": 0,
+    "rollbacks": 0,
+    "write_conflicts": 0,
+    "retries": 0,
+}
+
+
+def get_db():
+    """Conexão compartilhada por toda a requisição atual"""
+    conn = g.get("_db_conn")
+    if conn is None:
+        conn = RequestConnection(get_connection())
+        g._db_conn = conn
+    else:
+        conn.closed = False
+    return conn
+
+
+def liberar_db():
+    """
+    Devolve já ao pool a conexão da requisição. Use antes de esperar por
+    consultas em outras conexões do pool (consultar_em_paralelo): segurar
+    uma conexão enquanto espera outras esgota o pool sob concorrência.
+    Um get_db() depois disso pega outra conexão.
+    """
+    if g.get("_uow") is not None:
+        raise RuntimeError("liberar_db() dentro de @transacional")
+    conn = g.pop("_db_conn", None)
+    if conn is not None:
+        conn.release()
+
+
+def _teardown_db(exc=None):
+    conn = g.pop("_db_conn", None)
+    if conn is None:
+        return
+
+    cursores_abertos = len(conn.open_cursors())
+    conexao_aberta = not conn.closed
+    with _request_lock:
+        _request_stats["requests_with_db"] += 1
+        _request_stats["leaked_cursors"] += cursores_abertos
+        _request_stats["leaked_connections"] += int(conexao_aberta)
+
+    if conexao_aberta or cursores_abertos:
+        print(
+            f"⚠️ Vazamento em {request.method} {request.path}: "
+            f"conexão aberta={conexao_aberta}, cursores abertos={cursores_abertos}"
+        )
+
+    try:
+        conn.release()
+    except Exception as e:
+        print(f"Erro ao devolver conexão ao pool: {e}")
+
+
+def _incrementar(chave, n=1):
+    with _request_lock:
+        _request_stats[chave] += n
+
+
+def _contar_commit():
+    g._db_commits = g.get("_db_commits", 0) + 1
+    _incrementar("commits")
+
+
+def _add_commit_header(response):
+    commits = g.get("_db_commits")
+    if commits is not None:
+        response.headers["X-DB-Commits"] = str(commits)
+    return response
+
+
+def request_stats():
+    with _request_lock:
+        return dict(_request_stats)
+
+
+def init_app(app):
+    """Registra a devolução garantida da conexão ao final de cada requisição"""
+    app.after_request(_add_commit_header)
+    app.teardown_request(_teardown_db)
+
+
+# =====================================================
+# UNIDADE DE TRABALHO (UMA TRANSAÇÃO POR REQUISIÇÃO)
+# =====================================================
+# Erros do TiDB/MySQL em que a transação inteira pode ser repetida:
+# 1213 deadlock, 8002 conflito em SELECT FOR UPDATE, 8022 retry de transação,
+# 8028 schema mudou durante a transação, 9007 conflito de escrita
+WRITE_CONFLICT_ERRNOS = {1213, 8002, 8022, 8028, 9007}
+TX_RETRIES = int(os.getenv("DB_TX_RETRIES", "3"))
+
+
+def is_write_conflict(err):
+    return getattr(err, "errno", None) in WRITE_CONFLICT_ERRNOS
+
+
+def _registrar_conflito(err):
+    uow = g.get("_uow")
+    if uow is not None and is_write_conflict(err):
+        uow.conflito = err
+
+
+class UnitOfWork:
+    """Transação explícita sobre a conexão da requisição, com savepoints"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rollback_only = False
+        self.conflito = None
+        self._savepoints = 0
+        self._apos_commit = []
+
+    def begin(self):
+        self.conn._pooled.start_transaction()
+        _incrementar("transactions")
+
+    def commit(self):
+        self.conn._pooled.commit()
+        _contar_commit()
+        for func in self._apos_commit:
+            try:
+                func()
+            except Exception as e:
+                print(f"Erro após o commit: {e}")
+
+    def apos_commit(self, func):
+        """Agenda func para depois do commit; descartada em rollback ou retry"""
+        self._apos_commit.append(func)
+
+    def rollback(self):
+        try:
+            self.conn._pooled.rollback()
+        except Exception as e:
+            print(f"Erro no rollback: {e}")
+        _incrementar("rollbacks")
+
+    @contextmanager
+    def savepoint(self, nome=None):
+        """Desfaz só o bloco em caso de erro, mantendo o resto da transação"""
+        self._savepoints += 1
+        nome = nome or f"sp_{self._savepoints}"
+        cursor = self.conn._pooled.cursor()
+        try:
+            cursor.execute(f"SAVEPOINT {nome}")
+            try:
+                yield nome
+            except Exception:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {nome}")
+                raise
+            cursor.execute(f"RELEASE SAVEPOINT {nome}")
+        finally:
+            cursor.close()
+
+
+def transacao_atual():
+    """Unidade de trabalho ativa na requisição (ou None)"""
+    return g.get("_uow")
+
+
+def apos_commit(func, *args, **kwargs):
+    """
+    Roda func depois do commit da transação da requisição (ex.: invalidar
+    caches, que antes disso seriam repovoados com os dados antigos). Sem
+    @transacional ativo, roda na hora.
+    """
+    uow = g.get("_uow")
+    if uow is None:
+        func(*args, **kwargs)
+    else:
+        uow.apos_commit(functools.partial(func, *args, **kwargs))
+
+
+def transacional(f):
+    """
+    Executa o handler dentro de uma única transação: commit se a resposta
+    for de sucesso (< 400), rollback caso contrário. Conflitos de escrita do
+    TiDB repetem o handler inteiro com backoff.
+    """
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        for tentativa in range(1, TX_RETRIES + 1):
+            uow = UnitOfWork(get_db())
+            # A conexão foi aberta pelo decorator: só conta como emprestada
+            # (e vazada, se não for fechada) quando o handler chamar get_db()
+            uow.conn.closed = True
+            g._uow = uow
+            uow.begin()
+            response = None
+            try:
+                response = current_app.make_response(f(*args, **kwargs))
+                if uow.conflito is None:
+                    if response.status_code < 400 and not uow.rollback_only:
+                        uow.commit()
+                    else:
+                        uow.rollback()
+                    return response
+                erro = uow.conflito
+            except mysql.connector.Error as err:
+                if not is_write_conflict(err):
+                    uow.rollback()
+                    raise
+                erro = err
+            except Exception:
+                uow.rollback()
+                raise
+            finally:
+                g._uow = None
+
+            # Conflito de escrita: desfaz tudo e repete o handler do zero
+            uow.rollback()
+            _incrementar("write_conflicts")
+            if tentativa == TX_RETRIES:
+                print(f"Conflito de escrita persistente em {request.path}: {erro}")
+                if response is not None:
+                    return response
+                raise erro
+            _incrementar("retries")
+            time.sleep(0.02 * (2 ** (tentativa - 1)) * (1 + random.random()))
+    return wrapper
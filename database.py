@@ -1,8 +1,25 @@
-from flask import Blueprint, jsonify, request
-from connection import get_connection
+from flask import Blueprint, Response, current_app, g, jsonify, request, stream_with_context
+from connection import (
+    apos_commit, get_db, liberar_db, pool_stats, request_stats, transacional, transacao_atual,
+    consultar_em_paralelo, aguardar_consultas, server_timing
+)
 from datetime import datetime
-import bcrypt
+from decimal import Decimal
+from time import perf_counter
+import base64
+import json
 import os
+import estatisticas_clientes
+import financeiro_mensal
+import resumo_os
+import senhas
+import sincronizacao
+from eventos import HubLotado, get_hub, hub_stats, transmitir
+from senhas import SenhaOcupada, senha_stats
+from sessao import SESSAO_OBRIGATORIA, emitir, oficina_da_requisicao, sessao_stats
+from cache import cache_stats, em_cache
+from cache_login import login_cache_stats, normalizar_email, usuarios_login
+from versoes import altera, etag
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
@@ -29,38 +46,247 @@ def debug():
     }
     return jsonify(env_vars), 200
 
+@dashboard_bp.route("/debug/pool", methods=["GET"])
+def debug_pool():
+    """Estatísticas do pool de conexões deste worker (para dimensionar DB_POOL_SIZE)"""
+    return jsonify({**pool_stats(), **request_stats()}), 200
+
+@dashboard_bp.route("/debug/cache", methods=["GET"])
+def debug_cache():
+    """Acertos, falhas e despejos do cache de respostas deste worker"""
+    return jsonify(cache_stats()), 200
+
+@dashboard_bp.route("/debug/eventos", methods=["GET"])
+def debug_eventos():
+    """Assinantes SSE e consultas do hub de eventos deste worker"""
+    return jsonify(hub_stats()), 200
+
+@dashboard_bp.route("/debug/senhas", methods=["GET"])
+def debug_senhas():
+    """Fila, tempos e recusas do pool de hash de senhas deste worker"""
+    return jsonify(senha_stats()), 200
+
+@dashboard_bp.route("/debug/sessoes", methods=["GET"])
+def debug_sessoes():
+    """Acertos e tokens recusados do cache de sessões deste worker"""
+    return jsonify(sessao_stats()), 200
+
+@dashboard_bp.route("/debug/login", methods=["GET"])
+def debug_login():
+    """Acertos (inclusive de emails inexistentes) do cache de login deste worker"""
+    return jsonify(login_cache_stats()), 200
+
 # =====================================================
 # FUNÇÕES DE SEGURANÇA
 # =====================================================
 def hash_password(password):
-    """Gera hash de senha usando bcrypt"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    """Gera hash de senha usando bcrypt (no pool de senhas, ver senhas.py)"""
+    return senhas.gerar_hash(password)
+
+def resposta_senha_ocupada():
+    """503 quando a fila de hash de senhas do worker está cheia"""
+    resposta = jsonify({"erro": "Muitos logins simultâneos, tente novamente em instantes"})
+    resposta.headers["Retry-After"] = "1"
+    return resposta, 503
+
+# =====================================================
+# FUNÇÕES DE FINANCEIRO
+# =====================================================
+def lancar_receita_os(cursor, ordem_servico_id, valor, oficina_id):
+    """
+    Cria ou atualiza a receita da OS em um único comando atômico.
+    Depende da chave única uk_financeiro_receita_os (migrations/003_receita_unica.sql),
+    então finalizações simultâneas da mesma OS nunca geram receita duplicada.
+    O resumo mensal é ajustado na mesma transação.
+    """
+    where = "ordem_servico_id = %s AND tipo = 'Receita' AND oficina_id = %s"
+    financeiro_mensal.ajustar(cursor, where, (ordem_servico_id, oficina_id), -1)
+    cursor.execute("""
+        INSERT INTO financeiro
+        (ordem_servico_id, tipo, valor, oficina_id, created_at)
+        VALUES (%s, 'Receita', %s, %s, NOW())
+        ON DUPLICATE KEY UPDATE valor = VALUES(valor)
+    """, (ordem_servico_id, valor, oficina_id))
+    financeiro_mensal.ajustar(cursor, where, (ordem_servico_id, oficina_id), 1)
+
+def remover_receita_os(cursor, ordem_servico_id, oficina_id):
+    """Remove a receita vinculada à OS, descontando do resumo mensal e deixando lápide para o /sync"""
+    where = "ordem_servico_id = %s AND tipo = 'Receita' AND oficina_id = %s"
+    financeiro_mensal.ajustar(cursor, where, (ordem_servico_id, oficina_id), -1)
+    sincronizacao.registrar_exclusao(cursor, "financeiro", where, (ordem_servico_id, oficina_id))
+    cursor.execute(f"DELETE FROM financeiro WHERE {where}", (ordem_servico_id, oficina_id))
+
+# =====================================================
+# FUNÇÕES DE PAGINAÇÃO (KEYSET)
+# =====================================================
+PAGINA_MAX = 500
+
+def ler_paginacao(n_chaves):
+    """
+    Lê `limit` e `after` da query string. Retorna (pagina, erro):
+    pagina é None quando o cliente não pediu paginação (lista completa).
+    n_chaves é o número de colunas da ordenação guardadas no cursor.
+    """
+    limit = request.args.get("limit")
+    after = request.args.get("after")
+    if limit is None and after is None:
+        return None, None
+
+    try:
+        limit = min(max(int(limit or PAGINA_MAX), 1), PAGINA_MAX)
+    except ValueError:
+        return None, (jsonify({"erro": "limit deve ser um número inteiro"}), 400)
+
+    chave = None
+    if after:
+        try:
+            chave = json.loads(base64.urlsafe_b64decode(after.encode("ascii")))
+            if not isinstance(chave, list) or len(chave) != n_chaves:
+                raise ValueError
+            # Colunas da ordenação podem ser NULL; o id (última) nunca
+            if not all(v is None or isinstance(v, (str, int, float)) for v in chave) or chave[-1] is None:
+                raise ValueError
+        except Exception:
+            return None, (jsonify({"erro": "Cursor de paginação inválido"}), 400)
+
+    return {"limit": limit, "after": chave}, None
+
+def filtro_keyset(colunas, pagina):
+    """
+    Monta o predicado "depois do cursor" para a ordenação dada.
+    colunas: lista de (expressão SQL, "ASC" | "DESC"), a última deve ser o id.
+    Retorna (sql começando com AND, parâmetros).
+
+    Valores NULL no cursor seguem a ordenação do MySQL/TiDB (NULL vem
+    primeiro no ASC e por último no DESC): a igualdade usa <=> e o "depois"
+    de um NULL no ASC são os não nulos.
+    """
+    if not pagina or not pagina["after"]:
+        return "", ()
+    chave = pagina["after"]
+
+    ors, params = [], []
+    for i, (expr, direcao) in enumerate(colunas):
+        valor = chave[i]
+        if valor is None:
+            if direcao == "DESC":
+                # Nada vem depois de NULL no DESC além dos empates (próximas colunas)
+                continue
+            depois, params_depois = f"{expr} IS NOT NULL", []
+        elif direcao == "DESC" and i < len(colunas) - 1:
+            depois, params_depois = f"({expr} < %s OR {expr} IS NULL)", [valor]
+        elif direcao == "DESC":
+            depois, params_depois = f"{expr} < %s", [valor]
+        else:
+            depois, params_depois = f"{expr} > %s", [valor]
+        ands = [f"{colunas[j][0]} <=> %s" for j in range(i)]
+        ands.append(depois)
+        ors.append("(" + " AND ".join(ands) + ")")
+        params.extend(chave[:i])
+        params.extend(params_depois)
+    return "AND (" + " OR ".join(ors) + ")", tuple(params)
+
+def sql_limite(pagina, padrao=None):
+    """LIMIT da consulta: busca um item a mais para saber se existe próxima página"""
+    if pagina:
+        return f"LIMIT {pagina['limit'] + 1}"
+    return f"LIMIT {int(padrao)}" if padrao else ""
+
+def montar_pagina(dados, limit, chaves):
+    """Envelope {dados, proximo_cursor} de uma consulta feita com LIMIT limit + 1"""
+    proximo = None
+    if len(dados) > limit:
+        dados = dados[:limit]
+        ultimo = dados[-1]
+        valores = [str(ultimo[k]) if isinstance(ultimo[k], (datetime, Decimal)) else ultimo[k] for k in chaves]
+        proximo = base64.urlsafe_b64encode(json.dumps(valores).encode("utf-8")).decode("ascii")
+    return {"dados": dados, "proximo_cursor": proximo}
+
+def responder_pagina(dados, pagina, chaves):
+    """Lista completa (sem paginação) ou envelope com o cursor da próxima página"""
+    if not pagina:
+        return jsonify(dados)
+    return jsonify(montar_pagina(dados, pagina["limit"], chaves))
+
+# =====================================================
+# FUNÇÕES DE STREAMING JSON
+# =====================================================
+STREAM_LOTE = 500
+
+def usar_stream(pagina):
+    """Listas completas saem em streaming, a não ser que o cliente peça stream=0"""
+    return pagina is None and request.args.get("stream", "1") != "0"
+
+def json_compacto(obj):
+    """Mesmo formato do jsonify (provider do app, sem espaços)"""
+    return current_app.json.dumps(obj, separators=(",", ":"))
+
+def linhas_json(cursor):
+    """Fragmentos do array JSON de uma consulta já executada, lidos em lotes com fetchmany"""
+    yield "["
+    separador = ""
+    while True:
+        lote = cursor.fetchmany(STREAM_LOTE)
+        if not lote:
+            break
+        yield separador + ",".join(json_compacto(linha) for linha in lote)
+        separador = ","
+    yield "]"
+
+def responder_stream(conn, cursor, *partes):
+    """
+    Resposta JSON em streaming. Cada parte é uma string ou um gerador de
+    fragmentos; cursor e conexão só são liberados depois do último byte.
+    """
+    def gerar():
+        try:
+            for parte in partes:
+                if isinstance(parte, str):
+                    yield parte
+                else:
+                    yield from parte
+            yield "\n"
+        finally:
+            cursor.close()
+            conn.close()
 
-def verify_password(password, hashed_password):
-    """Verifica se a senha corresponde ao hash"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return Response(stream_with_context(gerar()), mimetype="application/json")
 
 # =====================================================
 # OFICINAS - GERENCIAMENTO
 # =====================================================
 @dashboard_bp.route("/oficinas", methods=["GET"])
 def listar_oficinas():
+    pagina, erro = ler_paginacao(2)
+    if erro:
+        return erro
+
     try:
-        conn = get_connection()
+        conn = get_db()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id, nome, cnpj, telefone, email, endereco, created_at FROM oficinas ORDER BY nome")
+        filtro, params = filtro_keyset([("nome", "ASC"), ("id", "ASC")], pagina)
+        # Com sessão, só a oficina do token
+        if g.get("sessao"):
+            filtro, params = f"AND id = %s {filtro}", (g.sessao["oficina_id"], *params)
+        cursor.execute(f"""
+            SELECT id, nome, cnpj, telefone, email, endereco, created_at FROM oficinas
+            WHERE 1 = 1 {filtro}
+            ORDER BY nome, id
+            {sql_limite(pagina)}
+        """, params)
         dados = cursor.fetchall()
         cursor.close()
         conn.close()
-        return jsonify(dados)
+        return responder_pagina(dados, pagina, ["nome", "id"])
     except Exception as e:
         print(f"Erro ao listar oficinas: {str(e)}")
         return jsonify({"erro": f"Erro ao listar oficinas: {str(e)}"}), 500
 
 @dashboard_bp.route("/oficinas", methods=["POST"])
+@transacional
 def criar_oficina():
     data = request.json
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
@@ -79,7 +305,6 @@ def criar_oficina():
         """, (nome, cnpj, telefone, email, endereco))
         
         nova_oficina_id = cursor.lastrowid
-        conn.commit()
         cursor.close()
         conn.close()
         
@@ -95,7 +320,8 @@ def criar_oficina():
 
 @dashboard_bp.route("/oficinas/<int:oficina_id>", methods=["GET"])
 def buscar_oficina(oficina_id):
-    conn = get_connection()
+    oficina_id = oficina_da_requisicao()
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
     cursor.execute("SELECT * FROM oficinas WHERE id = %s", (oficina_id,))
     oficina = cursor.fetchone()
@@ -108,10 +334,13 @@ def buscar_oficina(oficina_id):
     return jsonify(oficina)
 
 @dashboard_bp.route("/oficinas/<int:oficina_id>", methods=["PUT"])
+@transacional
+@altera("oficinas")
 def atualizar_oficina(oficina_id):
     data = request.get_json()
+    oficina_id = oficina_da_requisicao()
     
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
@@ -128,7 +357,6 @@ def atualizar_oficina(oficina_id):
             oficina_id
         ))
         
-        conn.commit()
         cursor.close()
         conn.close()
         
@@ -142,48 +370,74 @@ def atualizar_oficina(oficina_id):
 # =====================================================
 # LISTAR CLIENTES (COM FILTRO DE OFICINA)
 # =====================================================
+# ?ordem= da listagem de clientes: coluna e direção (gasto/os = maiores clientes primeiro)
+ORDENS_CLIENTES = {
+    "nome": ("nome", "ASC"),
+    "gasto": ("total_gasto", "DESC"),
+    "os": ("total_os", "DESC"),
+}
+
+SQL_LISTAR_CLIENTES = """
+    SELECT 
+        c.id,
+        c.nome,
+        c.telefone,
+        c.email,
+        c.cidade,
+        c.status,
+        c.total_os AS total_servicos,
+        c.total_gasto,
+        c.ultima_visita
+    FROM clientes c
+    WHERE c.oficina_id = %s {filtro}
+    ORDER BY c.{coluna} {direcao}, c.id {direcao}
+    {limite}
+"""
+
 @dashboard_bp.route("/clientes", methods=["GET"])
+@etag("clientes", "ordens_servico")
+@em_cache("clientes", "ordens_servico")
 def listar_clientes():
-    oficina_id = request.args.get("oficina_id")
+    oficina_id = oficina_da_requisicao()
     
     if not oficina_id:
         return jsonify({"erro": "oficina_id é obrigatório"}), 400
     
-    conn = get_connection()
+    ordem = request.args.get("ordem", "nome")
+    if ordem not in ORDENS_CLIENTES:
+        return jsonify({"erro": f"ordem inválida, use uma de: {', '.join(ORDENS_CLIENTES)}"}), 400
+    coluna, direcao = ORDENS_CLIENTES[ordem]
+
+    pagina, erro = ler_paginacao(2)
+    if erro:
+        return erro
+
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
-    # Inclui total de serviços (ordens de serviço) por cliente
+    # Total de serviços, gasto e última visita vêm das colunas mantidas
+    # pelos handlers de OS (estatisticas_clientes.py)
+    filtro, params = filtro_keyset([(f"c.{coluna}", direcao), ("c.id", direcao)], pagina)
     cursor.execute(
-        """
-        SELECT 
-            c.id,
-            c.nome,
-            c.telefone,
-            c.email,
-            c.cidade,
-            c.status,
-            COALESCE(COUNT(os.id), 0) AS total_servicos
-        FROM clientes c
-        LEFT JOIN ordens_servico os ON os.cliente_id = c.id AND os.oficina_id = %s
-        WHERE c.oficina_id = %s
-        GROUP BY c.id, c.nome, c.telefone, c.email, c.cidade, c.status
-        ORDER BY c.nome
-        """,
-        (oficina_id, oficina_id)
+        SQL_LISTAR_CLIENTES.format(filtro=filtro, coluna=coluna, direcao=direcao, limite=sql_limite(pagina)),
+        (oficina_id, *params)
     )
     dados = cursor.fetchall()
     cursor.close()
     conn.close()
 
-    return jsonify(dados)
+    chave = "total_servicos" if coluna == "total_os" else coluna
+    return responder_pagina(dados, pagina, [chave, "id"])
 
 # =====================================================
 # CRIAR NOVO CLIENTE (COM OFICINA_ID)
 # =====================================================
 @dashboard_bp.route("/clientes", methods=["POST"])
+@transacional
+@altera("clientes")
 def criar_cliente():
     data = request.json
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     try:
@@ -192,7 +446,7 @@ def criar_cliente():
         email = data.get("email", "")
         cidade = data.get("cidade", "")
         status = data.get("status", "Ativo")
-        oficina_id = data.get("oficina_id")
+        oficina_id = oficina_da_requisicao()
 
         if not nome:
             return jsonify({"erro": "Nome é obrigatório"}), 400
@@ -206,7 +460,6 @@ def criar_cliente():
         """, (nome, telefone, email, cidade, status, oficina_id))
 
         novo_cliente_id = cursor.lastrowid
-        conn.commit()
         cursor.close()
         conn.close()
 
@@ -225,9 +478,11 @@ def criar_cliente():
 # EDITAR CLIENTE (VALIDAR OFICINA_ID)
 # =====================================================
 @dashboard_bp.route("/clientes/<int:cliente_id>", methods=["PUT"])
+@transacional
+@altera("clientes")
 def editar_cliente(cliente_id):
     data = request.json
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     try:
@@ -236,7 +491,7 @@ def editar_cliente(cliente_id):
         email = data.get("email", "")
         cidade = data.get("cidade", "")
         status = data.get("status", "Ativo")
-        oficina_id = data.get("oficina_id")
+        oficina_id = oficina_da_requisicao()
 
         if not nome:
             return jsonify({"erro": "Nome é obrigatório"}), 400
@@ -249,8 +504,8 @@ def editar_cliente(cliente_id):
             SET nome = %s, telefone = %s, email = %s, cidade = %s, status = %s
             WHERE id = %s AND oficina_id = %s
         """, (nome, telefone, email, cidade, status, cliente_id, oficina_id))
+        resumo_os.atualizar_onde(cursor, oficina_id, "o.cliente_id = %s", (cliente_id,))
 
-        conn.commit()
         cursor.close()
         conn.close()
 
@@ -266,13 +521,15 @@ def editar_cliente(cliente_id):
 # DELETAR CLIENTE (VALIDAR OFICINA_ID)
 # =====================================================
 @dashboard_bp.route("/clientes/<int:cliente_id>", methods=["DELETE"])
+@transacional
+@altera("clientes")
 def deletar_cliente(cliente_id):
-    oficina_id = request.args.get("oficina_id")
+    oficina_id = oficina_da_requisicao()
     
     if not oficina_id:
         return jsonify({"erro": "oficina_id é obrigatório"}), 400
     
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
     try:
@@ -300,11 +557,11 @@ def deletar_cliente(cliente_id):
             conn.close()
             return jsonify({"erro": "Não é possível deletar cliente que possui veículos vinculados"}), 400
 
+        sincronizacao.registrar_exclusao(cursor, "clientes", "id = %s AND oficina_id = %s", (cliente_id, oficina_id))
         cursor.execute("""
             DELETE FROM clientes 
             WHERE id = %s AND oficina_id = %s
         """, (cliente_id, oficina_id))
-        conn.commit()
         cursor.close()
         conn.close()
 
@@ -319,45 +576,60 @@ def deletar_cliente(cliente_id):
 # =====================================================
 # LISTAR VEÍCULOS (COM FILTRO DE OFICINA)
 # =====================================================
+SQL_LISTAR_VEICULOS = """
+    SELECT 
+        v.id,
+        v.placa,
+        v.modelo,
+        v.marca,
+        v.ano,
+        v.km,
+        v.cliente_id,
+        c.nome AS proprietario_nome,
+        v.created_at
+    FROM veiculos v
+    LEFT JOIN clientes c ON c.id = v.cliente_id AND c.oficina_id = %s
+    WHERE v.oficina_id = %s {filtro}
+    ORDER BY v.marca, v.modelo, v.id
+    {limite}
+"""
+
 @dashboard_bp.route("/veiculos", methods=["GET"])
+@etag("veiculos", "clientes")
+@em_cache("veiculos", "clientes")
 def listar_veiculos():
-    oficina_id = request.args.get("oficina_id")
+    oficina_id = oficina_da_requisicao()
     
     if not oficina_id:
         return jsonify({"erro": "oficina_id é obrigatório"}), 400
     
-    conn = get_connection()
+    pagina, erro = ler_paginacao(3)
+    if erro:
+        return erro
+
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
-    cursor.execute("""
-        SELECT 
-            v.id,
-            v.placa,
-            v.modelo,
-            v.marca,
-            v.ano,
-            v.km,
-            v.cliente_id,
-            c.nome AS proprietario_nome,
-            v.created_at
-        FROM veiculos v
-        LEFT JOIN clientes c ON c.id = v.cliente_id AND c.oficina_id = %s
-        WHERE v.oficina_id = %s
-        ORDER BY v.marca, v.modelo
-    """, (oficina_id, oficina_id))
+    filtro, params = filtro_keyset([("v.marca", "ASC"), ("v.modelo", "ASC"), ("v.id", "ASC")], pagina)
+    cursor.execute(
+        SQL_LISTAR_VEICULOS.format(filtro=filtro, limite=sql_limite(pagina)),
+        (oficina_id, oficina_id, *params)
+    )
     dados = cursor.fetchall()
     cursor.close()
     conn.close()
 
-    return jsonify(dados)
+    return responder_pagina(dados, pagina, ["marca", "modelo", "id"])
 
 # =====================================================
 # CRIAR NOVO VEÍCULO (COM OFICINA_ID)
 # =====================================================
 @dashboard_bp.route("/veiculos", methods=["POST"])
+@transacional
+@altera("veiculos")
 def criar_veiculo():
     data = request.json
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     try:
@@ -367,7 +639,7 @@ def criar_veiculo():
         ano = data.get("ano")
         km = data.get("km")
         cliente_id = data.get("cliente_id")
-        oficina_id = data.get("oficina_id")
+        oficina_id = oficina_da_requisicao()
 
         if not placa or not modelo or not marca:
             return jsonify({"erro": "Placa, modelo e marca são obrigatórios"}), 400
@@ -381,7 +653,6 @@ def criar_veiculo():
         """, (placa, modelo, marca, ano, km, cliente_id, oficina_id))
 
         novo_id = cursor.lastrowid
-        conn.commit()
         cursor.close()
         conn.close()
 
@@ -396,9 +667,11 @@ def criar_veiculo():
 # EDITAR VEÍCULO (VALIDAR OFICINA_ID)
 # =====================================================
 @dashboard_bp.route("/veiculos/<int:veiculo_id>", methods=["PUT"])
+@transacional
+@altera("veiculos")
 def editar_veiculo(veiculo_id):
     data = request.json
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     try:
@@ -408,7 +681,7 @@ def editar_veiculo(veiculo_id):
         ano = data.get("ano")
         km = data.get("km")
         cliente_id = data.get("cliente_id")
-        oficina_id = data.get("oficina_id")
+        oficina_id = oficina_da_requisicao()
         
         if not oficina_id:
             return jsonify({"erro": "oficina_id é obrigatório"}), 400
@@ -418,8 +691,8 @@ def editar_veiculo(veiculo_id):
             SET placa = %s, modelo = %s, marca = %s, ano = %s, km = %s, cliente_id = %s
             WHERE id = %s AND oficina_id = %s
         """, (placa, modelo, marca, ano, km, cliente_id, veiculo_id, oficina_id))
+        resumo_os.atualizar_onde(cursor, oficina_id, "o.veiculo_id = %s", (veiculo_id,))
 
-        conn.commit()
         cursor.close()
         conn.close()
 
@@ -434,13 +707,15 @@ def editar_veiculo(veiculo_id):
 # DELETAR VEÍCULO (VALIDAR OFICINA_ID)
 # =====================================================
 @dashboard_bp.route("/veiculos/<int:veiculo_id>", methods=["DELETE"])
+@transacional
+@altera("veiculos")
 def deletar_veiculo(veiculo_id):
-    oficina_id = request.args.get("oficina_id")
+    oficina_id = oficina_da_requisicao()
     
     if not oficina_id:
         return jsonify({"erro": "oficina_id é obrigatório"}), 400
     
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
     try:
@@ -456,11 +731,11 @@ def deletar_veiculo(veiculo_id):
             return jsonify({"erro": "Não é possível excluir veículo vinculado a ordens de serviço"}), 400
 
         cursor = conn.cursor()
+        sincronizacao.registrar_exclusao(cursor, "veiculos", "id = %s AND oficina_id = %s", (veiculo_id, oficina_id))
         cursor.execute("""
             DELETE FROM veiculos 
             WHERE id = %s AND oficina_id = %s
         """, (veiculo_id, oficina_id))
-        conn.commit()
         cursor.close()
         conn.close()
 
@@ -475,123 +750,165 @@ def deletar_veiculo(veiculo_id):
 # LISTAR SERVIÇOS (COM FILTRO DE OFICINA)
 # =====================================================
 @dashboard_bp.route("/servicos", methods=["GET"])
+@etag("servicos")
+@em_cache("servicos")
 def listar_servicos():
-    oficina_id = request.args.get("oficina_id")
+    oficina_id = oficina_da_requisicao()
     
     if not oficina_id:
         return jsonify({"erro": "oficina_id é obrigatório"}), 400
     
-    conn = get_connection()
+    pagina, erro = ler_paginacao(2)
+    if erro:
+        return erro
+
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
-    cursor.execute("""
+    filtro, params = filtro_keyset([("nome", "ASC"), ("id", "ASC")], pagina)
+    cursor.execute(f"""
         SELECT 
             id, 
             nome, 
             COALESCE(preco_base, 0) as preco, 
             COALESCE(tempo_estimado, 0) as duracao
         FROM servicos 
-        WHERE oficina_id = %s
-        ORDER BY nome
-    """, (oficina_id,))
+        WHERE oficina_id = %s {filtro}
+        ORDER BY nome, id
+        {sql_limite(pagina)}
+    """, (oficina_id, *params))
     dados = cursor.fetchall()
     cursor.close()
     conn.close()
 
-    return jsonify(dados)
+    return responder_pagina(dados, pagina, ["nome", "id"])
 
 # =====================================================
 # LISTAR ORDENS DE SERVIÇO (COM FILTRO DE OFICINA)
 # =====================================================
 @dashboard_bp.route("/ordens-servico", methods=["GET"])
+@etag("ordens_servico", "clientes", "veiculos", "servicos", "financeiro")
 def listar_ordens_servico():
-    oficina_id = request.args.get("oficina_id")
+    oficina_id = oficina_da_requisicao()
     
     if not oficina_id:
         return jsonify({"erro": "oficina_id é obrigatório"}), 400
     
-    conn = get_connection()
+    pagina, erro = ler_paginacao(2)
+    if erro:
+        return erro
+
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
-    cursor.execute("""
+    # Cliente, veículo, serviços e financeiro já vêm resolvidos do resumo (resumo_os.py)
+    filtro, params = filtro_keyset([("created_at", "DESC"), ("ordem_id", "DESC")], pagina)
+    cursor.execute(f"""
         SELECT 
-            o.id AS ordem_id,
-            c.nome AS nome_cliente,
-            v.marca AS marca_veiculo,
-            v.modelo AS modelo_veiculo,
-            GROUP_CONCAT(DISTINCT s.nome SEPARATOR ', ') AS servico_nome,
-            o.status,
-            o.total,
-            o.observacao,
-            COUNT(DISTINCT f.id) AS tem_financeiro
-        FROM ordens_servico o
-        INNER JOIN clientes c ON c.id = o.cliente_id AND c.oficina_id = %s
-        INNER JOIN veiculos v ON v.id = o.veiculo_id AND v.oficina_id = %s
-        LEFT JOIN ordem_servico_servicos oss ON oss.ordem_servico_id = o.id
-        LEFT JOIN servicos s ON s.id = oss.servico_id AND s.oficina_id = %s
-        LEFT JOIN financeiro f ON f.ordem_servico_id = o.id AND f.oficina_id = %s
-        WHERE o.oficina_id = %s
-        GROUP BY o.id, c.nome, v.marca, v.modelo, o.status, o.total, o.observacao, o.created_at
-        ORDER BY o.created_at DESC
-    """, (oficina_id, oficina_id, oficina_id, oficina_id, oficina_id))
+            ordem_id,
+            nome_cliente,
+            marca_veiculo,
+            modelo_veiculo,
+            servico_nome,
+            status,
+            total,
+            observacao,
+            tem_financeiro,
+            created_at
+        FROM ordens_servico_resumo
+        WHERE oficina_id = %s {filtro}
+        ORDER BY created_at DESC, ordem_id DESC
+        {sql_limite(pagina)}
+    """, (oficina_id, *params))
+
+    if usar_stream(pagina):
+        return responder_stream(conn, cursor, linhas_json(cursor))
+
     dados = cursor.fetchall()
     cursor.close()
     conn.close()
 
-    return jsonify(dados)
+    return responder_pagina(dados, pagina, ["created_at", "ordem_id"])
+
+# =====================================================
+# FUNÇÕES DE ORDENS DE SERVIÇO
+# =====================================================
+ORDENS_LOTE_MAX = 500
+# Linhas por INSERT multi-linha (2 parâmetros cada, bem abaixo do limite de 65535)
+LINHAS_POR_INSERT = 1000
+
+def validar_ordem(data):
+    """Mensagem de erro da OS recebida, ou None se estiver válida"""
+    if not data.get("cliente_id"):
+        return "Cliente é obrigatório"
+    if not data.get("veiculo_id"):
+        return "Veículo é obrigatório"
+    try:
+        int(data["cliente_id"])
+        int(data["veiculo_id"])
+        [int(servico_id) for servico_id in data.get("servico_ids") or []]
+    except (TypeError, ValueError):
+        return "cliente_id, veiculo_id e servico_ids devem ser números"
+    return None
+
+def inserir_ordem(cursor, data, oficina_id):
+    """Insere a OS (sem os serviços) e retorna o id"""
+    cursor.execute("""
+        INSERT INTO ordens_servico (cliente_id, veiculo_id, status, total, observacao, oficina_id, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, NOW())
+    """, (
+        int(data["cliente_id"]),
+        int(data["veiculo_id"]),
+        data.get("status", "Aberta"),
+        data.get("total", 0),
+        data.get("observacao", ""),
+        oficina_id
+    ))
+    return cursor.lastrowid
+
+def inserir_servicos_ordens(cursor, linhas):
+    """Grava as linhas (ordem_servico_id, servico_id) de uma ou várias OS em INSERTs multi-linha"""
+    for inicio in range(0, len(linhas), LINHAS_POR_INSERT):
+        lote = linhas[inicio:inicio + LINHAS_POR_INSERT]
+        cursor.execute(
+            "INSERT INTO ordem_servico_servicos (ordem_servico_id, servico_id) VALUES "
+            + ", ".join(["(%s, %s)"] * len(lote)),
+            [valor for linha in lote for valor in linha]
+        )
 
 # =====================================================
 # CRIAR NOVA ORDEM DE SERVIÇO (COM OFICINA_ID)
 # =====================================================
 @dashboard_bp.route("/ordens-servico", methods=["POST"])
+@transacional
+@altera("ordens_servico", "clientes")
 def criar_ordem_servico():
-    data = request.json
-    conn = get_connection()
-    cursor = conn.cursor()
+    data = request.json or {}
+    cliente_id = data.get("cliente_id")
+    servico_ids = data.get("servico_ids", [])
+    oficina_id = oficina_da_requisicao()
 
-    try:
-        cliente_id = data.get("cliente_id")
-        veiculo_id = data.get("veiculo_id")
-        servico_ids = data.get("servico_ids", [])
-        oficina_id = data.get("oficina_id")
+    # Validação (antes de pegar a conexão)
+    erro = validar_ordem(data)
+    if erro:
+        return jsonify({"erro": erro}), 400
 
-        # Validação
-        if not cliente_id or cliente_id == "":
-            return jsonify({"erro": "Cliente é obrigatório"}), 400
-        
-        if not veiculo_id or veiculo_id == "":
-            return jsonify({"erro": "Veículo é obrigatório"}), 400
-        
-        if not oficina_id:
-            return jsonify({"erro": "oficina_id é obrigatório"}), 400
-
-        # Converter para int se necessário
-        cliente_id = int(cliente_id)
-        veiculo_id = int(veiculo_id)
+    if not oficina_id:
+        return jsonify({"erro": "oficina_id é obrigatório"}), 400
 
-        cursor.execute("""
-            INSERT INTO ordens_servico (cliente_id, veiculo_id, status, total, observacao, oficina_id, created_at)
-            VALUES (%s, %s, %s, %s, %s, %s, NOW())
-        """, (
-            cliente_id,
-            veiculo_id,
-            data.get("status", "Aberta"),
-            data.get("total", 0),
-            data.get("observacao", ""),
-            oficina_id
-        ))
+    conn = get_db()
+    cursor = conn.cursor()
 
-        nova_ordem_id = cursor.lastrowid
+    try:
+        nova_ordem_id = inserir_ordem(cursor, data, oficina_id)
 
-        # Inserir serviços na tabela de relacionamento
+        # Serviços da OS em um único INSERT
         if servico_ids:
-            for servico_id in servico_ids:
-                cursor.execute("""
-                    INSERT INTO ordem_servico_servicos (ordem_servico_id, servico_id)
-                    VALUES (%s, %s)
-                """, (nova_ordem_id, int(servico_id)))
+            inserir_servicos_ordens(cursor, [(nova_ordem_id, int(servico_id)) for servico_id in servico_ids])
+
+        resumo_os.atualizar(cursor, oficina_id, [nova_ordem_id])
+        estatisticas_clientes.atualizar(cursor, oficina_id, [cliente_id])
 
-        conn.commit()
         cursor.close()
         conn.close()
 
@@ -606,23 +923,110 @@ def criar_ordem_servico():
         conn.close()
         return jsonify({"erro": str(e)}), 400
 
+# =====================================================
+# CRIAR ORDENS DE SERVIÇO EM LOTE (COM OFICINA_ID)
+# =====================================================
+@dashboard_bp.route("/ordens-servico/lote", methods=["POST"])
+@transacional
+@altera("ordens_servico", "clientes")
+def criar_ordens_servico_lote():
+    """
+    Cria várias OS (com seus serviços) em uma transação. Por padrão é tudo
+    ou nada; com "parcial": true, cada OS fica em um savepoint e as que
+    falharem são devolvidas em "erros" sem impedir as outras.
+    """
+    data = request.json or {}
+    oficina_id = oficina_da_requisicao()
+    ordens = data.get("ordens")
+    parcial = bool(data.get("parcial"))
+
+    if not oficina_id:
+        return jsonify({"erro": "oficina_id é obrigatório"}), 400
+
+    if not isinstance(ordens, list) or not ordens:
+        return jsonify({"erro": "ordens deve ser uma lista não vazia"}), 400
+
+    if len(ordens) > ORDENS_LOTE_MAX:
+        return jsonify({"erro": f"Máximo de {ORDENS_LOTE_MAX} ordens por lote"}), 400
+
+    erros = []
+    for indice, ordem in enumerate(ordens):
+        erro = validar_ordem(ordem) if isinstance(ordem, dict) else "Ordem inválida"
+        if erro:
+            erros.append({"indice": indice, "erro": erro})
+    if erros and not parcial:
+        return jsonify({"erro": "Ordens inválidas, nada foi criado", "erros": erros}), 400
+
+    invalidas = {e["indice"] for e in erros}
+    conn = get_db()
+    cursor = conn.cursor()
+    uow = transacao_atual()
+
+    try:
+        criadas = []
+        linhas = []
+        clientes = set()
+        for indice, ordem in enumerate(ordens):
+            if indice in invalidas:
+                continue
+            if parcial:
+                try:
+                    with uow.savepoint():
+                        ordem_id = inserir_ordem(cursor, ordem, oficina_id)
+                except Exception as e:
+                    erros.append({"indice": indice, "erro": str(e)})
+                    continue
+            else:
+                ordem_id = inserir_ordem(cursor, ordem, oficina_id)
+
+            criadas.append({"indice": indice, "ordem_id": ordem_id})
+            clientes.add(int(ordem["cliente_id"]))
+            linhas.extend((ordem_id, int(servico_id)) for servico_id in ordem.get("servico_ids") or [])
+
+        if not criadas:
+            cursor.close()
+            conn.close()
+            return jsonify({"erro": "Nenhuma ordem foi criada", "erros": erros}), 400
+
+        # Serviços de todas as OS do lote em INSERTs multi-linha
+        inserir_servicos_ordens(cursor, linhas)
+        resumo_os.atualizar(cursor, oficina_id, [c["ordem_id"] for c in criadas])
+        estatisticas_clientes.atualizar(cursor, oficina_id, clientes)
+
+        cursor.close()
+        conn.close()
+
+        return jsonify({
+            "msg": f"{len(criadas)} ordem(ns) criada(s) com sucesso",
+            "ordens": criadas,
+            "erros": sorted(erros, key=lambda e: e["indice"])
+        }), 201
+
+    except Exception as e:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+        return jsonify({"erro": str(e)}), 400
+
 # =====================================================
 # EDITAR ORDEM DE SERVIÇO (VALIDAR OFICINA_ID)
 # =====================================================
 @dashboard_bp.route("/ordens-servico/<int:id>", methods=["PUT"])
+@transacional
+@altera("ordens_servico", "clientes", "financeiro")
 def editar_ordem_servico(id):
     data = request.json
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
     try:
-        oficina_id = data.get("oficina_id")
+        oficina_id = oficina_da_requisicao()
         if not oficina_id:
             return jsonify({"erro": "oficina_id é obrigatório"}), 400
 
         # Busca OS atual
         cursor.execute("""
-            SELECT status, total FROM ordens_servico 
+            SELECT status, total, cliente_id FROM ordens_servico 
             WHERE id = %s AND oficina_id = %s
         """, (id, oficina_id))
         os_atual = cursor.fetchone()
@@ -666,34 +1070,14 @@ def editar_ordem_servico(id):
         # CONTROLE FINANCEIRO CORRETO
         # ===============================
         if novo_status.lower() == "finalizada":
-            cursor.execute("""
-                SELECT id FROM financeiro
-                WHERE ordem_servico_id = %s AND tipo = 'Receita' AND oficina_id = %s
-            """, (id, oficina_id))
-            receita = cursor.fetchone()
-
-            if receita:
-                # 🔁 Atualiza valor da receita
-                cursor.execute("""
-                    UPDATE financeiro
-                    SET valor = %s
-                    WHERE ordem_servico_id = %s AND tipo = 'Receita' AND oficina_id = %s
-                """, (novo_total, id, oficina_id))
-            else:
-                # ➕ Cria receita
-                cursor.execute("""
-                    INSERT INTO financeiro
-                    (ordem_servico_id, tipo, valor, oficina_id, created_at)
-                    VALUES (%s, 'Receita', %s, %s, NOW())
-                """, (id, novo_total, oficina_id))
+            lancar_receita_os(cursor, id, novo_total, oficina_id)
         else:
             # Se saiu de Finalizada, remove a receita vinculada a essa OS
-            cursor.execute("""
-                DELETE FROM financeiro
-                WHERE ordem_servico_id = %s AND tipo = 'Receita' AND oficina_id = %s
-            """, (id, oficina_id))
+            remover_receita_os(cursor, id, oficina_id)
+
+        resumo_os.atualizar(cursor, oficina_id, [id])
+        estatisticas_clientes.atualizar(cursor, oficina_id, [os_atual["cliente_id"]])
 
-        conn.commit()
         cursor.close()
         conn.close()
 
@@ -710,13 +1094,15 @@ def editar_ordem_servico(id):
 # DELETAR ORDEM DE SERVIÇO (VALIDAR OFICINA_ID)
 # =====================================================
 @dashboard_bp.route("/ordens-servico/<int:id>", methods=["DELETE"])
+@transacional
+@altera("ordens_servico", "clientes")
 def deletar_ordem_servico(id):
-    oficina_id = request.args.get("oficina_id")
+    oficina_id = oficina_da_requisicao()
     
     if not oficina_id:
         return jsonify({"erro": "oficina_id é obrigatório"}), 400
     
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
     # verifica se tem financeiro
@@ -735,12 +1121,21 @@ def deletar_ordem_servico(id):
         }), 400
 
     # se não tiver, pode excluir
+    cursor.execute("""
+        SELECT cliente_id FROM ordens_servico
+        WHERE id = %s AND oficina_id = %s
+    """, (id, oficina_id))
+    ordem = cursor.fetchone()
+
+    sincronizacao.registrar_exclusao(cursor, "ordens_servico", "id = %s AND oficina_id = %s", (id, oficina_id))
     cursor.execute("DELETE FROM ordem_servico_servicos WHERE ordem_servico_id = %s", (id,))
     cursor.execute("""
         DELETE FROM ordens_servico 
         WHERE id = %s AND oficina_id = %s
     """, (id, oficina_id))
-    conn.commit()
+    resumo_os.atualizar(cursor, oficina_id, [id])
+    if ordem:
+        estatisticas_clientes.atualizar(cursor, oficina_id, [ordem["cliente_id"]])
 
     cursor.close()
     conn.close()
@@ -749,32 +1144,47 @@ def deletar_ordem_servico(id):
 # =====================================================
 # SERVIÇOS (COM FILTRO DE OFICINA)
 # =====================================================
+SQL_LISTAR_SERVICOS = """
+    SELECT id, nome, categoria, tempo_estimado, preco_base, status
+    FROM servicos
+    WHERE oficina_id = %s {filtro}
+    ORDER BY nome, id
+    {limite}
+"""
+
 @dashboard_bp.route("/servicos/list", methods=["GET"])
+@etag("servicos")
+@em_cache("servicos")
 def listar_servicos_completo():
-    oficina_id = request.args.get("oficina_id")
+    oficina_id = oficina_da_requisicao()
     
     if not oficina_id:
         return jsonify({"erro": "oficina_id é obrigatório"}), 400
     
-    conn = get_connection()
+    pagina, erro = ler_paginacao(2)
+    if erro:
+        return erro
+
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
     
-    cursor.execute("""
-        SELECT id, nome, categoria, tempo_estimado, preco_base, status
-        FROM servicos
-        WHERE oficina_id = %s
-        ORDER BY nome
-    """, (oficina_id,))
+    filtro, params = filtro_keyset([("nome", "ASC"), ("id", "ASC")], pagina)
+    cursor.execute(
+        SQL_LISTAR_SERVICOS.format(filtro=filtro, limite=sql_limite(pagina)),
+        (oficina_id, *params)
+    )
     dados = cursor.fetchall()
     cursor.close()
     conn.close()
     
-    return jsonify(dados)
+    return responder_pagina(dados, pagina, ["nome", "id"])
 
 @dashboard_bp.route("/servicos/list", methods=["POST"])
+@transacional
+@altera("servicos")
 def criar_servico():
     data = request.json
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
@@ -783,7 +1193,7 @@ def criar_servico():
         tempo_estimado = data.get("tempo_estimado")
         preco_base = data.get("preco_base")
         status = data.get("status", "Ativo")
-        oficina_id = data.get("oficina_id")
+        oficina_id = oficina_da_requisicao()
         
         if not nome:
             return jsonify({"erro": "Nome do serviço é obrigatório"}), 400
@@ -797,7 +1207,6 @@ def criar_servico():
         """, (nome, categoria, tempo_estimado, preco_base, status, oficina_id))
         
         novo_id = cursor.lastrowid
-        conn.commit()
         cursor.close()
         conn.close()
         
@@ -809,9 +1218,11 @@ def criar_servico():
         return jsonify({"erro": str(e)}), 400
 
 @dashboard_bp.route("/servicos/list/<int:servico_id>", methods=["PUT"])
+@transacional
+@altera("servicos")
 def editar_servico(servico_id):
     data = request.json
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
@@ -820,7 +1231,7 @@ def editar_servico(servico_id):
         tempo_estimado = data.get("tempo_estimado")
         preco_base = data.get("preco_base")
         status = data.get("status", "Ativo")
-        oficina_id = data.get("oficina_id")
+        oficina_id = oficina_da_requisicao()
         
         if not oficina_id:
             return jsonify({"erro": "oficina_id é obrigatório"}), 400
@@ -830,8 +1241,10 @@ def editar_servico(servico_id):
             SET nome = %s, categoria = %s, tempo_estimado = %s, preco_base = %s, status = %s
             WHERE id = %s AND oficina_id = %s
         """, (nome, categoria, tempo_estimado, preco_base, status, servico_id, oficina_id))
+        resumo_os.atualizar_onde(cursor, oficina_id, """
+            o.id IN (SELECT ordem_servico_id FROM ordem_servico_servicos WHERE servico_id = %s)
+        """, (servico_id,))
         
-        conn.commit()
         cursor.close()
         conn.close()
         
@@ -843,13 +1256,15 @@ def editar_servico(servico_id):
         return jsonify({"erro": str(e)}), 400
 
 @dashboard_bp.route("/servicos/list/<int:servico_id>", methods=["DELETE"])
+@transacional
+@altera("servicos")
 def deletar_servico(servico_id):
-    oficina_id = request.args.get("oficina_id")
+    oficina_id = oficina_da_requisicao()
     
     if not oficina_id:
         return jsonify({"erro": "oficina_id é obrigatório"}), 400
     
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
     
     try:
@@ -864,11 +1279,11 @@ def deletar_servico(servico_id):
             return jsonify({"erro": "Não é possível excluir serviço vinculado a ordens"}), 400
         
         cursor = conn.cursor()
+        sincronizacao.registrar_exclusao(cursor, "servicos", "id = %s AND oficina_id = %s", (servico_id, oficina_id))
         cursor.execute("""
             DELETE FROM servicos 
             WHERE id = %s AND oficina_id = %s
         """, (servico_id, oficina_id))
-        conn.commit()
         cursor.close()
         conn.close()
         
@@ -882,32 +1297,47 @@ def deletar_servico(servico_id):
 # =====================================================
 # PEÇAS (COM FILTRO DE OFICINA)
 # =====================================================
+SQL_LISTAR_PECAS = """
+    SELECT id, nome, codigo, quantidade, minimo, preco_unitario, status
+    FROM pecas
+    WHERE oficina_id = %s {filtro}
+    ORDER BY nome, id
+    {limite}
+"""
+
 @dashboard_bp.route("/pecas", methods=["GET"])
+@etag("pecas")
+@em_cache("pecas")
 def listar_pecas():
-    oficina_id = request.args.get("oficina_id")
+    oficina_id = oficina_da_requisicao()
     
     if not oficina_id:
         return jsonify({"erro": "oficina_id é obrigatório"}), 400
     
-    conn = get_connection()
+    pagina, erro = ler_paginacao(2)
+    if erro:
+        return erro
+
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
     
-    cursor.execute("""
-        SELECT id, nome, codigo, quantidade, minimo, preco_unitario, status
-        FROM pecas
-        WHERE oficina_id = %s
-        ORDER BY nome
-    """, (oficina_id,))
+    filtro, params = filtro_keyset([("nome", "ASC"), ("id", "ASC")], pagina)
+    cursor.execute(
+        SQL_LISTAR_PECAS.format(filtro=filtro, limite=sql_limite(pagina)),
+        (oficina_id, *params)
+    )
     dados = cursor.fetchall()
     cursor.close()
     conn.close()
     
-    return jsonify(dados)
+    return responder_pagina(dados, pagina, ["nome", "id"])
 
 @dashboard_bp.route("/pecas", methods=["POST"])
+@transacional
+@altera("pecas")
 def criar_peca():
     data = request.json
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
@@ -916,7 +1346,7 @@ def criar_peca():
         quantidade = data.get("quantidade", 0)
         minimo = data.get("minimo", 0)
         preco_unitario = data.get("preco_unitario", 0)
-        oficina_id = data.get("oficina_id")
+        oficina_id = oficina_da_requisicao()
         
         # Calcular status baseado na quantidade
         if quantidade == 0:
@@ -938,7 +1368,6 @@ def criar_peca():
         """, (nome, codigo, quantidade, minimo, preco_unitario, status, oficina_id))
         
         novo_id = cursor.lastrowid
-        conn.commit()
         cursor.close()
         conn.close()
         
@@ -950,9 +1379,11 @@ def criar_peca():
         return jsonify({"erro": str(e)}), 400
 
 @dashboard_bp.route("/pecas/<int:peca_id>", methods=["PUT"])
+@transacional
+@altera("pecas")
 def editar_peca(peca_id):
     data = request.json
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
@@ -961,7 +1392,7 @@ def editar_peca(peca_id):
         quantidade = data.get("quantidade", 0)
         minimo = data.get("minimo", 0)
         preco_unitario = data.get("preco_unitario", 0)
-        oficina_id = data.get("oficina_id")
+        oficina_id = oficina_da_requisicao()
         
         if not oficina_id:
             return jsonify({"erro": "oficina_id é obrigatório"}), 400
@@ -980,7 +1411,6 @@ def editar_peca(peca_id):
             WHERE id = %s AND oficina_id = %s
         """, (nome, codigo, quantidade, minimo, preco_unitario, status, peca_id, oficina_id))
         
-        conn.commit()
         cursor.close()
         conn.close()
         
@@ -992,21 +1422,23 @@ def editar_peca(peca_id):
         return jsonify({"erro": str(e)}), 400
 
 @dashboard_bp.route("/pecas/<int:peca_id>", methods=["DELETE"])
+@transacional
+@altera("pecas")
 def deletar_peca(peca_id):
-    oficina_id = request.args.get("oficina_id")
+    oficina_id = oficina_da_requisicao()
     
     if not oficina_id:
         return jsonify({"erro": "oficina_id é obrigatório"}), 400
     
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
+        sincronizacao.registrar_exclusao(cursor, "pecas", "id = %s AND oficina_id = %s", (peca_id, oficina_id))
         cursor.execute("""
             DELETE FROM pecas 
             WHERE id = %s AND oficina_id = %s
         """, (peca_id, oficina_id))
-        conn.commit()
         cursor.close()
         conn.close()
         
@@ -1021,16 +1453,23 @@ def deletar_peca(peca_id):
 # FINANCEIRO (COM FILTRO DE OFICINA)
 # =====================================================
 @dashboard_bp.route("/financeiro", methods=["GET"])
+@etag("financeiro", "ordens_servico", "servicos")
 def listar_financeiro():
-    oficina_id = request.args.get("oficina_id")
+    oficina_id = oficina_da_requisicao()
     
     if not oficina_id:
         return jsonify({"erro": "oficina_id é obrigatório"}), 400
     
-    conn = get_connection()
+    pagina, erro = ler_paginacao(2)
+    if erro:
+        return erro
+
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
     
-    cursor.execute("""
+    # Sem paginação mantém o comportamento antigo (últimos 100 lançamentos)
+    filtro, params = filtro_keyset([("f.created_at", "DESC"), ("f.id", "DESC")], pagina)
+    cursor.execute(f"""
         SELECT 
             f.id, 
             f.ordem_servico_id, 
@@ -1042,35 +1481,34 @@ def listar_financeiro():
         LEFT JOIN ordens_servico os ON f.ordem_servico_id = os.id AND os.oficina_id = %s
         LEFT JOIN ordem_servico_servicos oss ON oss.ordem_servico_id = os.id
         LEFT JOIN servicos s ON s.id = oss.servico_id AND s.oficina_id = %s
-        WHERE f.oficina_id = %s
+        WHERE f.oficina_id = %s {filtro}
         GROUP BY f.id, f.ordem_servico_id, f.tipo, f.valor, f.created_at
-        ORDER BY f.created_at DESC
-        LIMIT 100
-    """, (oficina_id, oficina_id, oficina_id))
+        ORDER BY f.created_at DESC, f.id DESC
+        {sql_limite(pagina, padrao=100)}
+    """, (oficina_id, oficina_id, oficina_id, *params))
+
+    if usar_stream(pagina):
+        return responder_stream(conn, cursor, linhas_json(cursor))
+
     dados = cursor.fetchall()
     cursor.close()
     conn.close()
     
-    return jsonify(dados)
+    return responder_pagina(dados, pagina, ["created_at", "id"])
 
 @dashboard_bp.route("/financeiro/resumo", methods=["GET"])
+@etag("financeiro")
 def resumo_financeiro():
-    oficina_id = request.args.get("oficina_id")
+    oficina_id = oficina_da_requisicao()
     
     if not oficina_id:
         return jsonify({"erro": "oficina_id é obrigatório"}), 400
     
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
     
-    cursor.execute("""
-        SELECT
-            COALESCE(SUM(CASE WHEN tipo='Receita' THEN valor ELSE 0 END), 0) AS receita,
-            COALESCE(SUM(CASE WHEN tipo='Despesa' THEN valor ELSE 0 END), 0) AS despesa
-        FROM financeiro
-        WHERE oficina_id = %s
-    """, (oficina_id,))
-    resultado = cursor.fetchone()
+    # Lê do resumo mensal (uma linha por mês) em vez de somar o financeiro inteiro
+    resultado = financeiro_mensal.resumo_total(cursor, oficina_id)
     cursor.close()
     conn.close()
     
@@ -1086,9 +1524,11 @@ def resumo_financeiro():
     })
 
 @dashboard_bp.route("/financeiro", methods=["POST"])
+@transacional
+@altera("financeiro")
 def criar_financeiro():
     data = request.json
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
     
     try:
@@ -1096,7 +1536,7 @@ def criar_financeiro():
         tipo = data.get("tipo", "Receita")
         valor = data.get("valor", 0)
         descricao = data.get("descricao", "")
-        oficina_id = data.get("oficina_id")
+        oficina_id = oficina_da_requisicao()
         
         if not tipo or not valor:
             return jsonify({"erro": "Tipo e valor são obrigatórios"}), 400
@@ -1123,7 +1563,8 @@ def criar_financeiro():
         """, (ordem_servico_id, tipo, valor, descricao, oficina_id))
         
         novo_id = cursor.lastrowid
-        conn.commit()
+        financeiro_mensal.ajustar(cursor, "id = %s", (novo_id,))
+        resumo_os.atualizar(cursor, oficina_id, [ordem_servico_id])
         cursor.close()
         conn.close()
         
@@ -1135,13 +1576,15 @@ def criar_financeiro():
         return jsonify({"erro": str(e)}), 400
 
 @dashboard_bp.route("/financeiro/<int:financeiro_id>", methods=["PUT"])
+@transacional
+@altera("financeiro")
 def editar_financeiro(financeiro_id):
     data = request.json
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
     try:
-        oficina_id = data.get("oficina_id")
+        oficina_id = oficina_da_requisicao()
         
         if not oficina_id:
             return jsonify({"erro": "oficina_id é obrigatório"}), 400
@@ -1173,6 +1616,7 @@ def editar_financeiro(financeiro_id):
             descricao = data.get("descricao", atual.get("descricao", ""))
 
             cursor = conn.cursor()
+            financeiro_mensal.ajustar(cursor, "id = %s AND oficina_id = %s", (financeiro_id, oficina_id), -1)
             cursor.execute(
                 """
                 UPDATE financeiro
@@ -1181,7 +1625,7 @@ def editar_financeiro(financeiro_id):
                 """,
                 (descricao, os_total, financeiro_id, oficina_id)
             )
-            conn.commit()
+            financeiro_mensal.ajustar(cursor, "id = %s AND oficina_id = %s", (financeiro_id, oficina_id))
             cursor.close()
             conn.close()
             return jsonify({"msg": "Transação vinculada a OS; valor controlado pela OS"}), 200
@@ -1207,6 +1651,7 @@ def editar_financeiro(financeiro_id):
                 return jsonify({"erro": "Não é permitido vincular despesa a OS finalizada"}), 400
 
         cursor = conn.cursor()
+        financeiro_mensal.ajustar(cursor, "id = %s AND oficina_id = %s", (financeiro_id, oficina_id), -1)
         cursor.execute(
             """
             UPDATE financeiro
@@ -1215,7 +1660,8 @@ def editar_financeiro(financeiro_id):
             """,
             (ordem_servico_id, tipo, valor, descricao, financeiro_id, oficina_id)
         )
-        conn.commit()
+        financeiro_mensal.ajustar(cursor, "id = %s AND oficina_id = %s", (financeiro_id, oficina_id))
+        resumo_os.atualizar(cursor, oficina_id, [atual.get("ordem_servico_id"), ordem_servico_id])
         cursor.close()
         conn.close()
         return jsonify({"msg": "Transação atualizada com sucesso"}), 200
@@ -1226,21 +1672,26 @@ def editar_financeiro(financeiro_id):
         return jsonify({"erro": str(e)}), 400
 
 @dashboard_bp.route("/financeiro/<int:financeiro_id>", methods=["DELETE"])
+@transacional
+@altera("financeiro")
 def deletar_financeiro(financeiro_id):
-    oficina_id = request.args.get("oficina_id")
+    oficina_id = oficina_da_requisicao()
     
     if not oficina_id:
         return jsonify({"erro": "oficina_id é obrigatório"}), 400
     
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
+        ordens = resumo_os.os_do_financeiro(cursor, "id = %s AND oficina_id = %s", (financeiro_id, oficina_id))
+        financeiro_mensal.ajustar(cursor, "id = %s AND oficina_id = %s", (financeiro_id, oficina_id), -1)
+        sincronizacao.registrar_exclusao(cursor, "financeiro", "id = %s AND oficina_id = %s", (financeiro_id, oficina_id))
         cursor.execute("""
             DELETE FROM financeiro 
             WHERE id = %s AND oficina_id = %s
         """, (financeiro_id, oficina_id))
-        conn.commit()
+        resumo_os.atualizar(cursor, oficina_id, ordens)
         cursor.close()
         conn.close()
         
@@ -1254,15 +1705,111 @@ def deletar_financeiro(financeiro_id):
 # =====================================================
 # DASHBOARD (COM FILTRO DE OFICINA)
 # =====================================================
+# Seções que o cliente pode pedir em ?sections=a,b,c
+SECOES_DASHBOARD = (
+    "ordens_servico",       # todas as OS (lista completa, em streaming)
+    "ordens_recentes",      # só as N mais recentes (?recentes=N)
+    "ordens_por_status",    # contagem de OS por status
+    "pecas",                # todas as peças
+    "pecas_alerta",         # só peças com estoque baixo ou zerado
+    "resumo_mensal",
+    "movimentacao_mensal",
+)
+# Sem ?sections=, o dashboard responde como sempre respondeu
+SECOES_PADRAO = ("ordens_servico", "pecas", "resumo_mensal", "movimentacao_mensal")
+RECENTES_PADRAO = 10
+RECENTES_MAX = 100
+
+SQL_DASHBOARD_ORDENS = """
+    SELECT
+        ordem_id,
+        status,
+        total,
+        observacao,
+        nome_cliente,
+        marca_veiculo,
+        modelo_veiculo
+    FROM ordens_servico_resumo
+    WHERE oficina_id = %s
+    ORDER BY created_at DESC, ordem_id DESC
+"""
+
+SQL_DASHBOARD_PECAS = """
+    SELECT 
+        p.id,
+        p.nome,
+        p.quantidade,
+        p.status,
+        p.preco_unitario
+    FROM pecas p
+    WHERE p.oficina_id = %s
+"""
+
+def buscar_todos(sql, params):
+    """Consulta para consultar_em_paralelo(): todas as linhas"""
+    def consulta(cur):
+        cur.execute(sql, params)
+        return cur.fetchall()
+    return consulta
+
+def consultas_dashboard(oficina_id, recentes, ano, mes):
+    """{seção: consulta} das seções do dashboard feitas em paralelo"""
+    return {
+        "ordens_recentes": buscar_todos(SQL_DASHBOARD_ORDENS + f" LIMIT {recentes}", (oficina_id,)),
+        "ordens_por_status": buscar_todos("""
+            SELECT status, COUNT(*) AS total
+            FROM ordens_servico
+            WHERE oficina_id = %s
+            GROUP BY status
+            ORDER BY status
+        """, (oficina_id,)),
+        "pecas": buscar_todos(SQL_DASHBOARD_PECAS, (oficina_id,)),
+        "pecas_alerta": buscar_todos(SQL_DASHBOARD_PECAS + " AND (p.quantidade <= p.minimo OR p.status IN ('Baixo', 'Sem Estoque'))", (oficina_id,)),
+        # Entradas e despesas do mês vêm do resumo mensal (busca pela chave primária)
+        "resumo_mensal": lambda cur: financeiro_mensal.resumo_do_mes(cur, oficina_id, ano, mes),
+        # Movimentação mensal (gráfico)
+        "movimentacao_mensal": lambda cur: financeiro_mensal.movimentacao(cur, oficina_id),
+    }
+
+def com_saldo(resumo_financeiro):
+    """Entrada, saída e saldo do resumo mensal"""
+    resumo_financeiro = resumo_financeiro or {}
+    entrada = resumo_financeiro["entrada"]
+    saida = resumo_financeiro["saida"]
+    return {
+        "entrada": entrada,
+        "saida": saida,
+        "saldo": entrada - saida
+    }
+
+def mes_atual():
+    """Sem ?mes=&ano= o dashboard mostra o mês corrente, então a ETag muda na virada do mês"""
+    return datetime.now().strftime("%Y-%m")
+
 @dashboard_bp.route("/dashboard", methods=["GET"])
+@etag("ordens_servico", "clientes", "veiculos", "pecas", "financeiro", extra=mes_atual)
 def dashboard():
-    oficina_id = request.args.get("oficina_id")
+    oficina_id = oficina_da_requisicao()
     
     if not oficina_id:
         return jsonify({"erro": "oficina_id é obrigatório"}), 400
-    
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+
+    secoes = request.args.get("sections")
+    if secoes:
+        secoes = list(dict.fromkeys(sec.strip() for sec in secoes.split(",") if sec.strip()))
+        invalidas = [sec for sec in secoes if sec not in SECOES_DASHBOARD]
+        if invalidas:
+            return jsonify({
+                "erro": f"Seções inválidas: {', '.join(invalidas)}",
+                "secoes_disponiveis": list(SECOES_DASHBOARD)
+            }), 400
+    else:
+        secoes = list(SECOES_PADRAO)
+
+    try:
+        recentes = min(max(int(request.args.get("recentes", RECENTES_PADRAO)), 1), RECENTES_MAX)
+    except ValueError:
+        return jsonify({"erro": "recentes deve ser um número inteiro"}), 400
 
     mes = request.args.get("mes")
     ano = request.args.get("ano")
@@ -1275,188 +1822,365 @@ def dashboard():
         filtro_mes = hoje.month
         filtro_ano = hoje.year
 
-    # =========================
-    # ORDENS DE SERVIÇO
-    # =========================
-    cursor.execute("""
-        SELECT
-            os.id AS ordem_id,
-            os.status,
-            os.total,
-            os.observacao,
-            c.nome AS nome_cliente,
-            v.marca AS marca_veiculo,
-            v.modelo AS modelo_veiculo
-        FROM ordens_servico os
-        JOIN clientes c ON c.id = os.cliente_id AND c.oficina_id = %s
-        JOIN veiculos v ON v.id = os.veiculo_id AND v.oficina_id = %s
-        WHERE os.oficina_id = %s
-        GROUP BY os.id, os.status, os.total, os.observacao, c.nome, v.marca, v.modelo, os.created_at
-        ORDER BY os.created_at DESC;
-    """, (oficina_id, oficina_id, oficina_id))
-    ordens_servico = cursor.fetchall()
+    # Só as seções pedidas viram consulta; as demais nem chegam ao banco
+    consultas = consultas_dashboard(oficina_id, recentes, filtro_ano, filtro_mes)
+
+    # As consultas menores rodam em paralelo, cada uma na sua conexão do pool.
+    # A conexão da requisição (usada pelo @etag) é devolvida antes de esperar
+    # por elas: segurar uma conexão esperando outras esgota o pool quando
+    # vários dashboards chegam juntos. A lista completa de OS (se pedida)
+    # vem depois, numa conexão da requisição obtida de novo.
+    inicio = perf_counter()
+    liberar_db()
+    resultados, tempos = aguardar_consultas(
+        consultar_em_paralelo({sec: consultas[sec] for sec in secoes if sec in consultas})
+    )
 
-    # =========================
-    # PEÇAS / ESTOQUE
-    # =========================
-    cursor.execute("""
-        SELECT 
-            p.id,
-            p.nome,
-            p.quantidade,
-            p.status,
-            p.preco_unitario
-        FROM pecas p
-        WHERE p.oficina_id = %s
-    """, (oficina_id,))
-    pecas = cursor.fetchall()
+    conn = cursor = None
+    if "ordens_servico" in secoes:
+        conn = get_db()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(SQL_DASHBOARD_ORDENS, (oficina_id,))
+        tempos["ordens_servico"] = (perf_counter() - inicio) * 1000
 
     # =========================
     # RESUMO FINANCEIRO MENSAL (CORRIGIDO)
     # =========================
-    # Somar entradas e despesas do financeiro
-    cursor.execute("""
-        SELECT
-            COALESCE(SUM(CASE WHEN tipo='Receita' THEN valor ELSE 0 END),0) AS entrada,
-            COALESCE(SUM(CASE WHEN tipo='Despesa' THEN valor ELSE 0 END),0) AS saida
-        FROM financeiro
-        WHERE MONTH(created_at) = %s
-        AND YEAR(created_at) = %s
-        AND oficina_id = %s
-    """, (filtro_mes, filtro_ano, oficina_id))
+    if "resumo_mensal" in resultados:
+        resultados["resumo_mensal"] = com_saldo(resultados["resumo_mensal"])
+
+    # A lista completa de OS sai em streaming, na mesma ordem de chaves do jsonify
+    if cursor is not None and usar_stream(None):
+        tempos["total"] = (perf_counter() - inicio) * 1000
+        partes = []
+        for i, sec in enumerate(sorted(secoes)):
+            partes.append(("{" if i == 0 else ",") + f'"{sec}":')
+            if sec == "ordens_servico":
+                partes.append(linhas_json(cursor))
+            else:
+                partes.append(json_compacto(resultados[sec]))
+        partes.append("}")
+        resposta = responder_stream(conn, cursor, *partes)
+        resposta.headers["Server-Timing"] = server_timing(tempos)
+        return resposta
+
+    if cursor is not None:
+        resultados["ordens_servico"] = cursor.fetchall()
+        tempos["ordens_servico"] = (perf_counter() - inicio) * 1000
+        cursor.close()
+        conn.close()
+    tempos["total"] = (perf_counter() - inicio) * 1000
 
-    resumo_financeiro = cursor.fetchone() or {}
-    entrada = resumo_financeiro["entrada"]
-    saida = resumo_financeiro["saida"]
-    saldo = entrada - saida
+    resposta = jsonify({sec: resultados[sec] for sec in secoes})
+    resposta.headers["Server-Timing"] = server_timing(tempos)
+    return resposta
 
-    # =========================
-    # MOVIMENTAÇÃO MENSAL (GRÁFICO)
-    # =========================
-    cursor.execute("""
-        SELECT
-            YEAR(created_at) AS ano,
-            MONTH(created_at) AS mes,
-            SUM(CASE WHEN tipo = 'Receita' THEN valor ELSE 0 END) AS entradas,
-            SUM(CASE WHEN tipo = 'Despesa' THEN valor ELSE 0 END) AS saidas
-        FROM financeiro
-        WHERE oficina_id = %s
-        GROUP BY YEAR(created_at), MONTH(created_at)
-        ORDER BY ano, mes
-    """, (oficina_id,))
-    movimentacao_mensal = cursor.fetchall()
+# =====================================================
+# BOOTSTRAP DO FRONTEND (COM FILTRO DE OFICINA)
+# =====================================================
+# Seções do dashboard na primeira tela (a lista completa de OS fica para o /dashboard)
+SECOES_BOOTSTRAP = ("ordens_recentes", "ordens_por_status", "pecas_alerta", "resumo_mensal", "movimentacao_mensal")
+# Clientes e veículos vêm só na primeira página; o resto pelo proximo_cursor
+BOOTSTRAP_LIMITE = int(os.getenv("BOOTSTRAP_LIMITE", "200"))
+
+@dashboard_bp.route("/bootstrap", methods=["GET"])
+@etag("oficinas", "servicos", "pecas", "clientes", "veiculos", "ordens_servico", "financeiro", extra=mes_atual)
+def bootstrap():
+    """
+    Tudo o que a primeira tela precisa depois do login, em uma resposta:
+    oficina, serviços, peças, primeira página de clientes e veículos e o
+    dashboard. As consultas rodam em paralelo em conexões do pool. `versao`
+    é a ETag: com If-None-Match o cliente revalida tudo com uma consulta
+    (versoes_entidades) e recebe 304 se nada mudou.
+    """
+    oficina_id = oficina_da_requisicao()
+    
+    if not oficina_id:
+        return jsonify({"erro": "oficina_id é obrigatório"}), 400
 
-    cursor.close()
-    conn.close()
+    hoje = datetime.now()
+    limite = f"LIMIT {BOOTSTRAP_LIMITE + 1}"
+
+    def buscar_oficina(cur):
+        cur.execute("SELECT * FROM oficinas WHERE id = %s", (oficina_id,))
+        return cur.fetchone()
+
+    consultas = {
+        "oficina": buscar_oficina,
+        "servicos": buscar_todos(SQL_LISTAR_SERVICOS.format(filtro="", limite=""), (oficina_id,)),
+        "pecas": buscar_todos(SQL_LISTAR_PECAS.format(filtro="", limite=""), (oficina_id,)),
+        "clientes": buscar_todos(
+            SQL_LISTAR_CLIENTES.format(filtro="", coluna="nome", direcao="ASC", limite=limite), (oficina_id,)
+        ),
+        "veiculos": buscar_todos(SQL_LISTAR_VEICULOS.format(filtro="", limite=limite), (oficina_id, oficina_id)),
+    }
+    dashboard = consultas_dashboard(oficina_id, RECENTES_PADRAO, hoje.year, hoje.month)
+    consultas.update({sec: dashboard[sec] for sec in SECOES_BOOTSTRAP})
 
-    return jsonify({
-        "ordens_servico": ordens_servico,
-        "pecas": pecas,
-        "movimentacao_mensal": movimentacao_mensal,
-        "resumo_mensal": {
-            "entrada": entrada,
-            "saida": saida,
-            "saldo": saldo
-        }
+    # A conexão da requisição (usada pelo @etag) volta ao pool antes de
+    # esperar pelas consultas, como no /dashboard
+    inicio = perf_counter()
+    liberar_db()
+    resultados, tempos = aguardar_consultas(consultar_em_paralelo(consultas))
+    tempos["total"] = (perf_counter() - inicio) * 1000
+
+    if not resultados["oficina"]:
+        return jsonify({"erro": "Oficina não encontrada"}), 404
+
+    resultados["resumo_mensal"] = com_saldo(resultados["resumo_mensal"])
+
+    resposta = jsonify({
+        "versao": g.etag,
+        "oficina": resultados["oficina"],
+        "servicos": resultados["servicos"],
+        "pecas": resultados["pecas"],
+        # Mesmo envelope do /clientes?limit= e /veiculos?limit=
+        "clientes": montar_pagina(resultados["clientes"], BOOTSTRAP_LIMITE, ["nome", "id"]),
+        "veiculos": montar_pagina(resultados["veiculos"], BOOTSTRAP_LIMITE, ["marca", "modelo", "id"]),
+        "dashboard": {sec: resultados[sec] for sec in SECOES_BOOTSTRAP},
     })
+    resposta.headers["Server-Timing"] = server_timing(tempos)
+    return resposta
+
+# =====================================================
+# SINCRONIZAÇÃO INCREMENTAL (COM FILTRO DE OFICINA)
+# =====================================================
+@dashboard_bp.route("/sync", methods=["GET"])
+def sincronizar():
+    """
+    Tudo que foi criado, alterado ou excluído na oficina depois de ?since=
+    (marca d'água devolvida pela chamada anterior; sem ela, tudo). Enquanto
+    tem_mais for true, chame de novo com a nova marca. Com "resincronizar":
+    true a marca venceu a retenção das lápides: descarte os dados locais e
+    aplique a resposta como sincronização completa.
+    """
+    oficina_id = oficina_da_requisicao()
+
+    if not oficina_id:
+        return jsonify({"erro": "oficina_id é obrigatório"}), 400
+
+    try:
+        desde, pagina = sincronizacao.ler_marca(request.args.get("since"))
+    except ValueError:
+        return jsonify({"erro": "since inválido"}), 400
+
+    conn = get_db()
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        dados = sincronizacao.mudancas(cursor, oficina_id, desde, pagina)
+        cursor.close()
+        conn.close()
+        return jsonify(dados)
+    except Exception as e:
+        cursor.close()
+        conn.close()
+        return jsonify({"erro": str(e)}), 500
+
+# =====================================================
+# EVENTOS EM TEMPO REAL (SSE, COM FILTRO DE OFICINA)
+# =====================================================
+@dashboard_bp.route("/eventos", methods=["GET"])
+def eventos_oficina():
+    """
+    Stream text/event-stream com um evento `mudanca` ({entidade: versão})
+    sempre que OS, financeiro ou peças da oficina mudam. O primeiro evento
+    traz as versões atuais. Ao receber, o painel refaz o GET com
+    If-None-Match em vez de fazer polling.
+    """
+    oficina_id = oficina_da_requisicao()
+
+    if not oficina_id:
+        return jsonify({"erro": "oficina_id é obrigatório"}), 400
+
+    try:
+        assinatura = get_hub().assinar(oficina_id)
+    except HubLotado:
+        return jsonify({"erro": "Limite de conexões em tempo real atingido, tente novamente"}), 503
+
+    resposta = Response(transmitir(assinatura), mimetype="text/event-stream")
+    resposta.headers["Cache-Control"] = "no-cache"
+    # Sem buffer em proxies (nginx), senão os eventos chegam atrasados
+    resposta.headers["X-Accel-Buffering"] = "no"
+    return resposta
 
 # =====================================================
 # USUÁRIOS (COM FILTRO DE OFICINA)
 # =====================================================
 @dashboard_bp.route("/usuarios", methods=["GET"])
+@etag("usuarios")
 def listar_usuarios():
+    pagina, erro = ler_paginacao(2)
+    if erro:
+        return erro
+
     try:
-        oficina_id = request.args.get("oficina_id")
+        oficina_id = oficina_da_requisicao()
         
         # Se não tem oficina_id, retorna todos usuários (para tela de login)
-        conn = get_connection()
+        conn = get_db()
         cursor = conn.cursor(dictionary=True)
         
+        filtro, params = filtro_keyset([("nome", "ASC"), ("id", "ASC")], pagina)
         if oficina_id:
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT id, nome, email, cargo, departamento, status, created_at, oficina_id
                 FROM usuarios
-                WHERE oficina_id = %s
-                ORDER BY nome
-            """, (oficina_id,))
+                WHERE oficina_id = %s {filtro}
+                ORDER BY nome, id
+                {sql_limite(pagina)}
+            """, (oficina_id, *params))
         else:
             # Para tela de login - retorna todos usuários ativos
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT id, nome, email, cargo, departamento, status, created_at, oficina_id
                 FROM usuarios
-                WHERE status = 'Ativo'
-                ORDER BY nome
-            """)
+                WHERE status = 'Ativo' {filtro}
+                ORDER BY nome, id
+                {sql_limite(pagina)}
+            """, params)
         
         dados = cursor.fetchall()
         cursor.close()
         conn.close()
         
-        return jsonify(dados)
+        return responder_pagina(dados, pagina, ["nome", "id"])
     except Exception as e:
         print(f"Erro ao listar usuários: {str(e)}")
         return jsonify({"erro": f"Erro ao listar usuários: {str(e)}"}), 500
 
+def buscar_usuario_login(email):
+    """Registro de autenticação do email ativo, lido do banco e guardado no cache"""
+    geracao = usuarios_login.geracao()
+    conn = get_db()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT u.id, u.nome, u.email, u.cargo, u.departamento, u.status, u.senha, u.oficina_id, o.nome AS oficina_nome
+        FROM usuarios u
+        LEFT JOIN oficinas o ON u.oficina_id = o.id
+        WHERE u.email = %s AND u.status = 'Ativo'
+    """, (email,))
+    usuario = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    usuarios_login.guardar(email, usuario, geracao)
+    return usuario
+
+def usuario_login_vigente(usuario):
+    """Se o registro do cache ainda vale: usuário ativo, mesma senha, cargo e oficina"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT senha, cargo, oficina_id FROM usuarios
+        WHERE id = %s AND status = 'Ativo'
+    """, (usuario['id'],))
+    atual = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    return atual is not None and tuple(atual) == (usuario['senha'], usuario['cargo'], usuario['oficina_id'])
+
 @dashboard_bp.route("/login", methods=["POST"])
 def login_usuario():
     data = request.json
-    email = data.get("email", "")
+    email = normalizar_email(data.get("email", ""))
     senha = data.get("senha", "")
     
     if not email or not senha:
         return jsonify({"erro": "Email e senha são obrigatórios"}), 400
     
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    
     try:
-        cursor.execute("""
-            SELECT u.id, u.nome, u.email, u.cargo, u.departamento, u.status, u.senha, u.oficina_id, o.nome AS oficina_nome
-            FROM usuarios u
-            LEFT JOIN oficinas o ON u.oficina_id = o.id
-            WHERE u.email = %s AND u.status = 'Ativo'
-        """, (email,))
-        usuario = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        # Logins repetidos e emails inexistentes saem do cache do worker
+        encontrado, usuario = usuarios_login.obter(email)
+        if not encontrado:
+            usuario = buscar_usuario_login(email)
         
         if not usuario:
             return jsonify({"erro": "Usuário não encontrado"}), 404
         
-        # Verificar senha com bcrypt
-        if not verify_password(senha, usuario['senha']):
+        # Cópia: o registro do cache não pode perder a senha
+        usuario = dict(usuario)
+        
+        # Verificar senha com bcrypt (fora do loop do worker, no pool de senhas)
+        confere, hash_novo = senhas.verificar(senha, usuario['senha'])
+        
+        if confere and encontrado and not usuario_login_vigente(usuario):
+            # Alterado em outro worker (senha, status, exclusão): vale o banco
+            usuarios_login.invalidar(email, usuario['id'])
+            usuario = buscar_usuario_login(email)
+            if not usuario:
+                return jsonify({"erro": "Usuário não encontrado"}), 404
+            usuario = dict(usuario)
+            confere, hash_novo = senhas.verificar(senha, usuario['senha'])
+        
+        if not confere:
             return jsonify({"erro": "Senha incorreta"}), 401
         
+        if hash_novo:
+            # SENHA_CUSTO mudou: grava o hash refeito, só se a senha não
+            # tiver sido trocada no meio tempo
+            conn = get_db()
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE usuarios SET senha = %s
+                WHERE id = %s AND senha = %s
+            """, (hash_novo, usuario['id'], usuario['senha']))
+            cursor.close()
+            conn.close()
+            usuarios_login.invalidar(email)
+        
         # Remove senha da resposta
         del usuario['senha']
         
-        return jsonify({"msg": "Login bem-sucedido", "usuario": usuario}), 200
+        token, expira_em = emitir(usuario['id'], usuario['oficina_id'], usuario['cargo'])
+        return jsonify({
+            "msg": "Login bem-sucedido",
+            "usuario": usuario,
+            "token": token,
+            "expira_em": expira_em
+        }), 200
+    except SenhaOcupada:
+        return resposta_senha_ocupada()
     except Exception as e:
-        cursor.close()
-        conn.close()
         return jsonify({"erro": str(e)}), 400
 
 @dashboard_bp.route("/usuarios", methods=["POST"])
+@transacional
+@altera("usuarios")
 def criar_usuario():
     data = request.json
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
         nome = data.get("nome", "")
-        email = data.get("email", "")
+        email = normalizar_email(data.get("email", ""))
         cargo = data.get("cargo", "")
         departamento = data.get("departamento", "")
         senha = data.get("senha", "")
         status = data.get("status", "Ativo")
-        oficina_id = data.get("oficina_id")
+        oficina_id = oficina_da_requisicao()
         
         if not nome or not email or not senha:
+            cursor.close()
+            conn.close()
             return jsonify({"erro": "Nome, email e senha são obrigatórios"}), 400
         
         if not oficina_id:
+            cursor.close()
+            conn.close()
             return jsonify({"erro": "oficina_id é obrigatório"}), 400
         
+        # Sem sessão (cadastro), só o primeiro usuário de uma oficina sem
+        # usuários; a trava na oficina impede dois "primeiros" ao mesmo tempo
+        if SESSAO_OBRIGATORIA and not g.get("sessao"):
+            cursor.execute("SELECT id FROM oficinas WHERE id = %s FOR UPDATE", (oficina_id,))
+            oficina = cursor.fetchone()
+            cursor.execute("SELECT 1 FROM usuarios WHERE oficina_id = %s LIMIT 1", (oficina_id,))
+            if not oficina or cursor.fetchone():
+                cursor.close()
+                conn.close()
+                return jsonify({"erro": "Sessão obrigatória, faça login"}), 401
+        
         # Hash da senha com bcrypt
         senha_hash = hash_password(senha)
         
@@ -1466,11 +2190,16 @@ def criar_usuario():
         """, (nome, email, cargo, departamento, senha_hash, status, oficina_id))
         
         novo_id = cursor.lastrowid
-        conn.commit()
         cursor.close()
         conn.close()
+        # O email pode estar no cache como inexistente
+        apos_commit(usuarios_login.invalidar, email)
         
         return jsonify({"msg": "Usuário criado com sucesso", "usuario_id": novo_id}), 201
+    except SenhaOcupada:
+        cursor.close()
+        conn.close()
+        return resposta_senha_ocupada()
     except Exception as e:
         conn.rollback()
         cursor.close()
@@ -1478,21 +2207,25 @@ def criar_usuario():
         return jsonify({"erro": str(e)}), 400
 
 @dashboard_bp.route("/usuarios/<int:usuario_id>", methods=["PUT"])
+@transacional
+@altera("usuarios")
 def editar_usuario(usuario_id):
     data = request.json
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
         nome = data.get("nome", "")
-        email = data.get("email", "")
+        email = normalizar_email(data.get("email", ""))
         cargo = data.get("cargo", "")
         departamento = data.get("departamento", "")
         senha = data.get("senha", "")
         status = data.get("status", "Ativo")
-        oficina_id = data.get("oficina_id")
+        oficina_id = oficina_da_requisicao()
         
         if not oficina_id:
+            cursor.close()
+            conn.close()
             return jsonify({"erro": "oficina_id é obrigatório"}), 400
         
         # Se senha foi fornecida, fazer hash
@@ -1512,11 +2245,16 @@ def editar_usuario(usuario_id):
             WHERE id = %s AND oficina_id = %s
         """, (nome, email, cargo, departamento, senha_hash, status, usuario_id, oficina_id))
         
-        conn.commit()
         cursor.close()
         conn.close()
+        # Email antigo (pelo id) e novo
+        apos_commit(usuarios_login.invalidar, email, usuario_id)
         
         return jsonify({"msg": "Usuário atualizado com sucesso"}), 200
+    except SenhaOcupada:
+        cursor.close()
+        conn.close()
+        return resposta_senha_ocupada()
     except Exception as e:
         conn.rollback()
         cursor.close()
@@ -1524,23 +2262,26 @@ def editar_usuario(usuario_id):
         return jsonify({"erro": str(e)}), 400
 
 @dashboard_bp.route("/usuarios/<int:usuario_id>", methods=["DELETE"])
+@transacional
+@altera("usuarios")
 def deletar_usuario(usuario_id):
-    oficina_id = request.args.get("oficina_id")
+    oficina_id = oficina_da_requisicao()
     
     if not oficina_id:
         return jsonify({"erro": "oficina_id é obrigatório"}), 400
     
-    conn = get_connection()
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
+        sincronizacao.registrar_exclusao(cursor, "usuarios", "id = %s AND oficina_id = %s", (usuario_id, oficina_id))
         cursor.execute("""
             DELETE FROM usuarios 
             WHERE id = %s AND oficina_id = %s
         """, (usuario_id, oficina_id))
-        conn.commit()
         cursor.close()
         conn.close()
+        apos_commit(usuarios_login.invalidar, usuario_id=usuario_id)
         
         return jsonify({"msg": "Usuário excluído com sucesso"}), 200
     except Exception as e:
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Estatísticas por cliente (colunas total_os, total_gasto e ultima_visita de
+clientes).
+
+Os handlers de ordens de serviço recalculam as estatísticas do cliente da OS
+na mesma transação, então /clientes lê as colunas direto (e pode ordenar
+pelos maiores clientes) em vez de agrupar todas as OS da oficina.
+
+Uso como comando:
+    python estatisticas_clientes.py verificar [oficina_id]   # só lista divergências
+    python estatisticas_clientes.py reparar [oficina_id]     # corrige as divergências
+Pode rodar pelo cron (ex.: reparar toda madrugada); a saída é o relatório.
+"""
+
+import sys
+import time
+from connection import get_connection
+
+# Estatísticas calculadas a partir das OS (fonte da verdade)
+SQL_CALCULO = """
+    SELECT
+        c.id,
+        c.oficina_id,
+        COUNT(o.id) AS total_os,
+        COALESCE(SUM(CASE WHEN LOWER(o.status) = 'finalizada' THEN o.total ELSE 0 END), 0) AS total_gasto,
+        MAX(o.created_at) AS ultima_visita
+    FROM clientes c
+    LEFT JOIN ordens_servico o ON o.cliente_id = c.id AND o.oficina_id = c.oficina_id
+    WHERE {where}
+    GROUP BY c.id, c.oficina_id
+"""
+
+
+def _recalcular(cursor, where, params):
+    cursor.execute(f"""
+        UPDATE clientes c
+        JOIN ({SQL_CALCULO.format(where=where)}) e ON e.id = c.id
+        SET c.total_os = e.total_os,
+            c.total_gasto = e.total_gasto,
+            c.ultima_visita = e.ultima_visita
+    """, params)
+
+
+def atualizar(cursor, oficina_id, cliente_ids):
+    """Recalcula as estatísticas dos clientes dados (chamar depois da escrita na OS)"""
+    cliente_ids = sorted({int(i) for i in cliente_ids if i is not None})
+    if not cliente_ids:
+        return
+    marcas = ", ".join(["%s"] * len(cliente_ids))
+    _recalcular(cursor, f"c.oficina_id = %s AND c.id IN ({marcas})", (oficina_id, *cliente_ids))
+
+
+def divergencias(cursor, oficina_id):
+    """Clientes da oficina cujas colunas não batem com as OS"""
+    cursor.execute(f"""
+        SELECT c.id, c.total_os, c.total_gasto, c.ultima_visita,
+               e.total_os AS total_os_real,
+               e.total_gasto AS total_gasto_real,
+               e.ultima_visita AS ultima_visita_real
+        FROM clientes c
+        JOIN ({SQL_CALCULO.format(where="c.oficina_id = %s")}) e ON e.id = c.id
+        WHERE NOT (c.total_os <=> e.total_os)
+           OR NOT (c.total_gasto <=> e.total_gasto)
+           OR NOT (c.ultima_visita <=> e.ultima_visita)
+        ORDER BY c.id
+    """, (oficina_id,))
+    return cursor.fetchall()
+
+
+def executar(reparar=False, oficina_id=None):
+    """Confere (e opcionalmente repara) as estatísticas, uma transação por oficina"""
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    total = 0
+
+    try:
+        if oficina_id:
+            oficinas = [int(oficina_id)]
+        else:
+            cursor.execute("SELECT DISTINCT oficina_id FROM clientes WHERE oficina_id IS NOT NULL")
+            oficinas = [row["oficina_id"] for row in cursor.fetchall()]
+
+        for oficina in oficinas:
+            inicio = time.perf_counter()
+            conn.start_transaction()
+            erradas = divergencias(cursor, oficina)
+            for row in erradas:
+                print(
+                    f"  ✗ Cliente {row['id']}: "
+                    f"os {row['total_os']}→{row['total_os_real']}, "
+                    f"gasto {row['total_gasto']}→{row['total_gasto_real']}, "
+                    f"última visita {row['ultima_visita']}→{row['ultima_visita_real']}"
+                )
+            if reparar and erradas:
+                atualizar(cursor, oficina, [row["id"] for row in erradas])
+            conn.commit()
+            total += len(erradas)
+            print(f"✓ Oficina {oficina}: {len(erradas)} divergência(s) em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+        acao = "reparada(s)" if reparar else "encontrada(s)"
+        print(f"\n✓ {total} divergência(s) {acao} em {len(oficinas)} oficina(s)")
+        return total
+    except Exception as e:
+        conn.rollback()
+        print(f"✗ Erro ao verificar estatísticas de clientes: {str(e)}")
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("verificar", "reparar"):
+        print("Uso: python estatisticas_clientes.py verificar|reparar [oficina_id]")
+        sys.exit(2)
+
+    print("=" * 60)
+    print("ESTATÍSTICAS DE CLIENTES")
+    print("=" * 60 + "\n")
+    divergentes = executar(sys.argv[1] == "reparar", sys.argv[2] if len(sys.argv) > 2 else None)
+    # verificar sai com 1 quando há divergência (útil em monitoramento)
+    sys.exit(1 if divergentes and sys.argv[1] == "verificar" else 0)
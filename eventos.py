@@ -0,0 +1,208 @@
+"""
+Eventos em tempo real (Server-Sent Events) por oficina.
+
+Cada worker tem um hub: os assinantes de /eventos ficam registrados por
+oficina e uma única thread vigia lê as versões (versoes_entidades) de todas
+as oficinas assinadas a cada SSE_INTERVALO segundos. Quando alguma versão
+muda, o hub avisa os assinantes daquela oficina. Como as versões vêm do
+banco, escritas feitas em qualquer worker chegam a todos, e só depois do
+commit.
+
+Os assinantes não têm thread própria: cada um é só um dicionário de
+pendências e um Event. Com o worker gevent do gunicorn (Procfile), cada
+conexão aberta custa uma greenlet parada no wait.
+"""
+
+import json
+import os
+import threading
+import time
+from connection import get_connection
+
+# Entidades que interessam às telas da oficina (dashboard e quadro de OS)
+SSE_ENTIDADES = ("ordens_servico", "financeiro", "pecas")
+SSE_INTERVALO = float(os.getenv("SSE_INTERVALO", "1"))
+SSE_HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", "15"))
+SSE_MAX_ASSINANTES = int(os.getenv("SSE_MAX_ASSINANTES", "500"))
+
+
+class HubLotado(Exception):
+    """Limite de assinantes do worker atingido"""
+
+
+class Assinatura:
+    __slots__ = ("oficina_id", "pendentes", "sinal")
+
+    def __init__(self, oficina_id):
+        self.oficina_id = oficina_id
+        # {entidade: versão}; mudanças repetidas se sobrescrevem, então um
+        # assinante lento nunca acumula fila
+        self.pendentes = {}
+        self.sinal = threading.Event()
+
+
+class Hub:
+    def __init__(self, intervalo, max_assinantes):
+        self.intervalo = intervalo
+        self.max_assinantes = max_assinantes
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._assinaturas = {}
+        self._versoes = {}
+        self._total = 0
+        self._vigia = None
+        self._stats = {
+            "assinaturas": 0,
+            "cancelamentos": 0,
+            "recusadas": 0,
+            "consultas": 0,
+            "erros": 0,
+            "eventos": 0,
+        }
+
+    def assinar(self, oficina_id):
+        assinatura = Assinatura(str(oficina_id))
+        with self._lock:
+            if self._total >= self.max_assinantes:
+                self._stats["recusadas"] += 1
+                raise HubLotado(f"{self._total} assinantes neste worker")
+            self._assinaturas.setdefault(assinatura.oficina_id, set()).add(assinatura)
+            self._total += 1
+            self._stats["assinaturas"] += 1
+            # Primeiro evento: as versões atuais, se o hub já as conhece
+            conhecidas = self._versoes.get(assinatura.oficina_id)
+            if conhecidas:
+                assinatura.pendentes.update(conhecidas)
+                assinatura.sinal.set()
+            if self._vigia is None or not self._vigia.is_alive():
+                self._vigia = threading.Thread(target=self._vigiar, name="sse-hub", daemon=True)
+                self._vigia.start()
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            assinaturas = self._assinaturas.get(assinatura.oficina_id)
+            if assinaturas is None or assinatura not in assinaturas:
+                return
+            assinaturas.discard(assinatura)
+            if not assinaturas:
+                del self._assinaturas[assinatura.oficina_id]
+                self._versoes.pop(assinatura.oficina_id, None)
+            self._total -= 1
+            self._stats["cancelamentos"] += 1
+
+    def proximos(self, assinatura, timeout):
+        """Espera mudanças por até `timeout` segundos ({} se nada mudou)"""
+        assinatura.sinal.wait(timeout)
+        with self._lock:
+            pendentes = assinatura.pendentes
+            assinatura.pendentes = {}
+            assinatura.sinal.clear()
+        return pendentes
+
+    def publicar(self, oficina_id, mudancas):
+        with self._lock:
+            for assinatura in self._assinaturas.get(str(oficina_id), ()):
+                assinatura.pendentes.update(mudancas)
+                assinatura.sinal.set()
+                self._stats["eventos"] += 1
+
+    def _ler_versoes(self, oficinas):
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            marcas = ", ".join(["%s"] * len(oficinas))
+            cursor.execute(f"""
+                SELECT oficina_id, entidade, versao FROM versoes_entidades
+                WHERE oficina_id IN ({marcas})
+                  AND entidade IN ({", ".join(["%s"] * len(SSE_ENTIDADES))})
+            """, (*oficinas, *SSE_ENTIDADES))
+            versoes = {oficina: dict.fromkeys(SSE_ENTIDADES, 0) for oficina in oficinas}
+            for oficina_id, entidade, versao in cursor.fetchall():
+                versoes[str(oficina_id)][entidade] = versao
+            return versoes
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _vigiar(self):
+        """Uma consulta por intervalo para todas as oficinas assinadas neste worker"""
+        while True:
+            time.sleep(self.intervalo)
+            with self._lock:
+                oficinas = list(self._assinaturas)
+            if not oficinas:
+                continue
+
+            try:
+                atuais = self._ler_versoes(oficinas)
+            except Exception as e:
+                with self._lock:
+                    self._stats["erros"] += 1
+                print(f"Erro ao ler versões para eventos: {str(e)}")
+                continue
+
+            with self._lock:
+                self._stats["consultas"] += 1
+            for oficina_id, versoes in atuais.items():
+                with self._lock:
+                    if oficina_id not in self._assinaturas:
+                        continue
+                    anteriores = self._versoes.get(oficina_id, {})
+                    self._versoes[oficina_id] = versoes
+                mudancas = {e: v for e, v in versoes.items() if anteriores.get(e) != v}
+                if mudancas:
+                    self.publicar(oficina_id, mudancas)
+
+    def stats(self):
+        with self._lock:
+            dados = dict(self._stats)
+            dados.update({
+                "assinantes": self._total,
+                "oficinas": len(self._assinaturas),
+                "max_assinantes": self.max_assinantes,
+                "intervalo": self.intervalo,
+                "pid": self.pid,
+            })
+            return dados
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    """Hub do processo atual (recriado após fork dos workers do gunicorn)"""
+    global _hub
+    if _hub is None or _hub.pid != os.getpid():
+        with _hub_lock:
+            if _hub is None or _hub.pid != os.getpid():
+                _hub = Hub(SSE_INTERVALO, SSE_MAX_ASSINANTES)
+    return _hub
+
+
+def hub_stats():
+    return get_hub().stats()
+
+
+def evento_sse(nome, dados):
+    return f"event: {nome}\ndata: {json.dumps(dados, separators=(',', ':'))}\n\n"
+
+
+def transmitir(assinatura, heartbeat=SSE_HEARTBEAT):
+    """
+    Corpo da resposta text/event-stream. Quando o cliente desconecta, o
+    próximo yield (no máximo um heartbeat depois) encerra o gerador e a
+    assinatura é cancelada.
+    """
+    hub = get_hub()
+    try:
+        yield f"retry: {int(SSE_INTERVALO * 1000) * 3}\n\n"
+        while True:
+            mudancas = hub.proximos(assinatura, heartbeat)
+            if mudancas:
+                yield evento_sse("mudanca", mudancas)
+            else:
+                yield ": ping\n\n"
+    finally:
+        hub.cancelar(assinatura)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Resumo mensal do financeiro (tabela financeiro_mensal).
+
+Cada oficina tem uma linha por (ano, mês) com o total de entradas (Receita)
+e saídas (Despesa). Os handlers de financeiro mantêm a tabela na mesma
+transação do lançamento, então /dashboard e /financeiro/resumo leem
+O(meses) linhas em vez de varrer o financeiro inteiro.
+
+Uso como comando (reconstrói a partir do financeiro):
+    python financeiro_mensal.py            # todas as oficinas
+    python financeiro_mensal.py <oficina_id>
+"""
+
+import sys
+import time
+from connection import get_connection
+
+
+def ajustar(cursor, where, params, sinal=1):
+    """
+    Soma (sinal=1) ou subtrai (sinal=-1) no resumo os lançamentos do
+    financeiro que casam com `where`. Para UPDATE/DELETE chame com -1 antes
+    do comando (trava as linhas até o fim da transação); para INSERT/UPDATE
+    chame com +1 depois.
+    """
+    if sinal < 0:
+        _subtrair(cursor, where, params)
+        return
+    cursor.execute(f"""
+        INSERT INTO financeiro_mensal (oficina_id, ano, mes, entradas, saidas)
+        SELECT
+            oficina_id,
+            YEAR(created_at),
+            MONTH(created_at),
+            SUM(CASE WHEN tipo = 'Receita' THEN valor ELSE 0 END),
+            SUM(CASE WHEN tipo = 'Despesa' THEN valor ELSE 0 END)
+        FROM financeiro
+        WHERE {where}
+        GROUP BY oficina_id, YEAR(created_at), MONTH(created_at)
+        ON DUPLICATE KEY UPDATE
+            entradas = entradas + VALUES(entradas),
+            saidas = saidas + VALUES(saidas)
+    """, params)
+
+
+def _subtrair(cursor, where, params):
+    """
+    Valores "antes" do UPDATE/DELETE lidos com FOR UPDATE: duas edições
+    simultâneas do mesmo lançamento não podem subtrair o mesmo valor antigo
+    (a segunda espera a primeira e lê o valor já alterado).
+    """
+    cursor.execute(f"""
+        SELECT oficina_id, YEAR(created_at), MONTH(created_at), tipo, valor
+        FROM financeiro
+        WHERE {where}
+        FOR UPDATE
+    """, params)
+    totais = {}
+    for row in cursor.fetchall():
+        oficina_id, ano, mes, tipo, valor = row.values() if isinstance(row, dict) else row
+        if oficina_id is None or ano is None or valor is None:
+            continue
+        total = totais.setdefault((oficina_id, ano, mes), [0, 0])
+        if tipo == "Receita":
+            total[0] += valor
+        elif tipo == "Despesa":
+            total[1] += valor
+    if not totais:
+        return
+    cursor.executemany("""
+        INSERT INTO financeiro_mensal (oficina_id, ano, mes, entradas, saidas)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            entradas = entradas + VALUES(entradas),
+            saidas = saidas + VALUES(saidas)
+    """, [(*chave, -entradas, -saidas) for chave, (entradas, saidas) in totais.items()])
+
+
+def reconstruir_oficina(cursor, oficina_id):
+    """Refaz as linhas da oficina a partir do financeiro, na transação de quem chamou"""
+    cursor.execute("DELETE FROM financeiro_mensal WHERE oficina_id = %s", (oficina_id,))
+    ajustar(cursor, "oficina_id = %s", (oficina_id,))
+
+
+def resumo_do_mes(cursor, oficina_id, ano, mes):
+    cursor.execute("""
+        SELECT
+            COALESCE(SUM(entradas), 0) AS entrada,
+            COALESCE(SUM(saidas), 0) AS saida
+        FROM financeiro_mensal
+        WHERE oficina_id = %s AND ano = %s AND mes = %s
+    """, (oficina_id, ano, mes))
+    return cursor.fetchone()
+
+
+def resumo_total(cursor, oficina_id):
+    cursor.execute("""
+        SELECT
+            COALESCE(SUM(entradas), 0) AS receita,
+            COALESCE(SUM(saidas), 0) AS despesa
+        FROM financeiro_mensal
+        WHERE oficina_id = %s
+    """, (oficina_id,))
+    return cursor.fetchone()
+
+
+SQL_MOVIMENTACAO = """
+    SELECT ano, mes, entradas, saidas
+    FROM financeiro_mensal
+    WHERE oficina_id = %s AND (entradas <> 0 OR saidas <> 0)
+    ORDER BY ano, mes
+"""
+
+
+def movimentacao(cursor, oficina_id):
+    cursor.execute(SQL_MOVIMENTACAO, (oficina_id,))
+    return cursor.fetchall()
+
+
+def reconstruir(oficina_id=None):
+    """Recalcula o resumo a partir do financeiro, uma transação por oficina"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        if oficina_id:
+            oficinas = [int(oficina_id)]
+        else:
+            cursor.execute("SELECT DISTINCT oficina_id FROM financeiro WHERE oficina_id IS NOT NULL")
+            oficinas = [row[0] for row in cursor.fetchall()]
+
+        for oficina in oficinas:
+            inicio = time.perf_counter()
+            conn.start_transaction()
+            reconstruir_oficina(cursor, oficina)
+            meses = cursor.rowcount
+            conn.commit()
+            print(f"✓ Oficina {oficina}: {meses} mês(es) em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+        print(f"\n✓ Resumo mensal reconstruído para {len(oficinas)} oficina(s)")
+    except Exception as e:
+        conn.rollback()
+        print(f"✗ Erro ao reconstruir resumo mensal: {str(e)}")
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("RECONSTRUÇÃO DO RESUMO MENSAL DO FINANCEIRO")
+    print("=" * 60 + "\n")
+    reconstruir(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,79 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from uuid import UUID
+import dataclasses
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Sem orjson cai no json da stdlib com o mesmo formato
+    orjson = None
+
+_DIAS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_MESES = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def http_date(valor):
+    """Mesmo formato de werkzeug.http.http_date (usado pelo jsonify padrão), sem passar pelo email.utils"""
+    if isinstance(valor, datetime):
+        if valor.tzinfo is not None:
+            valor = valor.astimezone(timezone.utc)
+    else:
+        valor = datetime(valor.year, valor.month, valor.day)
+    return (
+        f"{_DIAS[valor.weekday()]}, {valor.day:02d} {_MESES[valor.month - 1]} {valor.year:04d} "
+        f"{valor.hour:02d}:{valor.minute:02d}:{valor.second:02d} GMT"
+    )
+
+
+def _default(o):
+    # Decimal (total, valor, preco_unitario) e datas (created_at) são os casos quentes
+    tipo = type(o)
+    if tipo is Decimal:
+        return str(o)
+    if tipo is datetime or tipo is date:
+        return http_date(o)
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, (Decimal, UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {tipo.__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Provider JSON do app usando orjson quando disponível.
+
+    Mantém o contrato do jsonify padrão: chaves ordenadas, Decimal como string
+    e datas no formato HTTP ("Mon, 01 Jan 2024 10:00:00 GMT"). A única
+    diferença é que caracteres não ASCII saem em UTF-8 em vez de \\uXXXX,
+    o que é o mesmo JSON para qualquer parser.
+    """
+
+    default = staticmethod(_default)
+
+    if orjson is not None:
+        _OPCOES = orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+        def dumps(self, obj, **kwargs):
+            opcoes = self._OPCOES
+            if kwargs.get("indent"):
+                opcoes |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=_default, option=opcoes).decode("utf-8")
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    else:
+
+        def dumps(self, obj, **kwargs):
+            kwargs.setdefault("default", _default)
+            kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+            kwargs.setdefault("sort_keys", self.sort_keys)
+            return json.dumps(obj, **kwargs)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Migrações versionadas do banco.
+
+Cada arquivo migrations/NNN_nome.sql (ou NNN_nome.py, para migrações de
+dados que usam o backfill em lotes) é uma versão. As versões aplicadas
+ficam registradas em schema_migrations (com o checksum do arquivo), então
+rodar de novo só aplica as pendentes. Comandos de DDL que já estavam
+aplicados à mão (coluna, índice ou tabela já existentes) são pulados com
+aviso, para o runner poder assumir um banco que já recebeu os scripts
+antigos.
+
+Antes e depois de aplicar, mostra o EXPLAIN das consultas quentes.
+
+Uso:
+    python migrar.py                  # aplica as pendentes (com EXPLAIN antes/depois)
+    python migrar.py --status         # lista aplicadas e pendentes
+    python migrar.py --explain        # só mostra os planos
+    python migrar.py --baseline NNN   # marca até NNN como aplicadas, sem executar
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import os
+import re
+import sys
+import time
+import mysql.connector
+from connection import get_connection
+
+PASTA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+ARQUIVO = re.compile(r"^(\d{3})_(\w+)\.(sql|py)$")
+
+# Erros de "já existe" / "não existe": o comando já estava aplicado
+JA_APLICADO_ERRNOS = {
+    1050,  # tabela já existe
+    1060,  # coluna duplicada
+    1061,  # nome de índice duplicado
+    1091,  # coluna/índice a remover não existe
+    1826,  # foreign key duplicada
+}
+
+# Consultas quentes da API (mesmos predicados dos handlers), para EXPLAIN
+CONSULTAS_QUENTES = {
+    "financeiro por data": """
+        SELECT id, tipo, valor, created_at FROM financeiro
+        WHERE oficina_id = %(oficina)s
+        ORDER BY created_at DESC, id DESC LIMIT 100
+    """,
+    "ordens_servico por data": """
+        SELECT id, status, total FROM ordens_servico
+        WHERE oficina_id = %(oficina)s
+        ORDER BY created_at DESC, id DESC LIMIT 100
+    """,
+    "clientes por nome": """
+        SELECT id, nome FROM clientes
+        WHERE oficina_id = %(oficina)s
+        ORDER BY nome, id LIMIT 100
+    """,
+    "pecas por nome": """
+        SELECT id, nome, quantidade FROM pecas
+        WHERE oficina_id = %(oficina)s
+        ORDER BY nome, id LIMIT 100
+    """,
+    "receita da OS": """
+        SELECT id, valor FROM financeiro
+        WHERE ordem_servico_id = %(ordem)s AND tipo = 'Receita'
+    """,
+    "veiculo por placa": """
+        SELECT id FROM veiculos
+        WHERE oficina_id = %(oficina)s AND placa = 'ABC1D23'
+    """,
+    "login": """
+        SELECT id, senha FROM usuarios
+        WHERE email = 'admin@exemplo.com' AND status = 'Ativo'
+    """,
+}
+
+
+def ler_migracoes():
+    """[(versao, nome, caminho, checksum)] em ordem de versão"""
+    migracoes = []
+    for arquivo in sorted(os.listdir(PASTA)):
+        encontrado = ARQUIVO.match(arquivo)
+        if not encontrado:
+            continue
+        caminho = os.path.join(PASTA, arquivo)
+        with open(caminho, "rb") as f:
+            checksum = hashlib.sha256(f.read()).hexdigest()
+        migracoes.append((int(encontrado.group(1)), encontrado.group(2), caminho, checksum))
+    return migracoes
+
+
+def dividir_sql(texto):
+    """Separa o arquivo em comandos (por ';' fora de aspas), sem os comentários --"""
+    comandos, atual, aspas = [], [], None
+    for linha in texto.splitlines():
+        if aspas is None and linha.strip().startswith("--"):
+            continue
+        for c in linha:
+            if aspas:
+                if c == aspas:
+                    aspas = None
+            elif c in ("'", '"', "`"):
+                aspas = c
+            elif c == ";":
+                comando = "".join(atual).strip()
+                if comando:
+                    comandos.append(comando)
+                atual = []
+                continue
+            atual.append(c)
+        atual.append("\n")
+    resto = "".join(atual).strip()
+    if resto:
+        comandos.append(resto)
+    return comandos
+
+
+def preparar(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            versao INT PRIMARY KEY,
+            nome VARCHAR(255) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            duracao_ms INT NOT NULL DEFAULT 0,
+            aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def aplicadas(cursor):
+    cursor.execute("SELECT versao, checksum FROM schema_migrations")
+    return dict(cursor.fetchall())
+
+
+def registrar(cursor, versao, nome, checksum, duracao_ms):
+    cursor.execute("""
+        INSERT INTO schema_migrations (versao, nome, checksum, duracao_ms)
+        VALUES (%s, %s, %s, %s)
+    """, (versao, nome, checksum, duracao_ms))
+
+
+def mostrar_planos(cursor, titulo):
+    cursor.execute("SELECT MIN(id) FROM oficinas")
+    oficina = cursor.fetchone()[0] or 1
+    cursor.execute("SELECT MIN(id) FROM ordens_servico WHERE oficina_id = %s", (oficina,))
+    ordem = cursor.fetchone()[0] or 1
+
+    print(f"\n--- EXPLAIN {titulo} (oficina {oficina}) ---")
+    for nome, sql in CONSULTAS_QUENTES.items():
+        print(f"\n[{nome}]")
+        try:
+            cursor.execute("EXPLAIN " + sql, {"oficina": oficina, "ordem": ordem})
+            colunas = [d[0] for d in cursor.description]
+            for row in cursor.fetchall():
+                plano = dict(zip(colunas, row))
+                if "operator info" in plano:
+                    # TiDB: id / estRows / task / access object / operator info
+                    print(f"  {plano['id']:<36} {plano.get('access object') or '':<50} {plano['operator info'][:80]}")
+                else:
+                    # MySQL: type / key / rows / Extra
+                    print(f"  {plano.get('table')}: type={plano.get('type')} key={plano.get('key')} rows={plano.get('rows')} {plano.get('Extra') or ''}")
+        except mysql.connector.Error as e:
+            print(f"  ⚠️ {e}")
+
+
+def status(cursor):
+    feitas = aplicadas(cursor)
+    for versao, nome, _, checksum in ler_migracoes():
+        if versao not in feitas:
+            marca = "pendente"
+        elif feitas[versao] != checksum:
+            marca = "aplicada (arquivo alterado depois!)"
+        else:
+            marca = "aplicada"
+        print(f"  {versao:03d} {nome:<30} {marca}")
+
+
+def baseline(cursor, ate):
+    feitas = aplicadas(cursor)
+    for versao, nome, _, checksum in ler_migracoes():
+        if versao <= ate and versao not in feitas:
+            registrar(cursor, versao, nome, checksum, 0)
+            print(f"✓ {versao:03d} {nome} marcada como aplicada")
+
+
+def executar_sql(conn, cursor, comandos):
+    """Executa os comandos em ordem, pulando DDL que já estava aplicado"""
+    for comando in comandos:
+        try:
+            cursor.execute(comando)
+            if cursor.with_rows:
+                cursor.fetchall()
+        except mysql.connector.Error as e:
+            if e.errno in JA_APLICADO_ERRNOS:
+                print(f"   ⚠️ já aplicado, pulando: {e.msg}")
+                continue
+            conn.rollback()
+            print(f"   Comando: {comando[:200]}")
+            raise
+
+
+def aplicar(conn, cursor, explain=True):
+    feitas = aplicadas(cursor)
+    pendentes = [m for m in ler_migracoes() if m[0] not in feitas]
+
+    for versao, nome, _, checksum in ler_migracoes():
+        if versao in feitas and feitas[versao] != checksum:
+            print(f"⚠️ {versao:03d} {nome}: arquivo mudou depois de aplicado (não será reaplicado)")
+
+    if not pendentes:
+        print("✓ Banco já está na última versão")
+        return 0
+
+    if explain:
+        mostrar_planos(cursor, "ANTES")
+
+    print()
+    for versao, nome, caminho, checksum in pendentes:
+        inicio = time.perf_counter()
+        print(f"→ {versao:03d} {nome}")
+        try:
+            if caminho.endswith(".py"):
+                spec = importlib.util.spec_from_file_location(f"migracao_{versao:03d}", caminho)
+                modulo = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(modulo)
+                modulo.migrar(conn, cursor)
+            else:
+                with open(caminho, encoding="utf-8") as f:
+                    executar_sql(conn, cursor, dividir_sql(f.read()))
+        except Exception as e:
+            print(f"✗ Erro na migração {versao:03d}: {e}")
+            raise
+        duracao_ms = int((time.perf_counter() - inicio) * 1000)
+        registrar(cursor, versao, nome, checksum, duracao_ms)
+        conn.commit()
+        print(f"✓ {versao:03d} {nome} aplicada em {duracao_ms} ms")
+
+    if explain:
+        mostrar_planos(cursor, "DEPOIS")
+    return len(pendentes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrações versionadas do banco")
+    parser.add_argument("--status", action="store_true", help="lista aplicadas e pendentes")
+    parser.add_argument("--explain", action="store_true", help="só mostra o EXPLAIN das consultas quentes")
+    parser.add_argument("--baseline", type=int, metavar="NNN", help="marca até NNN como aplicadas sem executar")
+    parser.add_argument("--sem-explain", action="store_true", help="aplica sem mostrar os planos")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("MIGRAÇÕES DO BANCO")
+    print("=" * 60)
+
+    conn = get_connection()
+    cursor = conn.cursor(buffered=True)
+    try:
+        preparar(cursor)
+        if args.status:
+            status(cursor)
+        elif args.explain:
+            mostrar_planos(cursor, "ATUAL")
+        elif args.baseline is not None:
+            baseline(cursor, args.baseline)
+            conn.commit()
+        else:
+            aplicar(conn, cursor, explain=not args.sem_explain)
+    except Exception as e:
+        print(f"✗ Migração interrompida: {e}")
+        sys.exit(1)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
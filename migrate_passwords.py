@@ -1,65 +1,120 @@
 #!/usr/bin/env python3
 """
 Script para migrar senhas antigas em texto plano para hash bcrypt.
-Execute apenas uma vez após implementar a segurança!
+
+Os hashes são calculados em paralelo (um processo por núcleo) e gravados
+em lotes: cada lote é um executemany e um commit, junto com o checkpoint
+(último id, na tabela backfill_checkpoints). Se for interrompido, rodar de
+novo continua do último lote gravado, sem janela de manutenção.
+
+O custo do bcrypt é o mesmo da API (SENHA_CUSTO).
+
+Uso:
+    python migrate_passwords.py [--processos N] [--lote N] [--reiniciar] [--sim]
 """
 
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 import bcrypt
-import mysql.connector
+from backfill import gravar_checkpoint, ler_checkpoint, preparar
 from connection import get_connection
+from senhas import SENHA_CUSTO
+
+CHECKPOINT = "migrate_passwords"
+
+# Hashes bcrypt começam com $2a$, $2b$ ou $2y$
+FILTRO_TEXTO_PLANO = "senha NOT LIKE '$2_$%%'"
+
 
-def migrate_passwords():
+def _hash(senha):
+    return bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt(rounds=SENHA_CUSTO)).decode('utf-8')
+
+
+def migrate_passwords(processos=None, lote=500, reiniciar=False):
+    processos = processos or os.cpu_count() or 1
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    
+    cursor = conn.cursor()
+
     try:
-        # Buscar todos os usuários com senhas em texto plano (não começam com $2b$)
-        cursor.execute("SELECT id, senha FROM usuarios WHERE senha NOT LIKE '$2b$%'")
-        usuarios_com_senha_plana = cursor.fetchall()
-        
-        if not usuarios_com_senha_plana:
+        preparar(cursor)
+        checkpoint = None if reiniciar else ler_checkpoint(cursor, CHECKPOINT)
+        ultimo_id, migradas = (checkpoint[0], checkpoint[1]) if checkpoint and not checkpoint[2] else (0, 0)
+
+        cursor.execute(f"SELECT COUNT(*) FROM usuarios WHERE id > %s AND {FILTRO_TEXTO_PLANO}", (ultimo_id,))
+        total = cursor.fetchone()[0]
+
+        if not total:
             print("✓ Todas as senhas já estão em hash!")
-            cursor.close()
-            conn.close()
+            gravar_checkpoint(cursor, CHECKPOINT, "usuarios", ultimo_id, migradas, concluido=True)
+            conn.commit()
             return
-        
-        print(f"Encontrados {len(usuarios_com_senha_plana)} usuários com senhas em texto plano")
-        print("Iniciando migração...\n")
-        
-        # Migrar cada senha
-        for usuario in usuarios_com_senha_plana:
-            usuario_id = usuario['id']
-            senha_plana = usuario['senha']
-            
-            # Gerar hash da senha em texto plano
-            senha_hash = bcrypt.hashpw(senha_plana.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-            
-            # Atualizar no banco
-            cursor.execute(
-                "UPDATE usuarios SET senha = %s WHERE id = %s",
-                (senha_hash, usuario_id)
-            )
-            
-            print(f"✓ Usuário ID {usuario_id} - Senha migrada")
-        
+
+        if ultimo_id:
+            print(f"→ Retomando depois do usuário ID {ultimo_id} ({migradas} senhas já migradas)")
+        print(f"Encontrados {total} usuários com senhas em texto plano")
+        print(f"Iniciando migração com {processos} processo(s), lotes de {lote}, custo {SENHA_CUSTO}...\n")
+
+        inicio = time.perf_counter()
+        feitas = 0
+        with ProcessPoolExecutor(max_workers=processos) as pool:
+            while True:
+                cursor.execute(f"""
+                    SELECT id, senha FROM usuarios
+                    WHERE id > %s AND {FILTRO_TEXTO_PLANO}
+                    ORDER BY id
+                    LIMIT %s
+                """, (ultimo_id, lote))
+                usuarios = cursor.fetchall()
+                if not usuarios:
+                    break
+
+                hashes = pool.map(_hash, [senha for _, senha in usuarios], chunksize=max(len(usuarios) // (processos * 4), 1))
+
+                # Só troca se a senha não mudou enquanto o lote era calculado
+                cursor.executemany(
+                    "UPDATE usuarios SET senha = %s WHERE id = %s AND senha = %s",
+                    [(senha_hash, usuario_id, senha) for (usuario_id, senha), senha_hash in zip(usuarios, hashes)]
+                )
+                ultimo_id = usuarios[-1][0]
+                feitas += len(usuarios)
+                gravar_checkpoint(cursor, CHECKPOINT, "usuarios", ultimo_id, migradas + feitas)
+                conn.commit()
+
+                decorrido = time.perf_counter() - inicio
+                taxa = feitas / decorrido
+                restante = (total - feitas) / taxa if taxa else 0
+                print(f"✓ {feitas}/{total} senhas migradas (até ID {ultimo_id}), {taxa:.1f} senhas/s, faltam ~{restante:.0f} s")
+
+        gravar_checkpoint(cursor, CHECKPOINT, "usuarios", ultimo_id, migradas + feitas, concluido=True)
         conn.commit()
-        print(f"\n✓ Migração concluída! {len(usuarios_com_senha_plana)} senhas foram hasheadas")
-        
+        decorrido = time.perf_counter() - inicio
+        print(f"\n✓ Migração concluída! {feitas} senhas foram hasheadas em {decorrido:.1f} s ({feitas / decorrido:.1f} senhas/s)")
+
     except Exception as e:
         conn.rollback()
         print(f"✗ Erro durante migração: {str(e)}")
+        print("  Os lotes já gravados ficam; rode de novo para continuar.")
     finally:
         cursor.close()
         conn.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra senhas em texto plano para hash bcrypt")
+    parser.add_argument("--processos", type=int, default=None, help="processos de hash (padrão: núcleos da CPU)")
+    parser.add_argument("--lote", type=int, default=500, help="senhas por commit")
+    parser.add_argument("--reiniciar", action="store_true", help="ignora o checkpoint e começa do início")
+    parser.add_argument("--sim", action="store_true", help="não pede confirmação")
+    args = parser.parse_args()
+
     print("=" * 60)
     print("MIGRAÇÃO DE SENHAS - De Texto Plano para Hash Bcrypt")
     print("=" * 60 + "\n")
-    
-    confirmacao = input("Deseja continuar? (Digite 'SIM' para confirmar): ")
-    
+
+    confirmacao = "SIM" if args.sim else input("Deseja continuar? (Digite 'SIM' para confirmar): ")
+
     if confirmacao.upper() == "SIM":
-        migrate_passwords()
+        migrate_passwords(args.processos, args.lote, args.reiniciar)
     else:
         print("Migração cancelada.")
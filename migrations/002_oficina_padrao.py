@@ -0,0 +1,51 @@
+"""
+MIGRATION: Oficina padrão para dados antigos
+
+Substitui aplicar_migration.py e atualizar_ordem_servico_servicos.py:
+registros de antes do multi-oficina (oficina_id NULL) passam para a
+primeira oficina, criada como "Oficina Principal" se não houver nenhuma.
+ordem_servico_servicos também ganha oficina_id.
+
+O preenchimento usa o backfill em lotes (backfill.py) em vez de um UPDATE
+por tabela, então pode rodar com a API no ar e retoma se for interrompido.
+"""
+
+import backfill
+from migrar import executar_sql
+
+TABELAS = (
+    "clientes",
+    "veiculos",
+    "servicos",
+    "pecas",
+    "ordens_servico",
+    "usuarios",
+    "financeiro",
+    "ordem_servico_servicos",
+)
+
+
+def migrar(conn, cursor):
+    executar_sql(conn, cursor, [
+        "ALTER TABLE ordem_servico_servicos ADD COLUMN oficina_id INT",
+        "CREATE INDEX idx_ordem_servico_servicos_oficina ON ordem_servico_servicos(oficina_id)",
+        """
+        INSERT INTO oficinas (nome, cnpj, telefone, email)
+        SELECT 'Oficina Principal', '', '', ''
+        FROM DUAL
+        WHERE NOT EXISTS (SELECT 1 FROM oficinas)
+        """,
+    ])
+    conn.commit()
+
+    cursor.execute("SELECT MIN(id) FROM oficinas")
+    oficina_id = cursor.fetchone()[0]
+
+    for tabela in TABELAS:
+        backfill.executar(
+            f"002_oficina_padrao_{tabela}", tabela,
+            "oficina_id = %s", (oficina_id,),
+            where="oficina_id IS NULL",
+            # Tabela de relacionamento: sem id próprio, anda pela OS
+            chave="ordem_servico_id" if tabela == "ordem_servico_servicos" else "id",
+        )
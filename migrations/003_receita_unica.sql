@@ -0,0 +1,29 @@
+-- =====================================================
+-- MIGRATION: Receita única por OS
+-- =====================================================
+-- Garante no banco que cada OS tem no máximo UMA receita,
+-- permitindo o lançamento via INSERT ... ON DUPLICATE KEY UPDATE
+-- em editar_ordem_servico (sem SELECT antes, sem duplicatas
+-- quando duas requisições finalizam a mesma OS ao mesmo tempo).
+--
+-- A chave usa uma coluna gerada que só é preenchida para
+-- tipo = 'Receita': despesas continuam podendo ser várias por OS
+-- (NULL não conflita em índice único).
+-- =====================================================
+
+-- 1. Remover receitas duplicadas (mantém a mais antiga de cada OS)
+DELETE f1 FROM financeiro f1
+JOIN financeiro f2
+  ON f2.oficina_id = f1.oficina_id
+ AND f2.ordem_servico_id = f1.ordem_servico_id
+ AND f2.tipo = 'Receita'
+ AND f2.id < f1.id
+WHERE f1.tipo = 'Receita';
+
+-- 2. Coluna gerada: ordem_servico_id apenas quando for receita
+ALTER TABLE financeiro
+    ADD COLUMN receita_os_id INT AS (CASE WHEN tipo = 'Receita' THEN ordem_servico_id END) VIRTUAL;
+
+-- 3. Chave única (oficina_id, ordem_servico_id, tipo) restrita às receitas
+ALTER TABLE financeiro
+    ADD UNIQUE KEY uk_financeiro_receita_os (oficina_id, receita_os_id, tipo);
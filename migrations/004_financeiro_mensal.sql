@@ -0,0 +1,32 @@
+-- =====================================================
+-- MIGRATION: Resumo mensal do financeiro
+-- =====================================================
+-- Tabela mantida pelos handlers de financeiro (na mesma transação
+-- do lançamento). /dashboard e /financeiro/resumo passam a ler
+-- uma linha por mês em vez de varrer todo o financeiro.
+-- Para reconstruir depois: python financeiro_mensal.py
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS financeiro_mensal (
+    oficina_id INT NOT NULL,
+    ano SMALLINT NOT NULL,
+    mes TINYINT NOT NULL,
+    entradas DECIMAL(14,2) NOT NULL DEFAULT 0,
+    saidas DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (oficina_id, ano, mes)
+);
+
+-- Carga inicial a partir do histórico
+INSERT INTO financeiro_mensal (oficina_id, ano, mes, entradas, saidas)
+SELECT
+    oficina_id,
+    YEAR(created_at),
+    MONTH(created_at),
+    SUM(CASE WHEN tipo = 'Receita' THEN valor ELSE 0 END),
+    SUM(CASE WHEN tipo = 'Despesa' THEN valor ELSE 0 END)
+FROM financeiro
+WHERE oficina_id IS NOT NULL
+GROUP BY oficina_id, YEAR(created_at), MONTH(created_at)
+ON DUPLICATE KEY UPDATE
+    entradas = VALUES(entradas),
+    saidas = VALUES(saidas);
@@ -0,0 +1,16 @@
+-- =====================================================
+-- MIGRATION: Versões por oficina/entidade
+-- =====================================================
+-- Cada escrita pela API incrementa a versão da entidade alterada
+-- (clientes, veiculos, servicos, pecas, ordens_servico, financeiro,
+-- usuarios) na mesma transação. O cache de respostas compara essas
+-- versões para nunca servir dado antigo entre workers.
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS versoes_entidades (
+    oficina_id INT NOT NULL,
+    entidade VARCHAR(32) NOT NULL,
+    versao BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (oficina_id, entidade)
+);
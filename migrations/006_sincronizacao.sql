@@ -0,0 +1,40 @@
+-- =====================================================
+-- MIGRATION: Sincronização incremental (/sync)
+-- =====================================================
+-- updated_at com microssegundos em todas as entidades da oficina,
+-- mantido pelo próprio banco (ON UPDATE), com índice por oficina para
+-- o /sync ler só o que mudou depois da marca d'água do cliente.
+-- Exclusões feitas pela API deixam uma lápide em `exclusoes`.
+-- =====================================================
+
+ALTER TABLE clientes
+    ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE veiculos
+    ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE servicos
+    ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE pecas
+    ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE ordens_servico
+    ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE financeiro
+    ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE usuarios
+    ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+
+CREATE INDEX idx_clientes_sync ON clientes (oficina_id, updated_at, id);
+CREATE INDEX idx_veiculos_sync ON veiculos (oficina_id, updated_at, id);
+CREATE INDEX idx_servicos_sync ON servicos (oficina_id, updated_at, id);
+CREATE INDEX idx_pecas_sync ON pecas (oficina_id, updated_at, id);
+CREATE INDEX idx_ordens_servico_sync ON ordens_servico (oficina_id, updated_at, id);
+CREATE INDEX idx_financeiro_sync ON financeiro (oficina_id, updated_at, id);
+CREATE INDEX idx_usuarios_sync ON usuarios (oficina_id, updated_at, id);
+
+CREATE TABLE IF NOT EXISTS exclusoes (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    oficina_id INT NOT NULL,
+    entidade VARCHAR(32) NOT NULL,
+    registro_id INT NOT NULL,
+    deleted_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX idx_exclusoes_sync (oficina_id, deleted_at, id)
+);
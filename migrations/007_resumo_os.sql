@@ -0,0 +1,50 @@
+-- =====================================================
+-- MIGRATION: Resumo das ordens de serviço
+-- =====================================================
+-- Uma linha por OS com cliente, veículo, serviços e contagem de
+-- lançamentos já resolvidos. Mantida pelos handlers na mesma transação
+-- das escritas; /ordens-servico lê direto pela chave primária.
+-- Para recalcular depois: python resumo_os.py [oficina_id]
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS ordens_servico_resumo (
+    oficina_id INT NOT NULL,
+    ordem_id INT NOT NULL,
+    nome_cliente VARCHAR(255),
+    marca_veiculo VARCHAR(100),
+    modelo_veiculo VARCHAR(100),
+    servico_nome TEXT,
+    status VARCHAR(50),
+    total DECIMAL(10,2),
+    observacao TEXT,
+    tem_financeiro INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (oficina_id, created_at, ordem_id) CLUSTERED,
+    UNIQUE KEY uk_ordens_servico_resumo_ordem (ordem_id)
+);
+
+-- Carga inicial (REPLACE: pode rodar de novo sem duplicar)
+REPLACE INTO ordens_servico_resumo (
+    oficina_id, ordem_id, nome_cliente, marca_veiculo, modelo_veiculo,
+    servico_nome, status, total, observacao, tem_financeiro, created_at
+)
+SELECT
+    o.oficina_id,
+    o.id,
+    c.nome,
+    v.marca,
+    v.modelo,
+    GROUP_CONCAT(DISTINCT s.nome SEPARATOR ', '),
+    o.status,
+    o.total,
+    o.observacao,
+    COUNT(DISTINCT f.id),
+    o.created_at
+FROM ordens_servico o
+INNER JOIN clientes c ON c.id = o.cliente_id AND c.oficina_id = o.oficina_id
+INNER JOIN veiculos v ON v.id = o.veiculo_id AND v.oficina_id = o.oficina_id
+LEFT JOIN ordem_servico_servicos oss ON oss.ordem_servico_id = o.id
+LEFT JOIN servicos s ON s.id = oss.servico_id AND s.oficina_id = o.oficina_id
+LEFT JOIN financeiro f ON f.ordem_servico_id = o.id AND f.oficina_id = o.oficina_id
+WHERE o.oficina_id IS NOT NULL
+GROUP BY o.oficina_id, o.id, c.nome, v.marca, v.modelo, o.status, o.total, o.observacao, o.created_at;
@@ -0,0 +1,32 @@
+-- =====================================================
+-- MIGRATION: Estatísticas por cliente
+-- =====================================================
+-- Total de OS, total gasto em OS finalizadas e data da última visita,
+-- mantidos pelos handlers de ordens de serviço na mesma transação.
+-- Conferir/corrigir depois: python estatisticas_clientes.py verificar|reparar
+-- =====================================================
+
+ALTER TABLE clientes ADD COLUMN total_os INT NOT NULL DEFAULT 0;
+ALTER TABLE clientes ADD COLUMN total_gasto DECIMAL(12,2) NOT NULL DEFAULT 0;
+ALTER TABLE clientes ADD COLUMN ultima_visita TIMESTAMP NULL;
+
+-- Listagem por nome e "maiores clientes" direto pelo índice
+CREATE INDEX idx_clientes_nome ON clientes (oficina_id, nome, id);
+CREATE INDEX idx_clientes_gasto ON clientes (oficina_id, total_gasto, id);
+CREATE INDEX idx_clientes_total_os ON clientes (oficina_id, total_os, id);
+
+-- Carga inicial
+UPDATE clientes c
+JOIN (
+    SELECT
+        c.id,
+        COUNT(o.id) AS total_os,
+        COALESCE(SUM(CASE WHEN LOWER(o.status) = 'finalizada' THEN o.total ELSE 0 END), 0) AS total_gasto,
+        MAX(o.created_at) AS ultima_visita
+    FROM clientes c
+    LEFT JOIN ordens_servico o ON o.cliente_id = c.id AND o.oficina_id = c.oficina_id
+    GROUP BY c.id
+) e ON e.id = c.id
+SET c.total_os = e.total_os,
+    c.total_gasto = e.total_gasto,
+    c.ultima_visita = e.ultima_visita;
@@ -0,0 +1,33 @@
+-- =====================================================
+-- MIGRATION: Índices compostos das consultas quentes
+-- =====================================================
+-- Os únicos índices além das chaves primárias eram os idx_*_oficina
+-- de uma coluna só. Estes cobrem o filtro por oficina junto com a
+-- ordenação/busca de cada listagem, para o banco não ordenar nem
+-- filtrar depois de ler todas as linhas da oficina.
+-- Rode `python migrar.py --explain` para ver os planos.
+-- =====================================================
+
+-- /financeiro e /ordens-servico: mais recentes primeiro
+CREATE INDEX idx_financeiro_oficina_data ON financeiro (oficina_id, created_at, id);
+CREATE INDEX idx_ordens_servico_oficina_data ON ordens_servico (oficina_id, created_at, id);
+
+-- Listagens por nome (clientes já tem idx_clientes_nome, migration 008)
+CREATE INDEX idx_servicos_nome ON servicos (oficina_id, nome, id);
+CREATE INDEX idx_pecas_nome ON pecas (oficina_id, nome, id);
+CREATE INDEX idx_usuarios_nome ON usuarios (oficina_id, nome, id);
+
+-- Receita/despesas de uma OS
+CREATE INDEX idx_financeiro_os_tipo ON financeiro (ordem_servico_id, tipo);
+
+-- Busca de veículo por placa e listagem por marca/modelo
+CREATE INDEX idx_veiculos_placa ON veiculos (oficina_id, placa);
+CREATE INDEX idx_veiculos_marca_modelo ON veiculos (oficina_id, marca, modelo, id);
+
+-- Login
+CREATE INDEX idx_usuarios_email_status ON usuarios (email, status);
+
+-- OS por cliente/veículo (estatísticas de clientes, exclusões) e por serviço
+CREATE INDEX idx_ordens_servico_cliente ON ordens_servico (oficina_id, cliente_id);
+CREATE INDEX idx_ordens_servico_veiculo ON ordens_servico (oficina_id, veiculo_id);
+CREATE INDEX idx_ordem_servico_servicos_servico ON ordem_servico_servicos (servico_id);
@@ -0,0 +1,13 @@
+-- =====================================================
+-- MIGRATION: Emails de usuário normalizados
+-- =====================================================
+-- O login passa a procurar o email sem espaços e em minúsculas
+-- (criar/editar usuário já gravam assim), usando o índice
+-- idx_usuarios_email_status da migration 009. Aqui os emails já
+-- gravados são normalizados do mesmo jeito. BINARY para a comparação
+-- não ignorar maiúsculas em collations *_ci.
+-- =====================================================
+
+UPDATE usuarios
+SET email = LOWER(TRIM(email))
+WHERE BINARY email <> BINARY LOWER(TRIM(email));
@@ -0,0 +1,8 @@
+-- =====================================================
+-- MIGRATION: Retenção das lápides do /sync
+-- =====================================================
+-- `python sincronizacao.py purgar` apaga as lápides mais velhas que
+-- SYNC_RETENCAO_DIAS; este índice evita varrer a tabela inteira.
+-- =====================================================
+
+CREATE INDEX idx_exclusoes_data ON exclusoes (deleted_at);
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Reconciliação do financeiro com as ordens de serviço.
+
+Substitui check_missing_lancamento.py e fix_missing_lancamento.py. Para
+cada oficina, encontra:
+  - faltando:    OS finalizada sem receita
+  - divergente:  receita com valor diferente do total da OS finalizada
+  - indevida:    receita de OS que não está finalizada
+e corrige tudo em uma transação por oficina, com um comando em conjunto
+por tipo (INSERT ... SELECT com anti-join, UPDATE ... JOIN e DELETE ... JOIN),
+sem trazer os ids para o Python. Na mesma transação refaz o resumo mensal
+da oficina e acerta o resumo de OS, as lápides do /sync e as versões do
+cache. As contagens e exemplos por tipo só são consultados no --dry-run.
+
+Uso:
+    python reconciliar.py                     # corrige todas as oficinas
+    python reconciliar.py --dry-run           # só relata (sai com 1 se achar algo)
+    python reconciliar.py --oficina 3 --dry-run
+
+Pode rodar pelo cron, ex.: todo dia às 3h
+    0 3 * * * cd /app && python reconciliar.py >> reconciliar.log 2>&1
+"""
+
+import argparse
+import sys
+import time
+from connection import TX_RETRIES, get_connection, is_write_conflict
+import financeiro_mensal
+import resumo_os
+import sincronizacao
+import versoes
+
+# Cada inconsistência é um predicado sobre as tabelas da oficina: o mesmo
+# texto vira a contagem do dry-run e o comando que corrige, sem passar ids
+# pelo Python (e sem janela entre achar e corrigir)
+OS_SEM_RECEITA = """
+    ordens_servico o
+    LEFT JOIN financeiro f
+        ON f.ordem_servico_id = o.id AND f.oficina_id = o.oficina_id AND f.tipo = 'Receita'
+"""
+ONDE_FALTANDO = "o.oficina_id = %s AND LOWER(o.status) = 'finalizada' AND f.id IS NULL"
+
+RECEITAS_DAS_OS = """
+    financeiro f
+    JOIN ordens_servico o ON o.id = f.ordem_servico_id AND o.oficina_id = f.oficina_id
+"""
+ONDE_DIVERGENTE = "f.oficina_id = %s AND f.tipo = 'Receita' AND LOWER(o.status) = 'finalizada' AND f.valor <> o.total"
+ONDE_INDEVIDA = "f.oficina_id = %s AND f.tipo = 'Receita' AND LOWER(o.status) <> 'finalizada'"
+
+# (origem, predicado, colunas dos exemplos) de cada tipo, para o dry-run
+CONSULTAS = {
+    "faltando": (OS_SEM_RECEITA, ONDE_FALTANDO, "o.id AS ordem_servico_id, o.total"),
+    "divergente": (RECEITAS_DAS_OS, ONDE_DIVERGENTE, "f.id, f.ordem_servico_id, f.valor, o.total"),
+    "indevida": (RECEITAS_DAS_OS, ONDE_INDEVIDA, "f.id, f.ordem_servico_id, f.valor, o.status"),
+}
+
+EXEMPLOS = 5
+
+
+def detectar(cursor, oficina_id):
+    """{tipo: (total, exemplos)} sem alterar nada (dry-run)"""
+    achados = {}
+    for tipo, (origem, onde, colunas) in CONSULTAS.items():
+        cursor.execute(f"SELECT COUNT(*) AS total FROM {origem} WHERE {onde}", (oficina_id,))
+        total = cursor.fetchone()["total"]
+        exemplos = []
+        if total:
+            cursor.execute(f"SELECT {colunas} FROM {origem} WHERE {onde} ORDER BY o.id LIMIT %s", (oficina_id, EXEMPLOS))
+            exemplos = cursor.fetchall()
+        achados[tipo] = (total, exemplos)
+    return achados
+
+
+def corrigir(cursor, oficina_id):
+    """
+    Corrige tudo com um comando por tipo (dentro da transação da oficina) e
+    retorna {tipo: (linhas corrigidas, [])}
+    """
+    # Lápides do /sync antes do DELETE, pelo mesmo predicado
+    sincronizacao.registrar_exclusao(
+        cursor, "financeiro", f"id IN (SELECT f.id FROM {RECEITAS_DAS_OS} WHERE {ONDE_INDEVIDA})", (oficina_id,)
+    )
+    cursor.execute(f"DELETE f FROM {RECEITAS_DAS_OS} WHERE {ONDE_INDEVIDA}", (oficina_id,))
+    indevidas = cursor.rowcount
+
+    cursor.execute(f"UPDATE {RECEITAS_DAS_OS} SET f.valor = o.total WHERE {ONDE_DIVERGENTE}", (oficina_id,))
+    divergentes = cursor.rowcount
+
+    cursor.execute(f"""
+        INSERT INTO financeiro (ordem_servico_id, tipo, valor, oficina_id, created_at)
+        SELECT o.id, 'Receita', o.total, o.oficina_id, NOW()
+        FROM {OS_SEM_RECEITA}
+        WHERE {ONDE_FALTANDO}
+    """, (oficina_id,))
+    faltando = cursor.rowcount
+
+    if indevidas or divergentes or faltando:
+        # Resumo mensal refeito da oficina (um INSERT ... SELECT), tem_financeiro
+        # das OS que ganharam ou perderam receita e versão do cache
+        financeiro_mensal.reconstruir_oficina(cursor, oficina_id)
+        resumo_os.atualizar_financeiro(cursor, oficina_id)
+        versoes.incrementar(cursor, oficina_id, ("financeiro",))
+
+    return {"faltando": (faltando, []), "divergente": (divergentes, []), "indevida": (indevidas, [])}
+
+
+def relatar(oficina_id, achados):
+    for tipo, (total, exemplos) in achados.items():
+        if not total:
+            continue
+        print(f"  {tipo}: {total}")
+        for row in exemplos:
+            if tipo == "faltando":
+                print(f"    OS {row['ordem_servico_id']}: sem receita (total R$ {row['total']:.2f})")
+            elif tipo == "divergente":
+                print(f"    OS {row['ordem_servico_id']}: receita {row['id']} R$ {row['valor']:.2f}, total R$ {row['total']:.2f}")
+            else:
+                print(f"    OS {row['ordem_servico_id']}: receita {row['id']} com OS '{row['status']}'")
+        if exemplos and total > len(exemplos):
+            print(f"    ... e mais {total - len(exemplos)}")
+
+
+def reconciliar_oficina(conn, cursor, oficina_id, dry_run):
+    for tentativa in range(TX_RETRIES + 1):
+        try:
+            conn.start_transaction()
+            if dry_run:
+                achados = detectar(cursor, oficina_id)
+                conn.rollback()
+            else:
+                achados = corrigir(cursor, oficina_id)
+                conn.commit()
+            return achados, sum(total for total, _ in achados.values())
+        except Exception as e:
+            conn.rollback()
+            if not is_write_conflict(e) or tentativa == TX_RETRIES:
+                raise
+            time.sleep(0.05 * (2 ** tentativa))
+
+
+def executar(oficina_id=None, dry_run=False):
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    total_geral = 0
+
+    try:
+        if oficina_id:
+            oficinas = [int(oficina_id)]
+        else:
+            cursor.execute("SELECT id FROM oficinas ORDER BY id")
+            oficinas = [row["id"] for row in cursor.fetchall()]
+
+        inicio_geral = time.perf_counter()
+        for oficina in oficinas:
+            inicio = time.perf_counter()
+            achados, total = reconciliar_oficina(conn, cursor, oficina, dry_run)
+            ms = (time.perf_counter() - inicio) * 1000
+            acao = "encontrada(s)" if dry_run else "corrigida(s)"
+            print(f"{'✗' if total else '✓'} Oficina {oficina}: {total} inconsistência(s) {acao} em {ms:.0f} ms")
+            relatar(oficina, achados)
+            total_geral += total
+
+        print(f"\nTotal: {total_geral} inconsistência(s) em {len(oficinas)} oficina(s), "
+              f"{time.perf_counter() - inicio_geral:.1f} s" + (" (dry-run, nada alterado)" if dry_run else ""))
+        return total_geral
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconciliação do financeiro com as ordens de serviço")
+    parser.add_argument("--oficina", help="só esta oficina")
+    parser.add_argument("--dry-run", action="store_true", help="só relata, não altera nada")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("RECONCILIAÇÃO FINANCEIRO x ORDENS DE SERVIÇO")
+    print("=" * 60 + "\n")
+    try:
+        total = executar(args.oficina, args.dry_run)
+    except Exception as e:
+        print(f"✗ Erro na reconciliação: {str(e)}")
+        sys.exit(2)
+    # dry-run sai com 1 quando há inconsistências (útil em monitoramento)
+    sys.exit(1 if total and args.dry_run else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Resumo das ordens de serviço (tabela ordens_servico_resumo).
+
+Uma linha por OS com tudo que /ordens-servico e o dashboard mostram: nome
+do cliente, veículo, nomes dos serviços e se tem financeiro. Os handlers
+que mexem em OS, serviços, financeiro, clientes e veículos recalculam as
+linhas das OS afetadas na mesma transação, então a listagem vira uma
+leitura pela chave (oficina_id, created_at, ordem_id), sem joins.
+
+Uso como comando (reconstrói a partir das tabelas de origem):
+    python resumo_os.py            # todas as oficinas
+    python resumo_os.py <oficina_id>
+"""
+
+import sys
+import time
+from connection import get_connection
+
+COLUNAS = """
+    oficina_id, ordem_id, nome_cliente, marca_veiculo, modelo_veiculo,
+    servico_nome, status, total, observacao, tem_financeiro, created_at
+"""
+
+# Mesma consulta que a listagem fazia a cada chamada, agora só nas escritas
+SQL_ORIGEM = """
+    SELECT
+        o.oficina_id,
+        o.id,
+        c.nome,
+        v.marca,
+        v.modelo,
+        GROUP_CONCAT(DISTINCT s.nome SEPARATOR ', '),
+        o.status,
+        o.total,
+        o.observacao,
+        COUNT(DISTINCT f.id),
+        o.created_at
+    FROM ordens_servico o
+    INNER JOIN clientes c ON c.id = o.cliente_id AND c.oficina_id = o.oficina_id
+    INNER JOIN veiculos v ON v.id = o.veiculo_id AND v.oficina_id = o.oficina_id
+    LEFT JOIN ordem_servico_servicos oss ON oss.ordem_servico_id = o.id
+    LEFT JOIN servicos s ON s.id = oss.servico_id AND s.oficina_id = o.oficina_id
+    LEFT JOIN financeiro f ON f.ordem_servico_id = o.id AND f.oficina_id = o.oficina_id
+    WHERE {where}
+    GROUP BY o.oficina_id, o.id, c.nome, v.marca, v.modelo, o.status, o.total, o.observacao, o.created_at
+"""
+
+
+def _ids(linhas):
+    return [row["id"] if isinstance(row, dict) else row[0] for row in linhas]
+
+
+def atualizar(cursor, oficina_id, ordem_ids):
+    """Recalcula o resumo das OS dadas (OS que não existem mais saem do resumo)"""
+    ordem_ids = sorted({int(i) for i in ordem_ids if i is not None})
+    if not ordem_ids:
+        return
+    marcas = ", ".join(["%s"] * len(ordem_ids))
+    cursor.execute(f"""
+        DELETE FROM ordens_servico_resumo
+        WHERE oficina_id = %s AND ordem_id IN ({marcas})
+    """, (oficina_id, *ordem_ids))
+    cursor.execute(
+        f"INSERT INTO ordens_servico_resumo ({COLUNAS}) "
+        + SQL_ORIGEM.format(where=f"o.oficina_id = %s AND o.id IN ({marcas})"),
+        (oficina_id, *ordem_ids),
+    )
+
+
+def atualizar_onde(cursor, oficina_id, where, params):
+    """Recalcula o resumo das OS da oficina que casam com `where` (alias `o`)"""
+    cursor.execute(f"""
+        SELECT o.id FROM ordens_servico o
+        WHERE o.oficina_id = %s AND {where}
+    """, (oficina_id, *params))
+    atualizar(cursor, oficina_id, _ids(cursor.fetchall()))
+
+
+def atualizar_financeiro(cursor, oficina_id):
+    """
+    Acerta tem_financeiro das OS da oficina cujo número de lançamentos
+    mudou, em um UPDATE (para correções em massa do financeiro)
+    """
+    cursor.execute("""
+        UPDATE ordens_servico_resumo r
+        LEFT JOIN (
+            SELECT ordem_servico_id, COUNT(*) AS lancamentos
+            FROM financeiro
+            WHERE oficina_id = %s AND ordem_servico_id IS NOT NULL
+            GROUP BY ordem_servico_id
+        ) f ON f.ordem_servico_id = r.ordem_id
+        SET r.tem_financeiro = COALESCE(f.lancamentos, 0)
+        WHERE r.oficina_id = %s AND r.tem_financeiro <> COALESCE(f.lancamentos, 0)
+    """, (oficina_id, oficina_id))
+
+
+def os_do_financeiro(cursor, where, params):
+    """OS vinculadas aos lançamentos que casam com `where`; chamar antes de UPDATE/DELETE"""
+    cursor.execute(f"""
+        SELECT ordem_servico_id AS id FROM financeiro
+        WHERE {where} AND ordem_servico_id IS NOT NULL
+    """, params)
+    return _ids(cursor.fetchall())
+
+
+def reconstruir(oficina_id=None):
+    """Recalcula o resumo a partir das tabelas de origem, uma transação por oficina"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        if oficina_id:
+            oficinas = [int(oficina_id)]
+        else:
+            cursor.execute("SELECT DISTINCT oficina_id FROM ordens_servico WHERE oficina_id IS NOT NULL")
+            oficinas = [row[0] for row in cursor.fetchall()]
+
+        for oficina in oficinas:
+            inicio = time.perf_counter()
+            conn.start_transaction()
+            cursor.execute("DELETE FROM ordens_servico_resumo WHERE oficina_id = %s", (oficina,))
+            cursor.execute(
+                f"INSERT INTO ordens_servico_resumo ({COLUNAS}) " + SQL_ORIGEM.format(where="o.oficina_id = %s"),
+                (oficina,),
+            )
+            linhas = cursor.rowcount
+            conn.commit()
+            print(f"✓ Oficina {oficina}: {linhas} OS em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+        print(f"\n✓ Resumo de OS reconstruído para {len(oficinas)} oficina(s)")
+    except Exception as e:
+        conn.rollback()
+        print(f"✗ Erro ao reconstruir resumo de OS: {str(e)}")
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("RECONSTRUÇÃO DO RESUMO DE ORDENS DE SERVIÇO")
+    print("=" * 60 + "\n")
+    reconstruir(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,189 @@
+"""
+Hash e verificação de senhas (bcrypt) fora do loop do worker da API.
+
+bcrypt é CPU puro: cada verificação leva centenas de milissegundos de
+propósito. Rodando no loop do worker gevent, uma rajada de logins de manhã
+trava as outras requisições (OS, financeiro) do mesmo worker. Aqui o
+trabalho vai para um pool de threads nativas (o bcrypt solta o GIL enquanto
+calcula), com limite de fila: quando há mais de SENHA_FILA_MAX operações
+pendentes no worker, a próxima é recusada na hora (SenhaOcupada → 503) em
+vez de empilhar.
+
+Com o gevent, as threads vêm do gevent.threadpool (threads do sistema, que
+não são trocadas por greenlets pelo monkey patch); sem ele, de um
+ThreadPoolExecutor comum. Por serem threads do próprio worker, morrem com
+ele: não há processos filhos para encerrar.
+
+O custo do bcrypt vem de SENHA_CUSTO. Se mudar, hashes antigos continuam
+válidos e são refeitos com o custo novo no próximo login (verificar devolve
+o hash novo, calculado na mesma thread do pool).
+
+SENHA_THREADS=0 roda tudo no próprio worker; o limite de fila e as
+métricas continuam valendo.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturoExpirado
+import bcrypt
+
+SENHA_CUSTO = int(os.getenv("SENHA_CUSTO", "12"))
+SENHA_THREADS = int(os.getenv("SENHA_THREADS", "2"))
+SENHA_FILA_MAX = int(os.getenv("SENHA_FILA_MAX", "32"))
+SENHA_TIMEOUT = float(os.getenv("SENHA_TIMEOUT", "10"))
+
+
+class SenhaOcupada(Exception):
+    """Fila de hash de senhas do worker cheia (ou operação expirou)"""
+
+
+def custo_do_hash(senha_hash):
+    """Custo gravado no hash ($2b$12$... → 12); None se não for bcrypt"""
+    partes = senha_hash.split("$")
+    if len(partes) < 4 or not partes[2].isdigit():
+        return None
+    return int(partes[2])
+
+
+# Funções executadas nas threads do pool
+def _gerar_hash(senha, custo):
+    return bcrypt.hashpw(senha.encode("utf-8"), bcrypt.gensalt(rounds=custo)).decode("utf-8")
+
+
+def _verificar(senha, senha_hash, custo):
+    if not bcrypt.checkpw(senha.encode("utf-8"), senha_hash.encode("utf-8")):
+        return False, None
+    if custo_do_hash(senha_hash) != custo:
+        return True, _gerar_hash(senha, custo)
+    return True, None
+
+
+def _novo_executor(threads):
+    """
+    Executor de threads nativas. Com o threading do gevent (monkey patch),
+    um ThreadPoolExecutor comum rodaria em greenlets e o bcrypt travaria o
+    loop; o do gevent.threadpool usa threads do sistema e espera o
+    resultado sem bloquear os outros greenlets.
+    """
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched("threading"):
+            from gevent.threadpool import ThreadPoolExecutor as ThreadPoolGevent
+            return ThreadPoolGevent(max_workers=threads)
+    except ImportError:
+        pass
+    return ThreadPoolExecutor(max_workers=threads, thread_name_prefix="senhas")
+
+
+class PoolSenhas:
+    def __init__(self, threads, fila_max, timeout):
+        self.pid = os.getpid()
+        self.threads = threads
+        self.timeout = timeout
+        self._vagas = threading.BoundedSemaphore(fila_max)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._stats = {
+            "threads": threads,
+            "fila_max": fila_max,
+            "em_andamento": 0,
+            "pico_em_andamento": 0,
+            "executadas": 0,
+            "recusadas": 0,
+            "expiradas": 0,
+            "erros": 0,
+            "rehash": 0,
+            "tempo_total_ms": 0.0,
+            "tempo_max_ms": 0.0,
+        }
+
+    def _get_executor(self):
+        if self._executor is None and self.threads > 0:
+            self._executor = _novo_executor(self.threads)
+        return self._executor
+
+    def executar(self, func, *args):
+        if not self._vagas.acquire(blocking=False):
+            with self._lock:
+                self._stats["recusadas"] += 1
+            raise SenhaOcupada()
+
+        with self._lock:
+            self._stats["em_andamento"] += 1
+            self._stats["pico_em_andamento"] = max(self._stats["pico_em_andamento"], self._stats["em_andamento"])
+
+        inicio = time.perf_counter()
+        try:
+            with self._lock:
+                executor = self._get_executor()
+            if executor is None:
+                return func(*args)
+            return executor.submit(func, *args).result(timeout=self.timeout)
+        except FuturoExpirado:
+            with self._lock:
+                self._stats["expiradas"] += 1
+            raise SenhaOcupada()
+        except Exception:
+            with self._lock:
+                self._stats["erros"] += 1
+            raise
+        finally:
+            # Uma operação expirada ainda ocupa uma thread até terminar, mas
+            # libera a vaga: o timeout já é bem maior que um hash normal
+            ms = (time.perf_counter() - inicio) * 1000
+            with self._lock:
+                self._stats["em_andamento"] -= 1
+                self._stats["executadas"] += 1
+                self._stats["tempo_total_ms"] += ms
+                self._stats["tempo_max_ms"] = max(self._stats["tempo_max_ms"], ms)
+            self._vagas.release()
+
+    def contar_rehash(self):
+        with self._lock:
+            self._stats["rehash"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["tempo_medio_ms"] = round(stats["tempo_total_ms"] / stats["executadas"], 1) if stats["executadas"] else 0
+        stats["tempo_total_ms"] = round(stats["tempo_total_ms"], 1)
+        stats["tempo_max_ms"] = round(stats["tempo_max_ms"], 1)
+        stats["custo"] = SENHA_CUSTO
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Pool do processo atual (recriado após fork dos workers do gunicorn)"""
+    global _pool
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                _pool = PoolSenhas(SENHA_THREADS, SENHA_FILA_MAX, SENHA_TIMEOUT)
+    return _pool
+
+
+def senha_stats():
+    return get_pool().stats()
+
+
+def gerar_hash(senha):
+    """Hash bcrypt da senha com o custo atual (SENHA_CUSTO)"""
+    return get_pool().executar(_gerar_hash, senha, SENHA_CUSTO)
+
+
+def verificar(senha, senha_hash):
+    """
+    Retorna (senha_confere, hash_novo). hash_novo só vem preenchido quando a
+    senha confere e o hash gravado usa outro custo; quem chamou grava ele.
+    """
+    pool = get_pool()
+    confere, novo = pool.executar(_verificar, senha, senha_hash, SENHA_CUSTO)
+    if novo:
+        pool.contar_rehash()
+    return confere, novo
@@ -0,0 +1,214 @@
+"""
+Sessão por token assinado (HMAC-SHA256), sem consulta ao banco.
+
+/login devolve um token "<dados>.<assinatura>" com o id do usuário, a
+oficina, o cargo e a validade. Antes de cada requisição, carregar_sessao
+confere o token e guarda os dados em g.sessao; os handlers pegam a oficina
+por oficina_da_requisicao() em vez de confiar no oficina_id enviado.
+
+Tokens já conferidos ficam num cache LRU do worker (token → dados), então
+a requisição comum custa uma busca em dicionário e a comparação da
+validade; o HMAC só é calculado na primeira vez que o worker vê o token.
+
+Com token válido, a oficina vem SEMPRE dele: o oficina_id da query, da URL
+ou do corpo é ignorado (e um diferente do token recebe 403). O token vai no
+cabeçalho Authorization; só o /eventos aceita ?token=, porque o EventSource
+não envia cabeçalhos (na URL ele iria parar em logs de acesso, proxies e
+no Referer).
+
+Com SESSAO_OBRIGATORIA=true, requisição sem token recebe 401. Enquanto o
+frontend não manda o token em todas as chamadas, o padrão ainda é false e
+a requisição sem token segue com o oficina_id enviado; cada uma é contada
+por endpoint em /debug/sessoes ("sem_token") e logada na primeira vez.
+Quando a contagem parar de crescer, ligue SESSAO_OBRIGATORIA=true (já é o
+valor do .env.example); depois disso o padrão passa a ser true.
+
+O cadastro (POST /oficinas e o primeiro usuário de uma oficina sem
+usuários, em POST /usuarios) funciona sem sessão mesmo com a obrigatória.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from flask import g, jsonify, request
+
+load_dotenv()
+
+SESSAO_TTL = int(os.getenv("SESSAO_TTL", str(12 * 3600)))
+SESSAO_CACHE_MAX = int(os.getenv("SESSAO_CACHE_MAX", "10000"))
+SESSAO_OBRIGATORIA = os.getenv("SESSAO_OBRIGATORIA", "False").lower() == "true"
+
+SEGREDO = os.getenv("SESSAO_SEGREDO", "").encode("utf-8")
+
+# Endpoints que não exigem sessão
+PUBLICOS = {"dashboard.index", "dashboard.health", "dashboard.login_usuario", "dashboard.criar_oficina", "static"}
+
+# Endpoints sem sessão só para cadastrar o primeiro usuário (o handler confere)
+CADASTRO = {"dashboard.criar_usuario"}
+
+# Únicos endpoints que aceitam o token na query string (?token=)
+TOKEN_NA_URL = {"dashboard.eventos_oficina"}
+
+
+class TokenInvalido(Exception):
+    pass
+
+
+def _b64(dados):
+    return base64.urlsafe_b64encode(dados).rstrip(b"=").decode("ascii")
+
+
+def _de_b64(texto):
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def _assinar(dados_b64):
+    return _b64(hmac.new(SEGREDO, dados_b64.encode("ascii"), hashlib.sha256).digest())
+
+
+def emitir(usuario_id, oficina_id, cargo):
+    """Token assinado para o usuário; retorna (token, expira_em unix)"""
+    expira_em = int(time.time()) + SESSAO_TTL
+    dados = {"usuario_id": usuario_id, "oficina_id": oficina_id, "cargo": cargo, "exp": expira_em}
+    dados_b64 = _b64(json.dumps(dados, separators=(",", ":")).encode("utf-8"))
+    return f"{dados_b64}.{_assinar(dados_b64)}", expira_em
+
+
+class CacheSessoes:
+    def __init__(self, max_entradas):
+        self.max_entradas = max_entradas
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidos": 0, "expirados": 0, "evictions": 0}
+
+    def conferir(self, token):
+        """Dados do token; TokenInvalido se a assinatura não bate ou expirou"""
+        agora = time.time()
+        with self._lock:
+            dados = self._dados.get(token)
+            if dados is not None:
+                if dados["exp"] > agora:
+                    self._dados.move_to_end(token)
+                    self._stats["hits"] += 1
+                    return dados
+                del self._dados[token]
+            self._stats["misses"] += 1
+
+        dados_b64, _, assinatura = token.partition(".")
+        if not assinatura or not hmac.compare_digest(assinatura, _assinar(dados_b64)):
+            with self._lock:
+                self._stats["invalidos"] += 1
+            raise TokenInvalido("Token inválido")
+        dados = json.loads(_de_b64(dados_b64))
+        if dados["exp"] <= agora:
+            with self._lock:
+                self._stats["expirados"] += 1
+            raise TokenInvalido("Sessão expirada, faça login novamente")
+
+        with self._lock:
+            self._dados[token] = dados
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+                self._stats["evictions"] += 1
+        return dados
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "entradas": len(self._dados), "max_entradas": self.max_entradas}
+
+
+sessoes = CacheSessoes(SESSAO_CACHE_MAX)
+
+# {endpoint: requisições que usaram o oficina_id enviado, sem token}
+_sem_token = {}
+_sem_token_lock = threading.Lock()
+
+
+def sessao_stats():
+    with _sem_token_lock:
+        sem_token = dict(_sem_token)
+    return {**sessoes.stats(), "obrigatoria": SESSAO_OBRIGATORIA, "sem_token": sem_token}
+
+
+def _registrar_sem_token():
+    """Conta (uma vez por requisição) o uso do oficina_id enviado sem token"""
+    if g.get("_sem_token_contado"):
+        return
+    g._sem_token_contado = True
+    endpoint = request.endpoint or request.path
+    with _sem_token_lock:
+        _sem_token[endpoint] = _sem_token.get(endpoint, 0) + 1
+        primeira = _sem_token[endpoint] == 1
+    if primeira:
+        print(f"⚠️ Requisição sem token em {request.method} {request.path}: usando o oficina_id enviado")
+
+
+def _token_da_requisicao():
+    autorizacao = request.headers.get("Authorization", "")
+    if autorizacao.startswith("Bearer "):
+        return autorizacao[7:].strip()
+    # EventSource (/eventos) não envia cabeçalhos
+    if request.endpoint in TOKEN_NA_URL:
+        return request.args.get("token")
+    return None
+
+
+def _oficina_enviada():
+    oficina_id = request.args.get("oficina_id")
+    if not oficina_id and request.view_args:
+        oficina_id = request.view_args.get("oficina_id")
+    if not oficina_id and request.is_json:
+        oficina_id = (request.get_json(silent=True) or {}).get("oficina_id")
+    return oficina_id
+
+
+def carregar_sessao():
+    g.sessao = None
+    if request.method == "OPTIONS" or request.endpoint in PUBLICOS:
+        return None
+
+    token = _token_da_requisicao()
+    if not token:
+        if SESSAO_OBRIGATORIA and request.endpoint not in CADASTRO:
+            return jsonify({"erro": "Sessão obrigatória, faça login"}), 401
+        return None
+
+    try:
+        g.sessao = sessoes.conferir(token)
+    except (TokenInvalido, ValueError, KeyError, TypeError) as e:
+        mensagem = str(e) if isinstance(e, TokenInvalido) else "Token inválido"
+        return jsonify({"erro": mensagem}), 401
+
+    enviada = _oficina_enviada()
+    if enviada and str(enviada) != str(g.sessao["oficina_id"]):
+        return jsonify({"erro": "oficina_id não corresponde à sessão"}), 403
+    return None
+
+
+def oficina_da_requisicao():
+    """oficina_id da sessão; sem sessão, da query string, da URL ou do corpo JSON"""
+    sessao = g.get("sessao")
+    if sessao:
+        return sessao["oficina_id"]
+    oficina_id = _oficina_enviada()
+    if oficina_id:
+        _registrar_sem_token()
+    return oficina_id
+
+
+def init_app(app):
+    """Confere o token de sessão antes de cada requisição"""
+    if not SEGREDO:
+        # Um segredo gerado por processo faria cada worker (e cada instância)
+        # recusar os tokens emitidos pelos outros: melhor não subir
+        raise RuntimeError(
+            "SESSAO_SEGREDO não definido: configure o mesmo valor aleatório longo em todos os workers "
+            "(ex.: python -c \"import secrets; print(secrets.token_hex(32))\")"
+        )
+    app.before_request(carregar_sessao)
@@ -0,0 +1,246 @@
+"""
+Sincronização incremental (delta sync) por oficina.
+
+Cada tabela de entidade tem updated_at (atualizado pelo próprio banco) e
+toda exclusão feita pela API grava uma lápide em `exclusoes`. A partir de
+uma marca d'água (`since`), o /sync devolve só o que mudou depois dela e a
+nova marca d'água para a próxima chamada.
+
+Cada entidade vem em páginas de até SYNC_LIMITE linhas, em ordem de
+(updated_at, id). Com tem_mais = true a marca devolvida é a da próxima
+página da mesma janela; no fim da janela volta a ser uma data.
+
+As lápides valem SYNC_RETENCAO_DIAS dias. Um cliente com marca mais antiga
+que isso pode ter perdido exclusões, então recebe uma sincronização
+completa com "resincronizar": true (deve descartar os dados locais antes
+de aplicar). As lápides vencidas são apagadas pelo comando:
+    python sincronizacao.py purgar
+
+Pode rodar pelo cron, ex.: todo dia às 4h
+    0 4 * * * cd /app && python sincronizacao.py purgar >> purgar.log 2>&1
+"""
+
+import base64
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from connection import get_connection
+
+# Colunas devolvidas por entidade (nunca SELECT *: usuarios tem senha)
+ENTIDADES_SYNC = {
+    "clientes": "id, nome, telefone, email, cidade, status, total_os, total_gasto, ultima_visita, updated_at",
+    "veiculos": "id, placa, modelo, marca, ano, km, cliente_id, created_at, updated_at",
+    "servicos": "id, nome, categoria, tempo_estimado, preco_base, status, updated_at",
+    "pecas": "id, nome, codigo, quantidade, minimo, preco_unitario, status, created_at, updated_at",
+    "ordens_servico": """id, cliente_id, veiculo_id, status, total, observacao, created_at, updated_at,
+        (SELECT GROUP_CONCAT(oss.servico_id ORDER BY oss.servico_id)
+         FROM ordem_servico_servicos oss
+         WHERE oss.ordem_servico_id = ordens_servico.id) AS servico_ids""",
+    "financeiro": "id, ordem_servico_id, tipo, valor, descricao, created_at, updated_at",
+    "usuarios": "id, nome, email, cargo, departamento, status, created_at, updated_at",
+}
+
+# Mudanças mais novas que isso ficam para a próxima chamada, para não perder
+# transações que gravaram updated_at antes mas ainda não tinham feito commit
+SYNC_ATRASO_SEGUNDOS = float(os.getenv("SYNC_ATRASO_SEGUNDOS", "2"))
+SYNC_LIMITE = int(os.getenv("SYNC_LIMITE", "1000"))
+SYNC_RETENCAO_DIAS = int(os.getenv("SYNC_RETENCAO_DIAS", "30"))
+PURGA_LOTE = 5000
+
+FORMATO_MARCA = "%Y-%m-%dT%H:%M:%S.%f"
+INICIO = datetime(1970, 1, 1)
+
+# Marca de uma sincronização paginada (tem_mais = true): em vez de uma
+# data, leva o fim da janela e um cursor (updated_at, id) por entidade que
+# ainda tem linhas, já que milhares de linhas podem ter o mesmo updated_at
+# (a migration 006 e os UPDATEs em massa gravam o mesmo instante)
+PREFIXO_PAGINA = "pagina:"
+EXCLUSOES = "exclusoes"
+
+
+def _ler_data(valor):
+    """Data de uma marca; sem fuso, como o updated_at gravado pelo banco"""
+    data = datetime.fromisoformat(valor)
+    if data.tzinfo is not None:
+        raise ValueError("marca com fuso horário")
+    return data
+
+
+def ler_marca(valor):
+    """
+    Marca d'água enviada pelo cliente: (desde, pagina). Sem marca é o
+    início de uma sincronização completa; `pagina` só vem preenchida no
+    meio de uma sincronização paginada. ValueError se a marca for inválida.
+    """
+    if not valor:
+        return INICIO, None
+    if not valor.startswith(PREFIXO_PAGINA):
+        return _ler_data(valor), None
+
+    try:
+        dados = json.loads(base64.urlsafe_b64decode(valor[len(PREFIXO_PAGINA):].encode("ascii")))
+        cursores = {}
+        for entidade, (data, registro_id) in dados["cursores"].items():
+            if entidade not in ENTIDADES_SYNC and entidade != EXCLUSOES:
+                raise ValueError
+            cursores[entidade] = (_ler_data(data), int(registro_id))
+        if not cursores:
+            raise ValueError
+        pagina = {"ate": _ler_data(dados["ate"]), "completa": bool(dados["completa"]), "cursores": cursores}
+    except Exception:
+        raise ValueError("marca inválida")
+    return None, pagina
+
+
+def formatar_marca(valor):
+    return valor.strftime(FORMATO_MARCA)
+
+
+def formatar_pagina(ate, completa, cursores):
+    dados = {
+        "ate": formatar_marca(ate),
+        "completa": completa,
+        "cursores": {entidade: [formatar_marca(data), registro_id] for entidade, (data, registro_id) in cursores.items()},
+    }
+    return PREFIXO_PAGINA + base64.urlsafe_b64encode(json.dumps(dados).encode("utf-8")).decode("ascii")
+
+
+def _depois_de(coluna, chave):
+    """Predicado "depois do cursor" (data, id); id None é estritamente depois da data"""
+    data, registro_id = chave
+    if registro_id is None:
+        return f"{coluna} > %s", (data,)
+    return f"({coluna} > %s OR ({coluna} = %s AND id > %s))", (data, data, registro_id)
+
+
+def registrar_exclusao(cursor, entidade, where, params):
+    """Grava lápides das linhas de `entidade` que casam com `where`; chamar antes do DELETE"""
+    cursor.execute(f"""
+        INSERT INTO exclusoes (oficina_id, entidade, registro_id, deleted_at)
+        SELECT oficina_id, %s, id, NOW(6)
+        FROM {entidade}
+        WHERE {where}
+    """, (entidade, *params))
+
+
+def mudancas(cursor, oficina_id, desde, pagina=None, limite=SYNC_LIMITE):
+    """
+    Linhas alteradas e lápides de todas as entidades da oficina depois de
+    `desde` (ou a próxima página de `pagina`, de ler_marca). O cursor deve
+    ser dictionary=True.
+    """
+    resincronizar = False
+    if pagina:
+        ate, completa, cursores = pagina["ate"], pagina["completa"], pagina["cursores"]
+    else:
+        cursor.execute("SELECT NOW(6) - INTERVAL %s MICROSECOND AS ate", (int(SYNC_ATRASO_SEGUNDOS * 1_000_000),))
+        ate = cursor.fetchone()["ate"]
+        if desde >= ate:
+            return {"alterados": {}, "excluidos": [], "marca": formatar_marca(desde), "tem_mais": False}
+
+        # Marca mais velha que a retenção das lápides: exclusões podem ter sido
+        # purgadas, então só uma sincronização completa é segura
+        resincronizar = desde > INICIO and desde < ate - timedelta(days=SYNC_RETENCAO_DIAS)
+        if resincronizar:
+            desde = INICIO
+        completa = desde == INICIO
+
+        cursores = {entidade: (desde, None) for entidade in ENTIDADES_SYNC}
+        # Na sincronização completa o cliente não tem nada a excluir
+        if not completa:
+            cursores[EXCLUSOES] = (desde, None)
+
+    proximos = {}
+    alterados = {}
+
+    for entidade, colunas in ENTIDADES_SYNC.items():
+        if entidade not in cursores:
+            continue
+        depois, params = _depois_de("updated_at", cursores[entidade])
+        cursor.execute(f"""
+            SELECT {colunas}
+            FROM {entidade}
+            WHERE oficina_id = %s AND {depois} AND updated_at <= %s
+            ORDER BY updated_at, id
+            LIMIT %s
+        """, (oficina_id, *params, ate, limite + 1))
+        linhas = cursor.fetchall()
+        if len(linhas) > limite:
+            linhas = linhas[:limite]
+            proximos[entidade] = (linhas[-1]["updated_at"], linhas[-1]["id"])
+        if linhas:
+            alterados[entidade] = linhas
+
+    excluidos = []
+    if EXCLUSOES in cursores:
+        depois, params = _depois_de("deleted_at", cursores[EXCLUSOES])
+        cursor.execute(f"""
+            SELECT id, entidade, registro_id, deleted_at
+            FROM exclusoes
+            WHERE oficina_id = %s AND {depois} AND deleted_at <= %s
+            ORDER BY deleted_at, id
+            LIMIT %s
+        """, (oficina_id, *params, ate, limite + 1))
+        lapides = cursor.fetchall()
+        if len(lapides) > limite:
+            lapides = lapides[:limite]
+            proximos[EXCLUSOES] = (lapides[-1]["deleted_at"], lapides[-1]["id"])
+        excluidos = [
+            {"entidade": l["entidade"], "id": l["registro_id"], "deleted_at": l["deleted_at"]}
+            for l in lapides
+        ]
+
+    tem_mais = bool(proximos)
+    resposta = {
+        "alterados": alterados,
+        "excluidos": excluidos,
+        # Terminada a janela, a marca volta a ser só a data (fim da janela)
+        "marca": formatar_pagina(ate, completa, proximos) if tem_mais else formatar_marca(ate),
+        "tem_mais": tem_mais,
+    }
+    if resincronizar:
+        resposta["resincronizar"] = True
+    return resposta
+
+
+def purgar_exclusoes(dias=SYNC_RETENCAO_DIAS, lote=PURGA_LOTE):
+    """Apaga as lápides mais velhas que `dias`, em lotes (um commit por lote)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    total = 0
+    inicio = time.perf_counter()
+
+    try:
+        while True:
+            conn.start_transaction()
+            cursor.execute("""
+                DELETE FROM exclusoes
+                WHERE deleted_at < NOW(6) - INTERVAL %s DAY
+                LIMIT %s
+            """, (dias, lote))
+            apagadas = cursor.rowcount
+            conn.commit()
+            total += apagadas
+            if apagadas < lote:
+                break
+        print(f"✓ {total} lápide(s) com mais de {dias} dia(s) apagada(s) em {time.perf_counter() - inicio:.1f} s")
+        return total
+    except Exception as e:
+        conn.rollback()
+        print(f"✗ Erro ao purgar lápides: {str(e)}")
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "purgar":
+        print("Uso: python sincronizacao.py purgar")
+        sys.exit(1)
+    print("=" * 60)
+    print(f"PURGA DE LÁPIDES DO /sync (retenção de {SYNC_RETENCAO_DIAS} dias)")
+    print("=" * 60 + "\n")
+    purgar_exclusoes()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Teste de concorrência do lançamento de receita ao finalizar uma OS.
+
+Dispara várias finalizações simultâneas da MESMA OS contra a API em execução
+e confere no banco que existe exatamente UMA receita para ela.
+
+Uso:
+    API_URL=http://localhost:5000 python verificar_finalizacao_concorrente.py <oficina_id> <ordem_id> [paralelas]
+"""
+
+import json
+import os
+import sys
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from connection import get_connection
+
+API_URL = os.getenv("API_URL", "http://localhost:5000").rstrip("/")
+
+
+def editar_os(ordem_id, payload):
+    req = urllib.request.Request(
+        f"{API_URL}/ordens-servico/{ordem_id}",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="PUT",
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def buscar_os(oficina_id, ordem_id):
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT status, total, observacao FROM ordens_servico
+        WHERE id = %s AND oficina_id = %s
+    """, (ordem_id, oficina_id))
+    os_row = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    return os_row
+
+
+def contar_receitas(oficina_id, ordem_id):
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT COUNT(*) AS total FROM financeiro
+        WHERE ordem_servico_id = %s AND tipo = 'Receita' AND oficina_id = %s
+    """, (ordem_id, oficina_id))
+    total = cursor.fetchone()["total"]
+    cursor.close()
+    conn.close()
+    return total
+
+
+def verificar(oficina_id, ordem_id, paralelas):
+    original = buscar_os(oficina_id, ordem_id)
+    if not original:
+        print(f"✗ OS {ordem_id} não encontrada na oficina {oficina_id}")
+        return False
+
+    base = {"oficina_id": oficina_id, "observacao": original["observacao"]}
+    total = float(original["total"] or 0)
+
+    # Começa de uma OS aberta (sem receita)
+    editar_os(ordem_id, {**base, "status": "Aberta", "total": total})
+
+    barreira = threading.Barrier(paralelas)
+
+    def finalizar(i):
+        barreira.wait()
+        return editar_os(ordem_id, {**base, "status": "Finalizada", "total": total + i})
+
+    with ThreadPoolExecutor(max_workers=paralelas) as pool:
+        status = list(pool.map(finalizar, range(paralelas)))
+
+    receitas = contar_receitas(oficina_id, ordem_id)
+
+    # Restaura o status original da OS
+    editar_os(ordem_id, {**base, "status": original["status"], "total": total})
+
+    print(f"Respostas HTTP: {sorted(status)}")
+    print(f"Receitas encontradas para a OS {ordem_id}: {receitas}")
+    return receitas == 1
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(2)
+
+    oficina_id = int(sys.argv[1])
+    ordem_id = int(sys.argv[2])
+    paralelas = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    print("=" * 60)
+    print(f"FINALIZAÇÕES SIMULTÂNEAS: {paralelas} requisições na OS {ordem_id}")
+    print("=" * 60)
+
+    if verificar(oficina_id, ordem_id, paralelas):
+        print("✓ Exatamente uma receita lançada")
+        sys.exit(0)
+    print("✗ Número de receitas diferente de 1")
+    sys.exit(1)
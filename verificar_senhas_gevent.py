@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Teste do pool de senhas com o gevent (como nos workers do gunicorn).
+
+Com o monkey patch do gevent, dispara várias verificações bcrypt ao mesmo
+tempo enquanto um greenlet "relógio" acorda a cada 10 ms, e mede a maior
+pausa do loop. Com o pool de threads o relógio continua andando (pausa de
+poucos ms); com SENHA_THREADS=0 (bcrypt no próprio loop) a pausa é a soma
+das verificações.
+
+Uso:
+    python verificar_senhas_gevent.py [verificacoes]
+"""
+
+from gevent import monkey
+monkey.patch_all()
+
+import sys
+import time
+import gevent
+import senhas
+
+PAUSA_MAXIMA_MS = 100
+
+
+def relogio(pausas):
+    ultimo = time.perf_counter()
+    while True:
+        gevent.sleep(0.01)
+        agora = time.perf_counter()
+        pausas.append(agora - ultimo)
+        ultimo = agora
+
+
+if __name__ == "__main__":
+    verificacoes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    senha_hash = senhas.gerar_hash("senha-de-teste")
+
+    pausas = []
+    greenlet_relogio = gevent.spawn(relogio, pausas)
+    gevent.sleep(0.05)
+
+    inicio = time.perf_counter()
+    resultados = gevent.joinall([
+        gevent.spawn(senhas.verificar, "senha-de-teste", senha_hash)
+        for _ in range(verificacoes)
+    ], raise_error=True)
+    decorrido = time.perf_counter() - inicio
+    gevent.sleep(0.05)
+    greenlet_relogio.kill()
+
+    maior_pausa_ms = max(pausas) * 1000
+    print(f"Pool: {senhas.senha_stats()['threads']} thread(s), custo {senhas.SENHA_CUSTO}")
+    print(f"{verificacoes} verificações em {decorrido:.2f} s, maior pausa do loop: {maior_pausa_ms:.0f} ms")
+
+    if not all(r.value[0] for r in resultados):
+        print("✗ Alguma verificação falhou")
+        sys.exit(1)
+    if maior_pausa_ms > PAUSA_MAXIMA_MS:
+        print(f"✗ O bcrypt travou o loop do gevent (limite {PAUSA_MAXIMA_MS} ms)")
+        sys.exit(1)
+    print("✓ O loop do gevent seguiu atendendo durante o bcrypt")
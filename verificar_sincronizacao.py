@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Teste da paginação do /sync com empates de updated_at.
+
+Cria uma oficina de teste com mais linhas do que cabem numa página, todas
+com o MESMO updated_at (como depois da migration 006 ou de um UPDATE em
+massa), e o mesmo para as lápides. Chama sincronizacao.mudancas página a
+página e confere que a sincronização termina e que cada linha vem
+exatamente uma vez.
+
+Roda numa transação desfeita no fim, então não deixa nada no banco.
+
+Uso:
+    python verificar_sincronizacao.py [limite]
+"""
+
+import sys
+from datetime import datetime, timedelta
+from connection import get_connection
+import sincronizacao
+
+MAX_CHAMADAS = 100
+
+
+def sincronizar_tudo(cursor, oficina_id, since, limite):
+    """Chama mudancas até tem_mais = false; retorna ({entidade: [ids]}, [ids excluídos], chamadas)"""
+    alterados, excluidos = {}, []
+    for chamada in range(1, MAX_CHAMADAS + 1):
+        desde, pagina = sincronizacao.ler_marca(since)
+        resposta = sincronizacao.mudancas(cursor, oficina_id, desde, pagina, limite=limite)
+        for entidade, linhas in resposta["alterados"].items():
+            alterados.setdefault(entidade, []).extend(linha["id"] for linha in linhas)
+        excluidos.extend(lapide["id"] for lapide in resposta["excluidos"])
+        since = resposta["marca"]
+        if not resposta["tem_mais"]:
+            return alterados, excluidos, chamada
+    raise AssertionError(f"tem_mais continua true depois de {MAX_CHAMADAS} chamadas (loop infinito)")
+
+
+def conferir(nome, recebidos, esperados):
+    if sorted(recebidos) != sorted(esperados):
+        faltando = len(set(esperados) - set(recebidos))
+        repetidos = len(recebidos) - len(set(recebidos))
+        raise AssertionError(f"{nome}: {faltando} faltando, {repetidos} repetido(s)")
+
+
+def main():
+    limite = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    linhas = limite + 1
+    instante = datetime(2024, 1, 1, 12, 0, 0)
+
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        conn.start_transaction()
+        cursor.execute("INSERT INTO oficinas (nome, created_at) VALUES ('Teste /sync', NOW())")
+        oficina_id = cursor.lastrowid
+
+        cursor.executemany("""
+            INSERT INTO clientes (nome, status, oficina_id, updated_at)
+            VALUES (%s, 'Ativo', %s, %s)
+        """, [(f"Cliente {i}", oficina_id, instante) for i in range(linhas)])
+        cursor.execute("SELECT id FROM clientes WHERE oficina_id = %s", (oficina_id,))
+        clientes = [linha["id"] for linha in cursor.fetchall()]
+
+        cursor.executemany("""
+            INSERT INTO exclusoes (oficina_id, entidade, registro_id, deleted_at)
+            VALUES (%s, 'clientes', %s, %s)
+        """, [(oficina_id, 1_000_000 + i, instante) for i in range(linhas)])
+        lapides = [1_000_000 + i for i in range(linhas)]
+
+        print(f"{linhas} clientes e {linhas} lápides com o mesmo instante, páginas de {limite}\n")
+
+        alterados, excluidos, chamadas = sincronizar_tudo(cursor, oficina_id, None, limite)
+        conferir("sincronização completa (clientes)", alterados.get("clientes", []), clientes)
+        print(f"✓ Sincronização completa: {len(clientes)} clientes em {chamadas} chamadas")
+
+        # Delta a partir de ontem (dentro da retenção das lápides), com as
+        # linhas e as lápides empatadas num instante depois da marca
+        cursor.execute("SELECT NOW(6) - INTERVAL 1 DAY AS instante")
+        instante = cursor.fetchone()["instante"]
+        cursor.execute("UPDATE clientes SET updated_at = %s WHERE oficina_id = %s", (instante, oficina_id))
+        cursor.execute("UPDATE exclusoes SET deleted_at = %s WHERE oficina_id = %s", (instante, oficina_id))
+        marca = sincronizacao.formatar_marca(instante - timedelta(seconds=1))
+        alterados, excluidos, chamadas = sincronizar_tudo(cursor, oficina_id, marca, limite)
+        conferir("delta (clientes)", alterados.get("clientes", []), clientes)
+        conferir("delta (lápides)", excluidos, lapides)
+        print(f"✓ Delta: {len(clientes)} clientes e {len(lapides)} lápides em {chamadas} chamadas")
+
+        print("\n✓ Paginação do /sync termina e não perde nem repete linhas")
+    except AssertionError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    finally:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
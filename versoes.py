@@ -0,0 +1,119 @@
+"""
+Contadores de versão por oficina e por entidade (tabela versoes_entidades).
+
+Todo handler de escrita incrementa a versão das entidades que alterou, na
+mesma transação da escrita. Quem lê (cache de respostas) compara as versões
+atuais com as da resposta guardada, então nunca serve dado antigo, mesmo
+com vários workers do gunicorn.
+"""
+
+import functools
+import hashlib
+from flask import Response, current_app, g, request
+from connection import get_db
+from sessao import oficina_da_requisicao
+
+ENTIDADES = ("clientes", "veiculos", "servicos", "pecas", "ordens_servico", "financeiro", "usuarios", "oficinas")
+
+
+def ler_versoes(cursor, oficina_id):
+    """{entidade: versão} da oficina (entidades nunca alteradas valem 0)"""
+    cursor.execute("""
+        SELECT entidade, versao FROM versoes_entidades
+        WHERE oficina_id = %s
+    """, (oficina_id,))
+    versoes = dict.fromkeys(ENTIDADES, 0)
+    for row in cursor.fetchall():
+        if isinstance(row, dict):
+            versoes[row["entidade"]] = row["versao"]
+        else:
+            versoes[row[0]] = row[1]
+    return versoes
+
+
+def versoes_atuais(oficina_id):
+    """Lê as versões pela conexão da requisição (uma vez por requisição)"""
+    lidas = g.setdefault("_versoes", {})
+    if oficina_id in lidas:
+        return lidas[oficina_id]
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        lidas[oficina_id] = ler_versoes(cursor, oficina_id)
+        return lidas[oficina_id]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def incrementar(cursor, oficina_id, entidades):
+    cursor.executemany("""
+        INSERT INTO versoes_entidades (oficina_id, entidade, versao, updated_at)
+        VALUES (%s, %s, 1, NOW())
+        ON DUPLICATE KEY UPDATE versao = versao + 1, updated_at = NOW()
+    """, [(oficina_id, entidade) for entidade in entidades])
+
+
+def altera(*entidades):
+    """
+    Marca o handler como escrita nas entidades dadas: se a resposta for de
+    sucesso, incrementa as versões da oficina antes do commit do @transacional
+    (use sempre abaixo dele).
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code < 400:
+                oficina_id = oficina_da_requisicao()
+                if oficina_id:
+                    conn = get_db()
+                    cursor = conn.cursor()
+                    try:
+                        incrementar(cursor, oficina_id, entidades)
+                    finally:
+                        cursor.close()
+                        conn.close()
+            return response
+        return wrapper
+    return decorator
+
+
+def etag(*entidades, extra=None):
+    """
+    ETag do GET derivado das versões das entidades listadas. Se o cliente
+    mandar If-None-Match com a mesma ETag, responde 304 sem executar o
+    handler (nenhuma consulta pesada). `extra` é uma função para o que mais
+    mudar a resposta sem passar por escrita (ex.: o mês corrente). A tag
+    fica em g.etag, para o handler poder devolvê-la também no corpo.
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            oficina_id = oficina_da_requisicao()
+            if not oficina_id:
+                return f(*args, **kwargs)
+
+            todas = versoes_atuais(oficina_id)
+            base = repr((
+                request.endpoint,
+                oficina_id,
+                sorted(request.args.items(multi=True)),
+                [todas[entidade] for entidade in entidades],
+                extra() if extra else None,
+            ))
+            tag = hashlib.blake2b(base.encode("utf-8"), digest_size=12).hexdigest()
+            g.etag = tag
+
+            if request.if_none_match.contains_weak(tag):
+                response = Response(status=304)
+            else:
+                response = current_app.make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(tag, weak=True)
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+        return wrapper
+    return decorator